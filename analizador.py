@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Analizador de partidas de Escoba.
+
+Lee registros de partidas en JSONL (una partida por línea), los reproduce sobre un
+GameState y anota cada decisión con la clasificación del consejero: la de
+sugerir_mejor_jugada para las jugadas del usuario, la de elegir_captura_usuario para
+sus capturas tras una renuncia del oponente y la de sugerir_movida_oponente para las
+jugadas del oponente. Para cada decisión da el puesto de la jugada elegida y lo que
+se perdió respecto a la mejor (diferencia de valor neto).
+
+Formato de una partida (cartas en la notación de escoba.py, por ejemplo "10c"):
+    {"id": 7,                                  (opcional)
+     "inicia": "usuario",                      (opcional; "usuario" u "oponente")
+     "mesa": ["7o", "5o", "6b", "5e"],
+     "repartos": [["2c", "3e", "10b"], ...],   (manos del usuario, en orden)
+     "jugadas": [{"jugador": "usuario", "carta": "2c", "captura": []},
+                 {"jugador": "oponente", "carta": "8o", "captura": ["7o"]},
+                 {"jugador": "usuario", "carta": "4e", "captura": ["1o", "10b"],
+                  "tipo": "respuesta"}, ...]}  (captura tras una renuncia del oponente)
+
+Como en escoba(), la mano del oponente no se conoce: sus cartas salen de la baraja.
+El usuario recibe el siguiente reparto cuando le toca jugar con la mano vacía.
+
+Los ficheros se leen línea a línea (la memoria no depende de su tamaño) y se reparten
+entre procesos. La salida de cada fichero es otro JSONL con una línea por decisión y
+una línea de resumen por partida.
+
+El consejero se elige con las mismas opciones que en escoba.py (escoba.crear_evaluador),
+así que el análisis coincide con lo que aconseja escoba.py con esas opciones.
+
+Uso:
+    python analizador.py partidas1.jsonl partidas2.jsonl --procesos 4 --salida analisis/
+    python analizador.py - --creencias --aperturas --final-exacto < partidas.jsonl > analisis.jsonl
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from escoba import (BIT, INDICE, JUGADORES, USUARIO, OPONENTE, VALOR, GameState, a_mascara, de_mascara, indices,
+                    parsear_carta, texto_carta, sugerir_movida_oponente, evaluar_decision,
+                    agregar_opciones_evaluador, opciones_evaluador, comprobar_opciones_evaluador, crear_evaluador)
+
+def _carta(texto):
+    carta = parsear_carta(texto)
+    if carta is None:
+        raise ValueError(f"carta no válida: {texto!r}")
+    return carta
+
+def _mascara(textos):
+    cartas = [_carta(t) for t in textos]
+    mascara = a_mascara(cartas)
+    if len(cartas) != len(de_mascara(mascara)):
+        raise ValueError(f"cartas repetidas: {textos}")
+    return mascara
+
+def _jugada_texto(movida, neto):
+    carta, captura = movida
+    return {"carta": texto_carta(de_mascara(BIT[carta])[0]),
+            "captura": [texto_carta(c) for c in de_mascara(captura)], "neto": neto}
+
+def clasificar(evaluaciones, movida, evaluar, estado, jugador, deck=None):
+    """
+    Puesto (desde 1; los empates comparten puesto) y pérdida de 'movida' entre las
+    'evaluaciones'. Si no está entre ellas (por ejemplo, no capturó pudiendo), se evalúa
+    aparte y el puesto es None. Retorna (puesto, neto_elegida, neto_mejor).
+    """
+    elegida = next((e[1] for e in evaluaciones if e[0] == movida), None)
+    puesto = None
+    if elegida is None:
+        elegida = evaluar(estado, [movida], jugador, deck)[0][1]
+    else:
+        puesto = 1 + sum(1 for e in evaluaciones if e[1] > elegida)
+    mejor = max([e[1] for e in evaluaciones] + [elegida])
+    return puesto, elegida, mejor
+
+def _comprobar_formato(registro):
+    """ Lanza ValueError si 'registro' no tiene la forma del formato del módulo. """
+    def cartas(valor, campo):
+        if not isinstance(valor, list) or not all(isinstance(c, str) for c in valor):
+            raise ValueError(f"'{campo}' debe ser una lista de cartas (textos)")
+    if not isinstance(registro, dict):
+        raise ValueError("la partida debe ser un objeto JSON")
+    cartas(registro.get("mesa"), "mesa")
+    repartos = registro.get("repartos", [])
+    if not isinstance(repartos, list):
+        raise ValueError("'repartos' debe ser una lista de manos")
+    for mano in repartos:
+        cartas(mano, "repartos")
+    jugadas = registro.get("jugadas", [])
+    if not isinstance(jugadas, list):
+        raise ValueError("'jugadas' debe ser una lista")
+    for n, jugada in enumerate(jugadas, 1):
+        if not isinstance(jugada, dict):
+            raise ValueError(f"jugada {n}: debe ser un objeto JSON")
+        if not isinstance(jugada.get("carta"), str) or not isinstance(jugada.get("jugador"), str):
+            raise ValueError(f"jugada {n}: 'jugador' y 'carta' deben ser textos")
+        cartas(jugada.get("captura", []), f"jugada {n}: captura")
+
+def analizar_partida(registro, evaluar=None):
+    """
+    Reproduce la partida 'registro' (diccionario con el formato del módulo) y genera
+    un diccionario por decisión y, al final, el resumen de la partida. Lanza ValueError
+    si el registro no tiene ese formato o no es coherente (cartas que no están
+    disponibles o capturas imposibles).
+    """
+    _comprobar_formato(registro)
+    if evaluar is None:
+        evaluar = crear_evaluador()
+    partida = registro.get("id")
+    inicia = JUGADORES.index(registro.get("inicia", "usuario"))
+    estado = GameState(mesa=_mascara(registro["mesa"]), turno=inicia)
+    repartos = iter(registro.get("repartos", []))
+    perdida = [0.0, 0.0]
+    decisiones = [0, 0]
+    for n, jugada in enumerate(registro.get("jugadas", []), 1):
+        jugador = JUGADORES.index(jugada["jugador"])
+        respuesta = jugada.get("tipo") == "respuesta"
+        carta = INDICE[_carta(jugada["carta"])]
+        captura = _mascara(jugada.get("captura", []))
+        if jugador == USUARIO and not estado.manos[USUARIO]:
+            mano = next(repartos, None)
+            if mano is None:
+                raise ValueError(f"jugada {n}: el usuario no tiene cartas y no quedan repartos")
+            mano = _mascara(mano)
+            if mano & ~estado.baraja:
+                raise ValueError(f"jugada {n}: el reparto {de_mascara(mano)} incluye cartas ya usadas")
+            estado.repartir(USUARIO, mano)
+        bit = BIT[carta]
+        if jugador == USUARIO and not estado.manos[USUARIO] & bit:
+            raise ValueError(f"jugada {n}: la carta {jugada['carta']} no está en la mano del usuario")
+        if jugador == OPONENTE and not estado.baraja & bit:
+            raise ValueError(f"jugada {n}: la carta {jugada['carta']} ya se ha jugado")
+        if captura & ~estado.mesa or (captura and sum(VALOR[i] for i in indices(captura)) != 15 - VALOR[carta]):
+            raise ValueError(f"jugada {n}: la captura {jugada.get('captura')} no es posible")
+        movida = (carta, captura)
+        mesa = estado.mesa
+        deck = None
+        if jugador == OPONENTE:
+            nombre = "sugerir_movida_oponente"
+            deck = estado.baraja & ~bit
+            evaluaciones = sugerir_movida_oponente(estado, carta, evaluar=evaluar)
+        elif respuesta:
+            nombre = "elegir_captura_usuario"
+            evaluaciones = evaluar_decision(nombre, evaluar, estado,
+                                            [m for m in estado.legal_moves(USUARIO) if m[1]], USUARIO)
+        else:
+            nombre = "sugerir_mejor_jugada"
+            evaluaciones = evaluar_decision(nombre, evaluar, estado, estado.legal_moves(USUARIO), USUARIO)
+        puesto, neto, mejor = clasificar(evaluaciones, movida, evaluar, estado, jugador, deck)
+        ranking = sorted(evaluaciones, key=lambda e: -e[1])
+        perdida[jugador] += mejor - neto
+        decisiones[jugador] += 1
+        yield {"partida": partida, "jugada": n, "jugador": JUGADORES[jugador], "decision": nombre,
+               "mesa": [texto_carta(c) for c in de_mascara(mesa)],
+               "elegida": _jugada_texto(movida, neto), "puesto": puesto, "opciones": len(evaluaciones),
+               "perdida": mejor - neto,
+               "ranking": [_jugada_texto(e[0], e[1]) for e in ranking]}
+        estado.apply(movida, jugador)
+    resumen = {"partida": partida, "resumen": True,
+               "decisiones": dict(zip(JUGADORES, decisiones)),
+               "perdida": dict(zip(JUGADORES, perdida))}
+    if estado.terminado():
+        estado.barrer()
+        resumen["puntos"] = estado.score()[0]
+    yield resumen
+
+def analizar_lineas(lineas, destino, evaluar=None):
+    """
+    Analiza las partidas de 'lineas' (iterable de líneas JSON) y escribe en 'destino'
+    una línea JSON por decisión y por resumen. Una partida incoherente se anota con
+    {"partida", "linea", "error"} y se sigue con la siguiente. Retorna los totales.
+    """
+    totales = {"partidas": 0, "errores": 0, "decisiones": {j: 0 for j in JUGADORES},
+               "perdida": {j: 0.0 for j in JUGADORES}}
+    for k, linea in enumerate(lineas, 1):
+        if not linea.strip():
+            continue
+        registro = None
+        try:
+            registro = json.loads(linea)
+            salida = []
+            for resultado in analizar_partida(registro, evaluar):
+                salida.append(json.dumps(resultado, ensure_ascii=False))
+                if resultado.get("resumen"):
+                    for j in JUGADORES:
+                        totales["decisiones"][j] += resultado["decisiones"][j]
+                        totales["perdida"][j] += resultado["perdida"][j]
+            destino.write("\n".join(salida) + "\n")
+            totales["partidas"] += 1
+        except (ValueError, KeyError, TypeError) as error:
+            partida = registro.get("id") if isinstance(registro, dict) else None
+            destino.write(json.dumps({"partida": partida, "linea": k, "error": str(error)}, ensure_ascii=False) + "\n")
+            totales["errores"] += 1
+    return totales
+
+def ruta_salida(fichero, directorio=None):
+    """ 'partidas.jsonl' -> 'partidas.analisis.jsonl' (en 'directorio' si se da). """
+    base = os.path.basename(fichero)
+    if base.endswith(".jsonl"):
+        base = base[:-len(".jsonl")]
+    return os.path.join(directorio or os.path.dirname(fichero), base + ".analisis.jsonl")
+
+def analizar_fichero(args):
+    """ Analiza 'fichero' y escribe el resultado en 'salida'. Retorna (fichero, totales). """
+    fichero, salida, opciones = args
+    evaluar = crear_evaluador(**opciones)
+    try:
+        with open(fichero, encoding="utf-8") as origen, open(salida, "w", encoding="utf-8") as destino:
+            return fichero, analizar_lineas(origen, destino, evaluar)
+    finally:
+        _cerrar(evaluar)
+
+def _cerrar(evaluar):
+    busqueda = getattr(evaluar, "busqueda", None)
+    if busqueda is not None and hasattr(busqueda, "cerrar"):
+        busqueda.cerrar()
+
+def analizar(ficheros, directorio=None, procesos=None, opciones=None, informe=sys.stderr):
+    """
+    Analiza 'ficheros' en 'procesos' procesos (por defecto, uno por núcleo, sin pasar del
+    número de ficheros), con el evaluador de escoba.crear_evaluador(**opciones) (por
+    defecto, el del consejero sin opciones). Retorna un diccionario {fichero: totales}.
+    """
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    trabajos = [(f, ruta_salida(f, directorio), opciones or {}) for f in ficheros]
+    procesos = min(procesos or multiprocessing.cpu_count(), len(trabajos))
+    inicio = time.perf_counter()
+    resultados = {}
+    if procesos <= 1:
+        hechos = map(analizar_fichero, trabajos)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(procesos)
+        hechos = pool.imap_unordered(analizar_fichero, trabajos)
+    try:
+        for fichero, totales in hechos:
+            resultados[fichero] = totales
+            if informe:
+                print(f"{fichero}: {totales['partidas']} partidas, {totales['errores']} errores "
+                      f"({time.perf_counter() - inicio:.1f} s)", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anota cada decisión de registros de partidas con la clasificación del consejero.")
+    parser.add_argument("ficheros", nargs="+", help="ficheros JSONL de partidas ('-': entrada estándar a salida estándar)")
+    parser.add_argument("--salida", default=None, metavar="DIRECTORIO",
+                        help="directorio para los ficheros .analisis.jsonl (por defecto, junto a cada fichero)")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    # Las mismas opciones del consejero que escoba.py, para clasificar con el mismo evaluador.
+    agregar_opciones_evaluador(parser, procesos=False)
+    args = parser.parse_args(argv)
+    opciones = opciones_evaluador(args)
+    try:
+        comprobar_opciones_evaluador(**opciones)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.ficheros == ["-"]:
+        evaluar = crear_evaluador(**opciones)
+        try:
+            totales = analizar_lineas(sys.stdin, sys.stdout, evaluar)
+        finally:
+            _cerrar(evaluar)
+        resultados = {"-": totales}
+    else:
+        resultados = analizar(args.ficheros, args.salida, args.procesos, opciones)
+    for j in JUGADORES:
+        decisiones = sum(t["decisiones"][j] for t in resultados.values())
+        perdida = sum(t["perdida"][j] for t in resultados.values())
+        media = perdida / decisiones if decisiones else 0.0
+        print(f"{j}: {decisiones} decisiones, pérdida total {perdida:.2f} ({media:.3f} por decisión)", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
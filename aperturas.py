@@ -0,0 +1,335 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla precalculada de aperturas de Escoba.
+
+La primera decisión de la partida (4 cartas en la mesa, 3 en la mano del usuario,
+montones vacíos y 33 cartas sin ver) es la más cara del consejero y se repite
+constantemente. Esta tabla guarda, para todas esas posiciones, la evaluación a
+1 jugada de cada jugada (la de evaluar_jugadas).
+
+Para puntuar, una carta sólo se distingue por su valor y por si es de oros (los
+sietes y el velo se deducen de ahí): copas, espadas y bastos son intercambiables.
+Así, una posición canónica es cuántas cartas de cada clase (valor, oros o no) hay
+en la mesa y en la mano, y hay 7.049.100 en lugar de 652 millones. Las posiciones
+canónicas se numeran con un sistema combinatorio, de modo que la búsqueda es directa.
+
+De cada jugada se guarda la expectativa del oponente, que es exacta en enteros: los
+puntos de una captura son múltiplos de 1/42 y se promedian sobre 33 cartas, así que
+la expectativa es k / 1386 con k entero (2 bytes). Los puntos de la jugada se
+recalculan al buscarla.
+
+Formato (little-endian): "ESCA", versión (u16), reservado (u16), número de
+posiciones N (u64), número de valores (u64); N+1 desplazamientos (u32) y los valores
+(u16) de las jugadas de cada posición, en el orden de jugadas_canonicas().
+
+Uso:
+    python aperturas.py --procesos 8    # genera aperturas.bin (unos 60 MiB; hora y media de CPU)
+    python escoba.py --aperturas        # la usa si existe aperturas.bin
+"""
+import argparse
+import array
+import functools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+
+from escoba import (BIT, CLASE, USUARIO, BARAJA_COMPLETA, CONTADORES_VACIOS,
+                    contar_cartas, indices, puntos_movida, evaluar_movida_mascara)
+
+FICHERO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aperturas.bin")
+MAGICO = b"ESCA"
+VERSION = 1
+CABECERA = struct.Struct("<4sHHQQ")
+DENOMINADOR = 42 * 33
+CARTAS_MESA, CARTAS_MANO = 4, 3
+
+# Clases de carta (escoba.CLASE): 0..9 son los oros de valor 1..10 y 10..19 el resto (3 cartas cada una).
+CLASES = 20
+COPIAS = (1,) * 10 + (3,) * 10
+VALOR_CLASE = tuple(c % 10 + 1 for c in range(CLASES))
+# Cartas de cada clase, en el orden en que se usan como representantes.
+CARTAS_CLASE = tuple(tuple(i for i in range(40) if CLASE[i] == c) for c in range(CLASES))
+
+# ==========================================
+# Numeración de las posiciones canónicas
+# ==========================================
+@functools.lru_cache(maxsize=None)
+def completar(clase, mesa, mano):
+    """ Formas de repartir 'mesa' y 'mano' cartas entre las clases 'clase'..19. """
+    if clase == CLASES:
+        return 1 if mesa == 0 and mano == 0 else 0
+    return sum(completar(clase + 1, mesa - a, mano - b) for a, b in _repartos(clase, mesa, mano))
+
+@functools.lru_cache(maxsize=None)
+def _repartos(clase, mesa, mano):
+    """ Cuentas (en la mesa, en la mano) posibles de la clase, en orden. """
+    copias = COPIAS[clase]
+    return tuple((a, b) for a in range(min(copias, mesa) + 1) for b in range(min(copias - a, mano) + 1))
+
+POSICIONES = completar(0, CARTAS_MESA, CARTAS_MANO)
+
+def cuentas(mascara):
+    """ Cartas de cada clase de una máscara. """
+    c = [0] * CLASES
+    for i in indices(mascara):
+        c[CLASE[i]] += 1
+    return c
+
+def rango(mesa, mano):
+    """ Número (0..POSICIONES-1) de la posición canónica de 'mesa' y 'mano' (cuentas por clase). """
+    r = 0
+    t, h = CARTAS_MESA, CARTAS_MANO
+    for clase in range(CLASES):
+        actual = (mesa[clase], mano[clase])
+        for a, b in _repartos(clase, t, h):
+            if (a, b) == actual:
+                break
+            r += completar(clase + 1, t - a, h - b)
+        t -= actual[0]
+        h -= actual[1]
+    return r
+
+def posicion(r):
+    """ Inversa de rango(): (cuentas de la mesa, cuentas de la mano) de la posición 'r'. """
+    mesa, mano = [0] * CLASES, [0] * CLASES
+    t, h = CARTAS_MESA, CARTAS_MANO
+    for clase in range(CLASES):
+        for a, b in _repartos(clase, t, h):
+            n = completar(clase + 1, t - a, h - b)
+            if r < n:
+                break
+            r -= n
+        mesa[clase], mano[clase] = a, b
+        t -= a
+        h -= b
+    return mesa, mano
+
+def _capturas(mesa, clase, objetivo, actual, salida):
+    """ Cuentas por clase de las capturas de 'mesa' que suman 'objetivo', usando clases >= 'clase'. """
+    if objetivo == 0:
+        salida.append(tuple(actual))
+        return
+    if clase == CLASES:
+        return
+    for k in range(mesa[clase] + 1):
+        if k * VALOR_CLASE[clase] > objetivo:
+            break
+        actual[clase] = k
+        _capturas(mesa, clase + 1, objetivo - k * VALOR_CLASE[clase], actual, salida)
+    actual[clase] = 0
+
+def jugadas_canonicas(mesa, mano):
+    """
+    Jugadas de la posición canónica, como (clase de la carta, cuentas capturadas o None),
+    en el orden de la tabla: por clase de la carta y, dentro, por captura.
+    Como en GameState.legal_moves, una carta que puede capturar no se deja en la mesa.
+    """
+    jugadas = []
+    for clase in range(CLASES):
+        if mano[clase]:
+            capturas = []
+            _capturas(mesa, 0, 15 - VALOR_CLASE[clase], [0] * CLASES, capturas)
+            if capturas:
+                jugadas.extend((clase, c) for c in sorted(capturas))
+            else:
+                jugadas.append((clase, None))
+    return jugadas
+
+# ==========================================
+# Generación
+# ==========================================
+def representantes(mesa, mano):
+    """ Máscaras concretas de una posición canónica: las primeras cartas de cada clase. """
+    m, h = 0, 0
+    for clase in range(CLASES):
+        cartas = CARTAS_CLASE[clase]
+        for i in cartas[:mesa[clase]]:
+            m |= BIT[i]
+        for i in cartas[mesa[clase]:mesa[clase] + mano[clase]]:
+            h |= BIT[i]
+    return m, h
+
+def evaluar_posicion(r):
+    """ Valores (k de la expectativa k / DENOMINADOR) de las jugadas de la posición 'r'. """
+    mesa, mano = posicion(r)
+    m, h = representantes(mesa, mano)
+    deck = BARAJA_COMPLETA & ~(m | h)
+    valores = []
+    for clase, captura in jugadas_canonicas(mesa, mano):
+        carta = next(i for i in indices(h) if CLASE[i] == clase)
+        mascara = None
+        if captura is not None:
+            mascara = 0
+            for c in range(CLASES):
+                for i in [i for i in indices(m) if CLASE[i] == c][:captura[c]]:
+                    mascara |= BIT[i]
+        _, _, expectativa, _ = evaluar_movida_mascara(carta, m, deck, mascara)
+        k = round(expectativa * DENOMINADOR)
+        assert abs(expectativa * DENOMINADOR - k) < 1e-6, (r, expectativa)
+        valores.append(k)
+    return valores
+
+def _evaluar_bloque(limites):
+    inicio, fin = limites
+    cuantas = array.array("I")
+    valores = array.array("H")
+    for r in range(inicio, fin):
+        v = evaluar_posicion(r)
+        cuantas.append(len(v))
+        valores.extend(v)
+    return cuantas, valores
+
+def generar(fichero=FICHERO, procesos=None, posiciones=None, bloque=2000, informe=sys.stderr):
+    """
+    Evalúa las posiciones canónicas (las 'posiciones' primeras, por defecto todas) en
+    'procesos' procesos y escribe la tabla en 'fichero'.
+    """
+    n = POSICIONES if posiciones is None else min(posiciones, POSICIONES)
+    bloques = [(k, min(k + bloque, n)) for k in range(0, n, bloque)]
+    desplazamientos = array.array("I", [0])
+    inicio = time.perf_counter()
+    temporal = fichero + ".tmp"
+    pool = multiprocessing.Pool(procesos) if procesos != 1 else None
+    try:
+        resultados = pool.imap(_evaluar_bloque, bloques) if pool else map(_evaluar_bloque, bloques)
+        with open(temporal + ".valores", "wb") as valores:
+            for k, (cuantas, v) in enumerate(resultados, 1):
+                for c in cuantas:
+                    desplazamientos.append(desplazamientos[-1] + c)
+                if sys.byteorder != "little":
+                    v.byteswap()
+                valores.write(v.tobytes())
+                if informe and k % 50 == 0:
+                    hechas = bloques[k - 1][1]
+                    print(f"{hechas}/{n} posiciones ({hechas / (time.perf_counter() - inicio):.0f}/s)", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    total = desplazamientos[-1]
+    if sys.byteorder != "little":
+        desplazamientos.byteswap()
+    with open(temporal, "wb") as f:
+        f.write(CABECERA.pack(MAGICO, VERSION, 0, n, total))
+        f.write(desplazamientos.tobytes())
+        with open(temporal + ".valores", "rb") as valores:
+            while True:
+                trozo = valores.read(1 << 20)
+                if not trozo:
+                    break
+                f.write(trozo)
+    os.remove(temporal + ".valores")
+    os.replace(temporal, fichero)
+    return n, total
+
+# ==========================================
+# Consulta
+# ==========================================
+class TablaAperturas:
+    """ Tabla de aperturas en disco. Se proyecta en memoria la primera vez que se consulta. """
+    def __init__(self, fichero=FICHERO):
+        self.fichero = fichero
+        self.datos = None
+        self.disponible = None
+        self.posiciones = 0
+
+    def _cargar(self):
+        self.disponible = os.path.exists(self.fichero)
+        if not self.disponible:
+            return
+        with open(self.fichero, "rb") as f:
+            self.datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, version, _, self.posiciones, _ = CABECERA.unpack_from(self.datos, 0)
+        if magico != MAGICO or version != VERSION:
+            raise ValueError(f"{self.fichero} no es una tabla de aperturas válida")
+        self._valores = CABECERA.size + 4 * (self.posiciones + 1)
+
+    def valores(self, mesa, mano):
+        """
+        {jugada canónica: expectativa del oponente} de la apertura con 'mesa' y 'mano'
+        (máscaras), o None si no está en la tabla.
+        """
+        if self.disponible is None:
+            self._cargar()
+        if not self.disponible:
+            return None
+        cm, ch = cuentas(mesa), cuentas(mano)
+        r = rango(cm, ch)
+        if r >= self.posiciones:
+            return None
+        desde, hasta = struct.unpack_from("<II", self.datos, CABECERA.size + 4 * r)
+        ks = struct.unpack_from(f"<{hasta - desde}H", self.datos, self._valores + 2 * desde)
+        return {jugada: k / DENOMINADOR for jugada, k in zip(jugadas_canonicas(cm, ch), ks)}
+
+    def evaluar(self, estado, movidas, jugador=USUARIO):
+        """
+        Como evaluar_jugadas en una apertura, desde la tabla. Retorna None si la
+        posición no es una apertura o no está en la tabla.
+        """
+        if not es_apertura(estado, jugador):
+            return None
+        mano = estado.manos[jugador]
+        if not all(mano & BIT[carta] for carta, _ in movidas):
+            return None
+        tabla = self.valores(estado.mesa, mano)
+        if tabla is None:
+            return None
+        evaluaciones = []
+        for movida in movidas:
+            carta, captura = movida
+            clave = (CLASE[carta], tuple(cuentas(captura)) if captura else None)
+            expectativa = tabla.get(clave)
+            if expectativa is None:
+                return None
+            if captura:
+                nueva_mesa = estado.mesa & ~captura
+                pts = puntos_movida(CONTADORES_VACIOS, captura | BIT[carta], 1 if not nueva_mesa else 0)
+            else:
+                nueva_mesa = estado.mesa | BIT[carta]
+                pts = 0
+            evaluaciones.append((movida, pts - expectativa, pts, expectativa, nueva_mesa))
+        return evaluaciones
+
+def es_apertura(estado, jugador=USUARIO):
+    """
+    Si 'jugador' está en una apertura: 4 cartas en la mesa, 3 en su mano, montones
+    vacíos y las otras 33 cartas sin ver.
+    """
+    mano = estado.manos[jugador]
+    return (contar_cartas(estado.mesa) == CARTAS_MESA and contar_cartas(mano) == CARTAS_MANO
+            and estado.contadores[0] == CONTADORES_VACIOS and estado.contadores[1] == CONTADORES_VACIOS
+            and estado.no_vistas(jugador) == BARAJA_COMPLETA & ~(estado.mesa | mano))
+
+def con_aperturas(evaluar, tabla=None):
+    """
+    Envuelve una función con la firma de evaluar_jugadas (a 1 jugada) para que, en
+    las aperturas del usuario, responda desde la tabla de aperturas.
+    """
+    if tabla is None:
+        tabla = TablaAperturas()
+    def evaluar_con_aperturas(estado, movidas, jugador, deck=None):
+        if jugador == USUARIO and (deck is None or deck == estado.no_vistas(jugador)):
+            evaluaciones = tabla.evaluar(estado, movidas, jugador)
+            if evaluaciones is not None:
+                return evaluaciones
+        return evaluar(estado, movidas, jugador, deck)
+    evaluar_con_aperturas.tabla = tabla
+    return evaluar_con_aperturas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera la tabla de aperturas del consejero de Escoba.")
+    parser.add_argument("--salida", default=FICHERO, help="fichero de la tabla (por defecto, aperturas.bin)")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--posiciones", type=int, default=None,
+                        help="genera sólo las primeras posiciones canónicas (para pruebas)")
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+    n, total = generar(args.salida, args.procesos, args.posiciones)
+    print(f"{n} posiciones, {total} jugadas, {os.path.getsize(args.salida) / 2**20:.1f} MiB "
+          f"en {time.perf_counter() - inicio:.0f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+Políticas de juego y arena para compararlas.
+
+Una política es una función que recibe el GameState y devuelve la jugada (carta,
+captura) del jugador que tiene el turno, sea cual sea su asiento: es lo que recibe
+simulador.continuar_partida. Sólo debe mirar lo que ve ese jugador (su mano, la mesa,
+los montones y estado.no_vistas), no la mano del rival.
+
+Las políticas se nombran con "nombre" o "nombre:argumento". Las que trae el módulo
+están en POLITICAS:
+    azar           una jugada legal al azar
+    voraz          la captura que más vale para su montón (puntos_movida, escobas incluidas)
+    neto           la de mayor valor neto a 1 jugada (sugerir_mejor_jugada sin preguntar)
+    expectimax:N   expectimax a N jugadas (2 por defecto)
+    limitado:MS    profundización iterativa durante MS milisegundos por decisión
+    pimc:M         Monte Carlo con información perfecta con M muestras
+    valoracion:F   a 1 jugada con la valoración aprendida de los pesos F (ver valoracion.py)
+Todas menos azar y voraz resuelven el final con el minimax exacto, para que la
+diferencia entre ellas sea la del resto de la partida. Cualquier otro nombre con
+un punto se lee como "modulo.fabrica": la fábrica se llama como las de POLITICAS, con
+(argumento, azar, mano), donde 'azar' es un random.Random propio de la partida y el
+asiento y 'mano' el jugador que empieza cada reparto; debe devolver la política.
+
+La arena juega todas las parejas de políticas sobre los mismos repartos que
+simulador.py. Cada reparto se juega dos veces, una con cada política en cada asiento,
+para que la suerte del reparto se compense. Da, para cada pareja, la tasa de victorias
+y el margen medio de puntos con su intervalo de confianza del 95 %; para cada política,
+un Elo ajustado a todos los resultados y el tiempo de CPU por decisión, para comparar
+la fuerza con lo que cuesta.
+
+Uso:
+    python arena.py azar voraz neto expectimax:2 -n 500 --procesos 8
+    python arena.py neto limitado:50 -n 200 --salida arena.json
+"""
+import argparse
+import importlib
+import itertools
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from escoba import BIT, USUARIO, OPONENTE, puntos_movida, evaluar_jugadas
+from simulador import barajar, jugar_partida
+
+# ==========================================
+# Políticas
+# ==========================================
+def politica_azar(azar):
+    """ Política que elige una jugada legal al azar con 'azar' (random.Random). """
+    def jugar(estado):
+        return azar.choice(estado.legal_moves())
+    return jugar
+
+def politica_voraz(estado):
+    """
+    Captura de más puntos según puntos_movida sobre el montón del que juega (con la
+    escoba si deja la mesa vacía), sin mirar la respuesta del rival. Si no puede
+    capturar, deja la primera carta.
+    """
+    contadores = estado.contadores[estado.turno]
+    mejor, mejor_pts = None, None
+    for movida in estado.legal_moves():
+        carta, captura = movida
+        pts = puntos_movida(contadores, captura | BIT[carta], 1 if captura == estado.mesa else 0) if captura else 0
+        if mejor_pts is None or pts > mejor_pts:
+            mejor, mejor_pts = movida, pts
+    return mejor
+
+def politica_evaluador(evaluar):
+    """ Política que juega la jugada de mayor valor neto según 'evaluar' (firma de evaluar_jugadas). """
+    def jugar(estado):
+        evaluaciones = evaluar(estado, estado.legal_moves(), estado.turno)
+        return max(evaluaciones, key=lambda x: x[1])[0]
+    return jugar
+
+def _neto(argumento, azar, mano):
+    from busqueda import con_final_exacto
+    return politica_evaluador(con_final_exacto(evaluar_jugadas, mano))
+
+def _expectimax(argumento, azar, mano):
+    from busqueda import con_final_exacto, evaluador_expectimax
+    return politica_evaluador(con_final_exacto(evaluador_expectimax(int(argumento or 2)), mano))
+
+def _limitado(argumento, azar, mano):
+    from busqueda import con_final_exacto, evaluador_limitado
+    return politica_evaluador(con_final_exacto(evaluador_limitado(float(argumento or 50)), mano))
+
+def _pimc(argumento, azar, mano):
+    from busqueda import con_final_exacto, evaluador_pimc
+    return politica_evaluador(con_final_exacto(evaluador_pimc(int(argumento or 64), semilla=azar.getrandbits(32)), mano))
+
+def _valoracion(argumento, azar, mano):
+    from busqueda import con_final_exacto
+    from valoracion import FICHERO, cargar_valoracion, evaluador_valoracion
+    return politica_evaluador(con_final_exacto(evaluador_valoracion(cargar_valoracion(argumento or FICHERO)), mano))
+
+# Fábricas de políticas: (argumento, azar, mano) -> política.
+POLITICAS = {
+    "azar": lambda argumento, azar, mano: politica_azar(azar),
+    "voraz": lambda argumento, azar, mano: politica_voraz,
+    "neto": _neto,
+    "expectimax": _expectimax,
+    "limitado": _limitado,
+    "pimc": _pimc,
+    "valoracion": _valoracion,
+}
+
+def fabrica_politica(nombre):
+    """
+    (fábrica, argumento) de la política 'nombre' ("nombre" o "nombre:argumento"; ver el
+    principio del módulo), sin crearla. ValueError si no existe.
+    """
+    base, _, argumento = nombre.partition(":")
+    fabrica = POLITICAS.get(base)
+    if fabrica is None:
+        modulo, punto, atributo = base.rpartition(".")
+        if not punto:
+            raise ValueError(f"política desconocida: {nombre}")
+        try:
+            fabrica = getattr(importlib.import_module(modulo), atributo)
+        except (ImportError, AttributeError) as e:
+            raise ValueError(f"política desconocida: {nombre} ({e})") from e
+        if not callable(fabrica):
+            raise ValueError(f"política desconocida: {nombre} ({base} no es una fábrica)")
+    return fabrica, argumento or None
+
+def crear_politica(nombre, azar, mano=USUARIO):
+    """ Política de nombre 'nombre' ("nombre" o "nombre:argumento"; ver el principio del módulo). """
+    fabrica, argumento = fabrica_politica(nombre)
+    return fabrica(argumento, azar, mano)
+
+# ==========================================
+# Partidas
+# ==========================================
+def _cronometrada(politica, tiempo):
+    """ Envuelve 'politica' para acumular en tiempo[0] su CPU y en tiempo[1] sus decisiones. """
+    def jugar(estado):
+        inicio = time.process_time()
+        movida = politica(estado)
+        tiempo[0] += time.process_time() - inicio
+        tiempo[1] += 1
+        return movida
+    return jugar
+
+def jugar_encuentro(args):
+    """
+    Juega el reparto 'partida' de 'semilla' con la política 'a' en el asiento 'asiento_a'
+    y 'b' en el otro (el que es mano se alterna con la partida, como en simulador.py).
+    Retorna (puntos de a, puntos de b, CPU de a, decisiones de a, CPU de b, decisiones de b).
+    """
+    a, b, semilla, partida, asiento_a = args
+    inicia = partida % 2
+    tiempos = ([0.0, 0], [0.0, 0])
+    politicas = [None, None]
+    for asiento, nombre, tiempo in ((asiento_a, a, tiempos[0]), (1 - asiento_a, b, tiempos[1])):
+        azar = random.Random(f"{semilla}:{partida}:{asiento}:{nombre}")
+        politicas[asiento] = _cronometrada(crear_politica(nombre, azar, inicia), tiempo)
+    estado = jugar_partida(barajar(semilla, partida), inicia, tuple(politicas))
+    puntos, _ = estado.score()
+    asientos = ("usuario", "oponente")
+    return (puntos[asientos[asiento_a]], puntos[asientos[1 - asiento_a]],
+            tiempos[0][0], tiempos[0][1], tiempos[1][0], tiempos[1][1])
+
+# ==========================================
+# Estadística
+# ==========================================
+def media_intervalo(valores):
+    """ (media, semiancho del intervalo de confianza del 95 % por aproximación normal). """
+    n = len(valores)
+    if not n:
+        return 0.0, 0.0
+    media = sum(valores) / n
+    if n < 2:
+        return media, float("inf")
+    varianza = sum((v - media) ** 2 for v in valores) / (n - 1)
+    return media, 1.96 * math.sqrt(varianza / n)
+
+def ajustar_elo(nombres, resultados, iteraciones=1000):
+    """
+    Elo de cada política por máxima verosimilitud (Bradley-Terry) con 'resultados'
+    {(a, b): (puntuación de a, partidas)}, donde la victoria vale 1 y el empate 0.5.
+    Cada pareja lleva además un empate ficticio para que las políticas que lo ganan
+    o lo pierden todo no se vayan al infinito. La media de los Elo es 0.
+    """
+    fuerza = {p: 1.0 for p in nombres}
+    ganadas = {p: 0.0 for p in nombres}
+    jugadas = {}
+    for (a, b), (puntuacion, n) in resultados.items():
+        ganadas[a] += puntuacion + 0.5
+        ganadas[b] += n - puntuacion + 0.5
+        jugadas[a, b] = jugadas[b, a] = n + 1
+    for _ in range(iteraciones):
+        nueva = {}
+        for p in nombres:
+            denominador = sum(n / (fuerza[p] + fuerza[q]) for (r, q), n in jugadas.items() if r == p)
+            nueva[p] = ganadas[p] / denominador if denominador else fuerza[p]
+        cambio = max(abs(math.log(nueva[p] / fuerza[p])) for p in nombres)
+        fuerza = nueva
+        if cambio < 1e-10:
+            break
+    elo = {p: 400 * math.log10(fuerza[p]) for p in nombres}
+    media = sum(elo.values()) / len(elo)
+    return {p: elo[p] - media for p in nombres}
+
+# ==========================================
+# Arena
+# ==========================================
+def arena(nombres, n=100, semilla=0, procesos=None, informe=sys.stderr):
+    """
+    Juega todas las parejas de 'nombres' sobre los repartos 0..n-1 de 'semilla', cada
+    uno dos veces con los asientos cambiados, en 'procesos' procesos. Retorna un
+    diccionario con los resultados por pareja y por política.
+    """
+    for nombre in nombres:
+        fabrica_politica(nombre)   # falla aquí, no en los procesos, si no existe
+    parejas = list(itertools.combinations(nombres, 2))
+    trabajos = [(a, b, semilla, partida, asiento)
+                for a, b in parejas for partida in range(n) for asiento in (USUARIO, OPONENTE)]
+    cpu = {p: 0.0 for p in nombres}
+    decisiones = {p: 0 for p in nombres}
+    margenes = {pareja: [] for pareja in parejas}
+    puntuaciones = {pareja: [] for pareja in parejas}
+    inicio = time.perf_counter()
+    pool = multiprocessing.Pool(procesos) if procesos != 1 else None
+    try:
+        if pool is None:
+            encuentros = map(jugar_encuentro, trabajos)
+        else:
+            trozo = max(1, len(trabajos) // ((procesos or multiprocessing.cpu_count()) * 16))
+            encuentros = pool.imap(jugar_encuentro, trabajos, chunksize=trozo)
+        for k, (trabajo, (pa, pb, cpu_a, dec_a, cpu_b, dec_b)) in enumerate(zip(trabajos, encuentros), 1):
+            a, b = trabajo[0], trabajo[1]
+            cpu[a] += cpu_a
+            cpu[b] += cpu_b
+            decisiones[a] += dec_a
+            decisiones[b] += dec_b
+            margenes[a, b].append(pa - pb)
+            puntuaciones[a, b].append(1.0 if pa > pb else 0.5 if pa == pb else 0.0)
+            if informe and k % 1000 == 0:
+                print(f"{k}/{len(trabajos)} partidas ({k / (time.perf_counter() - inicio):.1f}/s)", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    resumen = {"repartos": n, "semilla": semilla, "segundos": time.perf_counter() - inicio, "parejas": []}
+    resultados = {}
+    for a, b in parejas:
+        # Los intervalos se calculan sobre cada reparto (sus dos partidas juntas), que son independientes.
+        m, p = margenes[a, b], puntuaciones[a, b]
+        margen, margen_ic = media_intervalo([(m[i] + m[i + 1]) / 2 for i in range(0, len(m), 2)])
+        tasa, tasa_ic = media_intervalo([(p[i] + p[i + 1]) / 2 for i in range(0, len(p), 2)])
+        resultados[a, b] = (sum(p), len(p))
+        resumen["parejas"].append({
+            "a": a, "b": b, "partidas": len(p),
+            "victorias_a": p.count(1.0), "empates": p.count(0.5), "victorias_b": p.count(0.0),
+            "tasa_a": tasa, "tasa_a_ic": tasa_ic, "margen_a": margen, "margen_a_ic": margen_ic,
+        })
+    elo = ajustar_elo(nombres, resultados)
+    resumen["politicas"] = [{"nombre": p, "elo": elo[p], "cpu_s": cpu[p], "decisiones": decisiones[p],
+                             "ms_por_decision": 1000 * cpu[p] / decisiones[p] if decisiones[p] else 0.0}
+                            for p in sorted(nombres, key=lambda p: -elo[p])]
+    return resumen
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Enfrenta políticas de Escoba y estima su fuerza.")
+    parser.add_argument("politicas", nargs="+", help="políticas (azar, voraz, neto, expectimax:N, limitado:MS, "
+                                                     "pimc:M, valoracion:F o modulo.fabrica[:argumento])")
+    parser.add_argument("-n", "--repartos", type=int, default=100,
+                        help="repartos por pareja (cada uno se juega dos veces, cambiando los asientos)")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de los repartos")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--salida", default=None, help="guarda el resumen en este fichero JSON")
+    args = parser.parse_args(argv)
+    if len(set(args.politicas)) < 2:
+        parser.error("hacen falta al menos dos políticas distintas")
+    try:
+        for nombre in args.politicas:
+            fabrica_politica(nombre)
+    except ValueError as e:
+        parser.error(str(e))
+    resumen = arena(list(dict.fromkeys(args.politicas)), args.repartos, args.semilla, args.procesos)
+    print(f"{resumen['repartos']} repartos por pareja en {resumen['segundos']:.1f} s\n")
+    for p in resumen["parejas"]:
+        print(f"{p['a']} contra {p['b']}: {p['victorias_a']}-{p['empates']}-{p['victorias_b']}, "
+              f"tasa {100 * p['tasa_a']:.1f} ± {100 * p['tasa_a_ic']:.1f} %, "
+              f"margen {p['margen_a']:+.3f} ± {p['margen_a_ic']:.3f} puntos")
+    print(f"\n{'política':<20} {'Elo':>7} {'ms CPU/decisión':>16}")
+    for p in resumen["politicas"]:
+        print(f"{p['nombre']:<20} {p['elo']:>+7.0f} {p['ms_por_decision']:>16.3f}")
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resumen, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Banco de pruebas de rendimiento de las funciones críticas del consejero:
+combinaciones_que_suman, evaluar_movida, sugerir_mejor_jugada y calcular_puntuacion_final.
+
+Se miden sobre un corpus fijo de posiciones (de la primera jugada de un reparto a
+mesas de 8 a 12 cartas bajas, el peor caso para las combinaciones). Para cada función
+y posición se mide el tiempo por llamada (mínimo y mediana de varias repeticiones) y
+el pico de memoria reservada en una llamada (tracemalloc). Antes de cada llamada se
+vacían todas las memorias de escoba.py (limpiar_caches), así que los tiempos son "en frío".
+
+La salida es JSON. Con --guardar se guarda como referencia y con --comparar se compara
+con una referencia guardada: se marcan como regresión las medidas que empeoran más de
+la tolerancia y el programa termina con código 1.
+
+Con --modulo se mide otro escoba.py, por ejemplo el de una versión anterior. Si no
+tiene GameState (la versión original, que trabaja sólo con listas), las posiciones se
+le pasan como el diccionario de estado de escoba() y no hay memorias que vaciar. La
+tabla de respuestas (respuestas.py) no se usa: se mide el cálculo.
+
+Uso:
+    python benchmark.py --guardar referencia.json
+    python benchmark.py --comparar referencia.json --tolerancia 0.10
+    git show 871ba4a:escoba.py > /tmp/original/escoba.py
+    python benchmark.py --modulo /tmp/original/escoba.py --guardar original.json
+    python benchmark.py --comparar original.json
+"""
+import argparse
+import builtins
+import contextlib
+import importlib.util
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import escoba
+
+def _cartas(texto):
+    return [escoba.parsear_carta(c) for c in texto.split(",")] if texto else []
+
+# Corpus fijo: (nombre, mesa, mano del usuario, capturadas usuario, capturadas oponente).
+# La baraja son todas las cartas restantes.
+CORPUS = [
+    ("inicio", "7o,5o,6b,5e", "2c,3e,10b", "", ""),
+    ("inicio_figuras", "8c,9e,10o,1b", "4o,7c,6e", "", ""),
+    ("medio_6", "1c,3o,4e,6b,2b,9c", "5o,7e,8b", "10c,5c,7b,3b,1o", "2o,9o,10e,6c"),
+    ("mesa_8_bajas", "1o,1c,2e,2b,3o,3c,4e,4b", "5o,6c,9b", "", ""),
+    ("mesa_10_bajas", "1o,1c,1e,2o,2b,3c,3e,4o,4b,5c", "5o,6c,9b", "", ""),
+    ("mesa_12_bajas", "1o,1c,1e,1b,2o,2c,2b,3o,3c,4e,4b,5e", "5o,6c,9b", "", ""),
+    ("final", "2c,6o", "3e,8b", "1o,1c,2o,3o,4o,5o,6c,7c,8c,9c,10c,1e,2e,4e,5e,6e,7e,9e,10e",
+     "7o,8o,9o,10o,3c,4c,5c,1b,2b,3b,4b,5b,6b,7b,8e"),
+]
+
+def cargar_modulo(ruta):
+    """ Carga el escoba.py de 'ruta' como un módulo aparte (para medir otra versión). """
+    spec = importlib.util.spec_from_file_location("escoba_medido", ruta)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+def posicion(modulo, nombre, mesa, mano, capt_usuario, capt_oponente):
+    """
+    Estado de una entrada del corpus para 'modulo': un GameState o, si el módulo no lo
+    tiene, el diccionario de estado de escoba().
+    """
+    mesa, mano = _cartas(mesa), _cartas(mano)
+    capturadas = (_cartas(capt_usuario), _cartas(capt_oponente))
+    vistas = mesa + mano + capturadas[0] + capturadas[1]
+    if not hasattr(modulo, "GameState"):
+        return {"mesa": mesa, "mano_usuario": mano, "baraja": modulo.remover_cartas(modulo.inicializar_baraja(), vistas),
+                "capturadas_usuario": capturadas[0], "capturadas_oponente": capturadas[1],
+                "escobas_usuario": 0, "escobas_oponente": 0, "last_capturador": None}
+    estado = modulo.GameState(mesa=modulo.a_mascara(mesa), manos=(modulo.a_mascara(mano), 0))
+    for jugador in (0, 1):
+        mascara = modulo.a_mascara(capturadas[jugador])
+        estado.baraja &= ~mascara
+        estado.capturadas[jugador] = mascara
+        estado.contadores[jugador] = modulo.rasgos_mascara(mascara)
+    return estado
+
+def _sugerir_silencioso(modulo, estado):
+    """ sugerir_mejor_jugada aceptando la opción por defecto y sin imprimir. """
+    entrada = builtins.input
+    builtins.input = lambda mensaje="": ""
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return modulo.sugerir_mejor_jugada(estado)
+    finally:
+        builtins.input = entrada
+
+def casos(modulo, estado):
+    """ Llamadas a medir para una posición: nombre de la función y llamada sin argumentos. """
+    if isinstance(estado, dict):
+        mesa, baraja, mano = estado["mesa"], estado["baraja"], estado["mano_usuario"]
+        capturadas = (estado["capturadas_usuario"], estado["capturadas_oponente"])
+    else:
+        mesa = modulo.de_mascara(estado.mesa)
+        baraja = modulo.de_mascara(estado.baraja)
+        mano = modulo.de_mascara(estado.manos[escoba.USUARIO])
+        capturadas = [modulo.de_mascara(m) for m in estado.capturadas]
+    carta = mano[0]
+    combos = modulo.combinaciones_que_suman(mesa, 15 - carta[0])
+    movida = ("captura", combos[0]) if combos else ("no captura", None)
+    dic = {"capturadas_usuario": capturadas[0], "capturadas_oponente": capturadas[1],
+           "escobas_usuario": 0, "escobas_oponente": 0}
+    return [
+        ("combinaciones_que_suman", lambda: [modulo.combinaciones_que_suman(mesa, 15 - c[0]) for c in mano]),
+        ("evaluar_movida", lambda: modulo.evaluar_movida(carta, mesa, baraja, movida)),
+        ("sugerir_mejor_jugada", lambda: _sugerir_silencioso(modulo, estado)),
+        ("calcular_puntuacion_final", lambda: modulo.calcular_puntuacion_final(dic)),
+    ]
+
+def _sin_memorias():
+    pass
+
+def medir(funcion, repeticiones=7, minimo=0.05, limpiar_caches=_sin_memorias, tam_caches=dict):
+    """
+    Tiempo por llamada en microsegundos (mínimo y mediana de 'repeticiones' tandas de al
+    menos 'minimo' segundos) y pico de memoria en KiB de una llamada.
+    """
+    # Cada llamada se mide en frío: limpiar_caches() tiene que vaciar todas las memorias.
+    limpiar_caches()
+    assert not any(tam_caches().values()), f"quedan memorias sin vaciar: {tam_caches()}"
+    tiempos = []
+    llamadas = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            limpiar_caches()
+            funcion()
+        transcurrido = time.perf_counter() - inicio
+        if transcurrido >= minimo or llamadas >= 1 << 20:
+            break
+        llamadas *= 2
+    tiempos.append(transcurrido / llamadas)
+    for _ in range(repeticiones - 1):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            limpiar_caches()
+            funcion()
+        tiempos.append((time.perf_counter() - inicio) / llamadas)
+    limpiar_caches()
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"min_us": min(tiempos) * 1e6, "mediana_us": statistics.median(tiempos) * 1e6,
+            "llamadas": llamadas, "pico_kib": pico / 1024}
+
+def ejecutar(filtro=None, repeticiones=7, modulo=escoba):
+    """ Mide todo el corpus con 'modulo' (escoba o otra versión). Devuelve el informe como diccionario. """
+    memorias = {}
+    if hasattr(modulo, "limpiar_caches"):
+        memorias = {"limpiar_caches": modulo.limpiar_caches, "tam_caches": modulo.tam_caches}
+    # Sin la tabla de respuestas: el informe no depende de si existe respuestas.bin.
+    respuestas = getattr(modulo, "RESPUESTAS", None)
+    if hasattr(modulo, "RESPUESTAS"):
+        modulo.RESPUESTAS = False
+    try:
+        resultados = {}
+        for entrada in CORPUS:
+            estado = posicion(modulo, *entrada)
+            for funcion, llamada in casos(modulo, estado):
+                clave = f"{funcion}/{entrada[0]}"
+                if filtro and filtro not in clave:
+                    continue
+                resultados[clave] = medir(llamada, repeticiones, **memorias)
+    finally:
+        if hasattr(modulo, "RESPUESTAS"):
+            modulo.RESPUESTAS = respuestas
+    return {"python": platform.python_version(), "modulo": getattr(modulo, "__file__", None),
+            "numpy": getattr(modulo, "np", None) is not None,
+            "vectorizar": getattr(modulo, "VECTORIZAR", False),
+            "mesa_vectorizada": getattr(modulo, "MESA_VECTORIZADA", None), "respuestas": False,
+            "resultados": resultados}
+
+def comparar(actual, referencia, tolerancia=0.10):
+    """
+    Compara dos informes. Devuelve una lista de (clave, medida, referencia, actual, cambio)
+    con las medidas que empeoran más de 'tolerancia'. El tiempo se compara por el mínimo,
+    que es la medida menos sensible a la carga de la máquina.
+    """
+    regresiones = []
+    for clave, medida in actual["resultados"].items():
+        base = referencia["resultados"].get(clave)
+        if base is None:
+            continue
+        for campo in ("min_us", "pico_kib"):
+            if base[campo] > 0 and medida[campo] > base[campo] * (1 + tolerancia):
+                regresiones.append((clave, campo, base[campo], medida[campo], medida[campo] / base[campo] - 1))
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banco de pruebas de rendimiento del consejero de Escoba.")
+    parser.add_argument("--salida", default=None, help="fichero JSON para el informe (por defecto, la salida estándar)")
+    parser.add_argument("--guardar", default=None, metavar="FICHERO", help="guarda el informe como referencia")
+    parser.add_argument("--comparar", default=None, metavar="FICHERO", help="compara con una referencia guardada")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="empeoramiento admitido (0.10 = 10%%)")
+    parser.add_argument("--filtro", default=None, help="sólo las medidas cuyo nombre contiene este texto")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    parser.add_argument("--modulo", default=None, metavar="ESCOBA_PY",
+                        help="mide este escoba.py en lugar del actual (por ejemplo, el de otra versión)")
+    args = parser.parse_args(argv)
+
+    modulo = cargar_modulo(args.modulo) if args.modulo else escoba
+    informe = ejecutar(args.filtro, args.repeticiones, modulo)
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        regresiones = comparar(informe, referencia, args.tolerancia)
+        for clave, campo, antes, ahora, cambio in regresiones:
+            print(f"REGRESIÓN {clave} {campo}: {antes:.1f} -> {ahora:.1f} (+{cambio:.0%})", file=sys.stderr)
+        if regresiones:
+            return 1
+        print("Sin regresiones respecto a la referencia.", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,662 @@
+# -*- coding: utf-8 -*-
+"""
+Búsqueda a varias jugadas para el consejero de Escoba.
+
+Expectimax sobre: jugada del que mueve, carta que roba el rival (uniforme entre las
+cartas que no se ven) y jugada del rival, con la profundidad que se quiera. El valor
+de una jugada es, como en evaluar_movida, lo que gana quien la hace menos lo que
+espera ganar después su rival; con profundidad 1 coincide exactamente con
+evaluar_jugadas (el último nivel usa expectativa_oponente).
+
+Las posiciones se identifican con un hash de Zobrist de (mesa, cartas no vistas,
+manos conocidas, contadores de los montones, lado que mueve) y se guardan en una
+tabla de transposición acotada, de modo que las posiciones a las que se llega por
+órdenes de jugadas distintos no se vuelven a buscar. El hash sólo ve la clase de cada
+carta (valor y si es de oros), así que las posiciones que difieren en los palos
+intercambiables (ver escoba.canonizar) comparten casilla. Las jugadas se ordenan por
+puntos inmediatos, con la mejor jugada guardada en la tabla en primer lugar.
+
+Con un límite de tiempo por decisión, BusquedaLimitada profundiza iterativamente
+(1 jugada, 2, 3...) y devuelve la última profundidad completada.
+
+También incluye un modo Monte Carlo con información perfecta (PIMC), que muestrea
+repartos de la mano oculta del rival y de la baraja y juega cada uno a la vista, y un
+minimax exacto para el final, cuando ya no quedan cartas por repartir.
+"""
+import collections
+import itertools
+import multiprocessing
+import random
+import time
+
+import escoba
+from escoba import (BIT, VALOR, CLASE, USUARIO, JUGADORES, BARAJA_COMPLETA, MASCARA_VELO, MASCARA_SIETES,
+                    MASCARA_OROS, GameState, canonica, indices, contar_cartas, indice_capturas, jugadas_carta, puntos_movida,
+                    rasgos_mascara, sumar_contadores, expectativa_oponente, evaluar_jugadas)
+from simulador import a_mascara_indices, continuar_partida
+
+# ==========================================
+# Hash de Zobrist
+# ==========================================
+_azar = random.Random(0x35C0BA)
+
+def _claves_zona():
+    """ Clave por carta para una zona: la misma para todas las cartas de una clase. """
+    por_clase = [_azar.getrandbits(64) for _ in range(20)]
+    return tuple(por_clase[CLASE[i]] for i in range(40))
+
+# Claves por carta para cada zona: mesa, no vistas, mano del usuario, mano del oponente.
+# Las claves de las cartas se suman (no se combinan con XOR, que anularía dos cartas
+# de la misma clase): la parte de las cartas es la suma de las claves de cada clase
+# por el número de cartas de la clase en la zona, igual en las posiciones equivalentes.
+Z_MESA = _claves_zona()
+Z_OCULTAS = _claves_zona()
+Z_MANO = (_claves_zona(), _claves_zona())
+Z_LADO = _azar.getrandbits(64)
+# Los contadores sólo importan hasta sus topes (21 cartas, 3 sietes, 6 oros), así que
+# se recortan antes de hashearlos: montones que difieren por encima del tope comparten clave.
+TOPES = (21, 3, 6, 1)
+Z_CONTADORES = tuple(tuple(tuple(_azar.getrandbits(64) for _ in range(tope + 1)) for tope in TOPES)
+                     for _ in range(2))
+
+def _zobrist_cartas(zona, mascara):
+    return sum(zona[i] for i in indices(mascara))
+
+def clave_cartas(mesa, manos, ocultas):
+    """
+    Parte de la clave de Zobrist que depende de dónde está cada carta. Al mover una
+    carta se resta la clave de su zona de origen y se suma la de la de destino.
+    """
+    return (_zobrist_cartas(Z_MESA, mesa) + _zobrist_cartas(Z_OCULTAS, ocultas)
+            + _zobrist_cartas(Z_MANO[0], manos[0]) + _zobrist_cartas(Z_MANO[1], manos[1]))
+
+def clave_posicion(cartas, contadores, lado):
+    """ Clave completa: la de las cartas, los contadores recortados y el lado que mueve. """
+    clave = cartas ^ (Z_LADO if lado else 0)
+    for jugador in (0, 1):
+        z = Z_CONTADORES[jugador]
+        c = contadores[jugador]
+        clave ^= (z[0][min(c[0], 21)] ^ z[1][min(c[1], 3)] ^ z[2][min(c[2], 6)] ^ z[3][c[3]])
+    return clave
+
+# ==========================================
+# Tabla de transposición
+# ==========================================
+class TablaTransposicion:
+    """
+    Tabla de transposición de tamaño fijo (potencia de 2), indexada por los bits bajos
+    de la clave. Cada casilla guarda (clave, profundidad, valor, mejor jugada, generación).
+    Reemplazo: se sobrescribe una casilla vacía, de la misma posición, de una búsqueda
+    anterior (otra generación) o con una profundidad no mayor que la nueva.
+    """
+    def __init__(self, bits=18):
+        self.mascara = (1 << bits) - 1
+        self.casillas = [None] * (1 << bits)
+        self.generacion = 0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def nueva_busqueda(self):
+        self.generacion += 1
+
+    def buscar(self, clave, profundidad):
+        """ Devuelve la casilla de la posición (o None) y si su valor sirve a esta profundidad. """
+        casilla = self.casillas[clave & self.mascara]
+        if casilla is not None and casilla[0] == clave and casilla[1] == profundidad:
+            self.aciertos += 1
+            if escoba.PERFIL is not None:
+                escoba.PERFIL.contar("tabla_aciertos")
+            return casilla, True
+        self.fallos += 1
+        if escoba.PERFIL is not None:
+            escoba.PERFIL.contar("tabla_fallos")
+        if casilla is not None and casilla[0] == clave:
+            return casilla, False
+        return None, False
+
+    def guardar(self, clave, profundidad, valor, mejor):
+        pos = clave & self.mascara
+        casilla = self.casillas[pos]
+        if (casilla is None or casilla[0] == clave or casilla[4] != self.generacion
+                or casilla[1] <= profundidad):
+            self.casillas[pos] = (clave, profundidad, valor, mejor, self.generacion)
+
+    def limpiar(self):
+        self.casillas = [None] * (self.mascara + 1)
+        self.aciertos = self.fallos = 0
+
+# ==========================================
+# Expectimax
+# ==========================================
+class TiempoAgotado(Exception):
+    """ La búsqueda ha llegado a su límite de tiempo. """
+
+class Expectimax:
+    """
+    Búsqueda expectimax con tabla de transposición. Una posición es
+    (mesa, manos, ocultas, contadores, lado): 'manos' son las manos conocidas (0 si
+    no se conoce), 'ocultas' las cartas cuyo paradero no se conoce. Si el lado que
+    mueve no tiene mano conocida, su carta se sortea entre las ocultas.
+    Con 'valoracion' (ver valoracion.py) las jugadas se puntúan con la valoración
+    aprendida de los montones en lugar de con puntos_movida.
+    """
+    def __init__(self, tabla=None, valoracion=None):
+        self.tabla = tabla if tabla is not None else TablaTransposicion()
+        self.valoracion = valoracion
+        self.nodos = 0
+        # Instante (time.perf_counter) en que se abandona la búsqueda con TiempoAgotado.
+        self.limite = None
+
+    def puntos(self, contadores, lado, captura, escobas):
+        """ Puntos de 'lado' por capturar 'captura' (con la carta), con puntos_movida o la valoración. """
+        if self.valoracion is None:
+            return puntos_movida(contadores[lado], captura, escobas)
+        return self.valoracion.puntos(contadores[lado], contadores[1 - lado], captura, escobas)
+
+    def jugadas_ordenadas(self, mesa, carta, contadores, lado, mejor=None):
+        """
+        Jugadas (carta, captura) de 'carta' de 'lado' con sus puntos inmediatos, ordenadas
+        de más a menos puntos y con 'mejor' (la de la tabla) delante.
+        """
+        movidas = []
+        for combo in indice_capturas(mesa).combos(15 - VALOR[carta]):
+            movidas.append(((carta, combo), self.puntos(contadores, lado, combo | BIT[carta], 1 if combo == mesa else 0)))
+        if not movidas:
+            return [((carta, 0), 0)]
+        movidas.sort(key=lambda m: (m[0] != mejor, -m[1]))
+        return movidas
+
+    def valor_jugada(self, movida, pts, mesa, manos, ocultas, contadores, lado, profundidad, cartas, desde_mano):
+        """ Puntos de la jugada menos el valor para el rival de la posición resultante. """
+        if profundidad == 0:
+            return pts
+        carta, captura = movida
+        bit = BIT[carta]
+        if desde_mano:
+            manos = (manos[0] & ~bit, manos[1]) if lado == 0 else (manos[0], manos[1] & ~bit)
+            cartas -= Z_MANO[lado][carta]
+        else:
+            ocultas &= ~bit
+            cartas -= Z_OCULTAS[carta]
+        if captura:
+            nueva_mesa = mesa & ~captura
+            for i in indices(captura):
+                cartas -= Z_MESA[i]
+            ganados = sumar_contadores(contadores[lado], rasgos_mascara(captura | bit))
+            contadores = (ganados, contadores[1]) if lado == 0 else (contadores[0], ganados)
+        else:
+            nueva_mesa = mesa | bit
+            cartas += Z_MESA[carta]
+        return pts - self.valor(nueva_mesa, manos, ocultas, contadores, 1 - lado, profundidad, cartas)
+
+    def valor(self, mesa, manos, ocultas, contadores, lado, profundidad, cartas=None):
+        """
+        Valor esperado para 'lado' de la posición si le toca mover, mirando 'profundidad'
+        jugadas por delante. 'cartas' es la parte de la clave de Zobrist de las cartas.
+        """
+        if profundidad == 0:
+            return 0
+        self.nodos += 1
+        if escoba.PERFIL is not None:
+            escoba.PERFIL.contar("nodos")
+        if self.limite is not None and time.perf_counter() > self.limite:
+            raise TiempoAgotado
+        if cartas is None:
+            cartas = clave_cartas(mesa, manos, ocultas)
+        clave = clave_posicion(cartas, contadores, lado)
+        casilla, vale = self.tabla.buscar(clave, profundidad)
+        if vale:
+            return casilla[2]
+        mejor_previa = casilla[3] if casilla is not None else None
+        mano = manos[lado]
+        mejor = None
+        if mano:
+            valor = None
+            for carta in indices(mano):
+                for movida, pts in self.jugadas_ordenadas(mesa, carta, contadores, lado, mejor_previa):
+                    v = self.valor_jugada(movida, pts, mesa, manos, ocultas, contadores, lado,
+                                          profundidad - 1, cartas, True)
+                    if valor is None or v > valor:
+                        valor, mejor = v, movida
+        elif ocultas:
+            if profundidad == 1:
+                # Último nivel: la misma media que evaluar_movida, vectorizada si hay NumPy.
+                if self.valoracion is None:
+                    valor = expectativa_oponente(mesa, ocultas, contadores[lado])
+                else:
+                    valor = self.valoracion.expectativa(mesa, ocultas, contadores[lado], contadores[1 - lado])
+            else:
+                total = 0
+                for carta in indices(ocultas):
+                    mejor_carta = None
+                    for movida, pts in self.jugadas_ordenadas(mesa, carta, contadores, lado):
+                        v = self.valor_jugada(movida, pts, mesa, manos, ocultas, contadores, lado,
+                                              profundidad - 1, cartas, False)
+                        if mejor_carta is None or v > mejor_carta:
+                            mejor_carta = v
+                    total += mejor_carta
+                valor = total / contar_cartas(ocultas)
+        elif manos[1 - lado]:
+            # Este lado ya no tiene cartas: juega el rival.
+            valor = -self.valor(mesa, manos, ocultas, contadores, 1 - lado, profundidad, cartas)
+        else:
+            valor = 0
+        self.tabla.guardar(clave, profundidad, valor, mejor)
+        return valor
+
+    def evaluar(self, estado, movidas, jugador, profundidad=2, deck=None):
+        """
+        Evalúa las 'movidas' de 'jugador' en el GameState 'estado' mirando 'profundidad'
+        jugadas por delante de cada una. 'deck' son las cartas que no ve 'jugador' (por
+        defecto, estado.no_vistas(jugador)). Retorna, como evaluar_jugadas, una lista de
+        (movida, neto, puntos_jugador, expectativa_rival, nueva_mesa).
+        """
+        self.tabla.nueva_busqueda()
+        manos = (estado.manos[USUARIO], 0) if jugador == USUARIO else (0, estado.manos[jugador])
+        ocultas = estado.no_vistas(jugador) if deck is None else deck
+        contadores = tuple(estado.contadores)
+        cartas = clave_cartas(estado.mesa, manos, ocultas)
+        evaluaciones = []
+        for movida in movidas:
+            carta, captura = movida
+            bit = BIT[carta]
+            desde_mano = bool(manos[jugador] & bit)
+            ocultas_movida, cartas_movida = ocultas, cartas
+            if not desde_mano and not ocultas & bit:
+                # Carta del rival que ya no está entre las no vistas: se juega desde ellas.
+                ocultas_movida, cartas_movida = ocultas | bit, cartas + Z_OCULTAS[carta]
+            pts = self.puntos(contadores, jugador, captura | bit, 1 if captura == estado.mesa else 0) if captura else 0
+            neto = self.valor_jugada(movida, pts, estado.mesa, manos, ocultas_movida, contadores, jugador,
+                                     profundidad, cartas_movida, desde_mano)
+            nueva_mesa = estado.mesa & ~captura if captura else estado.mesa | bit
+            evaluaciones.append((movida, neto, pts, pts - neto, nueva_mesa))
+        return evaluaciones
+
+def evaluador_expectimax(profundidad=2, tabla=None, valoracion=None):
+    """
+    Devuelve una función con la firma de evaluar_jugadas que usa expectimax a
+    'profundidad' jugadas, con una tabla de transposición que se conserva entre llamadas.
+    Con 'valoracion', las jugadas se puntúan con ella (ver Expectimax).
+    """
+    busqueda = Expectimax(tabla, valoracion)
+    def evaluar(estado, movidas, jugador, deck=None):
+        return busqueda.evaluar(estado, movidas, jugador, profundidad, deck)
+    evaluar.busqueda = busqueda
+    return evaluar
+
+# ==========================================
+# Profundización iterativa con límite de tiempo
+# ==========================================
+class BusquedaLimitada:
+    """
+    Búsqueda "anytime": evalúa a 1 jugada (evaluar_jugadas, siempre se completa) y
+    luego con expectimax a 2, 3... jugadas mientras quede tiempo. Si el límite llega a
+    mitad de una profundidad, esa profundidad se descarta y se devuelve la última
+    completa. La tabla de transposición se comparte entre profundidades y decisiones,
+    así que cada iteración aprovecha las anteriores. detener() (desde otro hilo) acaba
+    la búsqueda en curso como si se hubiera agotado el tiempo; cada búsqueda empieza sin
+    detener.
+    """
+    def __init__(self, limite_ms, profundidad_max=8, tabla=None, valoracion=None):
+        self.limite_ms = limite_ms
+        self.profundidad_max = profundidad_max
+        self.expectimax = Expectimax(tabla, valoracion)
+        self.profundidad = 0
+        self.detenida = False
+
+    def buscar(self, estado, movidas, jugador, deck=None):
+        """
+        Retorna (evaluaciones como evaluar_jugadas, profundidad alcanzada). Si el límite
+        llega antes de acabar la pasada a 1 jugada, las jugadas se valoran sólo por sus
+        puntos, sin la respuesta del rival, y la profundidad alcanzada es 0.
+        """
+        self.detenida = False
+        limite = time.perf_counter() + self.limite_ms / 1000
+        valoracion = self.expectimax.valoracion
+        evaluar = evaluar_jugadas if valoracion is None else valoracion.evaluar
+        # La pasada a 1 jugada se hace jugada a jugada para poder mirar el límite entre ellas.
+        evaluaciones = []
+        for movida in movidas:
+            if self.detenida or time.perf_counter() >= limite:
+                self.profundidad = 0
+                return evaluar(estado, movidas, jugador, 0), 0
+            evaluaciones.extend(evaluar(estado, [movida], jugador, deck))
+        profundidad = 1
+        self.expectimax.limite = 0 if self.detenida else limite
+        try:
+            while (profundidad < self.profundidad_max and len(movidas) > 1 and not self.detenida
+                   and time.perf_counter() < limite):
+                evaluaciones = self.expectimax.evaluar(estado, movidas, jugador, profundidad + 1, deck)
+                profundidad += 1
+        except TiempoAgotado:
+            pass
+        finally:
+            self.expectimax.limite = None
+        self.profundidad = profundidad
+        return evaluaciones, profundidad
+
+    def evaluar(self, estado, movidas, jugador, deck=None):
+        return self.buscar(estado, movidas, jugador, deck)[0]
+
+    def detener(self):
+        self.detenida = True
+        self.expectimax.limite = 0
+
+def evaluador_limitado(limite_ms, profundidad_max=8, tabla=None, informe=None):
+    """
+    Devuelve una función con la firma de evaluar_jugadas que busca con profundización
+    iterativa durante 'limite_ms' milisegundos. Si se da 'informe', se llama con la
+    profundidad alcanzada y los milisegundos empleados en cada decisión.
+    """
+    busqueda = BusquedaLimitada(limite_ms, profundidad_max, tabla)
+    def evaluar(estado, movidas, jugador, deck=None):
+        inicio = time.perf_counter()
+        evaluaciones, profundidad = busqueda.buscar(estado, movidas, jugador, deck)
+        if informe is not None:
+            informe(profundidad, (time.perf_counter() - inicio) * 1000)
+        return evaluaciones
+    evaluar.busqueda = busqueda
+    return evaluar
+
+# ==========================================
+# Monte Carlo con información perfecta (PIMC)
+# ==========================================
+def politica_informacion_completa(estado):
+    """
+    Política de las simulaciones con información perfecta: la jugada de mayor valor
+    neto, promediando la respuesta del rival sobre las cartas de su mano (que se conoce)
+    en lugar de sobre todas las no vistas.
+    """
+    jugador = estado.turno
+    rival = estado.manos[1 - jugador]
+    evaluaciones = evaluar_jugadas(estado, estado.legal_moves(jugador), jugador, rival or estado.baraja)
+    return max(evaluaciones, key=lambda x: x[1])[0]
+
+def determinizar(estado, jugador, cartas_rival, azar):
+    """
+    Reparto compatible con lo que ve 'jugador': 'cartas_rival' cartas de las no vistas
+    van a la mano del rival y el resto forman la baraja en un orden al azar.
+    Devuelve (GameState con información completa, orden de la baraja).
+    """
+    ocultas = list(indices(estado.no_vistas(jugador)))
+    azar.shuffle(ocultas)
+    mundo = estado.copia()
+    mundo.historial = []
+    mundo.manos[1 - jugador] = a_mascara_indices(ocultas[:cartas_rival])
+    mundo.baraja = a_mascara_indices(ocultas[cartas_rival:])
+    mundo.turno = jugador
+    return mundo, ocultas[cartas_rival:]
+
+def _campos(estado):
+    return (estado.mesa, estado.baraja, tuple(estado.manos), tuple(estado.capturadas),
+            tuple(estado.contadores), tuple(estado.escobas), estado.ultimo)
+
+def _de_campos(campos):
+    mesa, baraja, manos, capturadas, contadores, escobas, ultimo = campos
+    estado = GameState(mesa=mesa, manos=manos, baraja=baraja)
+    estado.capturadas = list(capturadas)
+    estado.contadores = list(contadores)
+    estado.escobas = list(escobas)
+    estado.ultimo = ultimo
+    return estado
+
+def _simulaciones(args):
+    """
+    Trabajo de un proceso: para cada muestra de 'muestras', un reparto determinizado en el
+    que se juega cada una de las 'movidas' y el resto de la partida con información completa.
+    Si se da 'fin' (segundos de time.time()), para tras la primera muestra que acaba después.
+    Devuelve, por movida, la suma de las diferencias finales de puntos para 'jugador', y
+    el número de muestras hechas.
+    """
+    campos, jugador, mano, movidas, cartas_rival, semilla, muestras, fin = args
+    estado = _de_campos(campos)
+    sumas = [0.0] * len(movidas)
+    politicas = (politica_informacion_completa, politica_informacion_completa)
+    hechas = 0
+    for muestra in muestras:
+        mundo, orden = determinizar(estado, jugador, cartas_rival, random.Random(f"{semilla}:{muestra}"))
+        for k, movida in enumerate(movidas):
+            partida = mundo.copia()
+            partida.apply(movida, jugador)
+            continuar_partida(partida, orden, mano, politicas)
+            puntos, _ = partida.score()
+            sumas[k] += puntos[JUGADORES[jugador]] - puntos[JUGADORES[1 - jugador]]
+        hechas += 1
+        if fin is not None and time.time() >= fin:
+            break
+    return sumas, hechas
+
+class PIMC:
+    """
+    Búsqueda Monte Carlo con información perfecta sobre la mano oculta del rival. Cada
+    muestra reparte las cartas no vistas de forma compatible (la mano del rival y el orden
+    de la baraja, que se reparte en tandas de 3) y, con todo a la vista, juega cada jugada
+    candidata hasta el final de la partida. El valor de una jugada es la diferencia media
+    de puntos finales. Se hacen 'muestras' muestras o, si se da 'tiempo' (ms), las que
+    quepan en ese tiempo, repartidas entre 'procesos' procesos; cada proceso mira el
+    límite tras cada muestra, así que se pasa como mucho en una muestra por proceso.
+    'mano' es el jugador que recibe primero en cada reparto.
+    """
+    LOTE = 4
+
+    def __init__(self, muestras=64, tiempo=None, procesos=1, semilla=0, mano=USUARIO):
+        self.muestras = muestras
+        self.tiempo = tiempo
+        self.procesos = procesos
+        self.semilla = semilla
+        self.mano = mano
+        self.pool = None
+        self.decisiones = 0
+
+    def cerrar(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def _lotes(self):
+        """ Índices de muestra en lotes; sin límite de tiempo, hasta completar 'muestras'. """
+        base = self.decisiones * 1000003
+        inicio = 0
+        while self.tiempo is not None or inicio < self.muestras:
+            fin = inicio + self.LOTE if self.tiempo is not None else min(inicio + self.LOTE, self.muestras)
+            yield list(range(base + inicio, base + fin))
+            inicio = fin
+
+    def _resultados(self, trabajos):
+        """
+        Resultados de los trabajos en orden. Con varios procesos se mantienen como mucho
+        dos lotes por proceso en marcha, para poder parar en cuanto se acaba el tiempo.
+        """
+        if self.procesos == 1:
+            yield from map(_simulaciones, trabajos)
+            return
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.procesos)
+        en_marcha = collections.deque()
+        for trabajo in itertools.islice(trabajos, 2 * (self.procesos or multiprocessing.cpu_count())):
+            en_marcha.append(self.pool.apply_async(_simulaciones, (trabajo,)))
+        while en_marcha:
+            yield en_marcha.popleft().get()
+            trabajo = next(trabajos, None)
+            if trabajo is not None:
+                en_marcha.append(self.pool.apply_async(_simulaciones, (trabajo,)))
+
+    def valores(self, estado, movidas, jugador):
+        """ Diferencia media de puntos finales de cada jugada y número de muestras usadas. """
+        self.decisiones += 1
+        cartas_rival = cartas_rival_estimadas(estado, jugador, self.mano)
+        campos = _campos(estado)
+        # El límite se mira también en los procesos del grupo, tras cada muestra: se da
+        # con time.time(), que es el mismo reloj en todos ellos.
+        limite = None if self.tiempo is None else time.time() + self.tiempo / 1000
+        trabajos = ((campos, jugador, self.mano, movidas, cartas_rival, self.semilla, lote, limite)
+                    for lote in self._lotes())
+        sumas = [0.0] * len(movidas)
+        n = 0
+        for parcial, cuantas in self._resultados(trabajos):
+            for k, s in enumerate(parcial):
+                sumas[k] += s
+            n += cuantas
+            if limite is not None and time.time() >= limite:
+                break
+        return [s / n for s in sumas] if n else sumas, n
+
+    def evaluar(self, estado, movidas, jugador, deck=None):
+        """
+        Evalúa las 'movidas' de 'jugador' como evaluar_jugadas: lista de
+        (movida, neto, puntos_jugador, expectativa_rival, nueva_mesa), donde 'neto' es la
+        diferencia media de puntos finales. Si alguna carta no está en la mano de 'jugador'
+        (el oponente en escoba()), se recurre a evaluar_jugadas.
+        """
+        mano = estado.manos[jugador]
+        if not movidas or any(not mano & BIT[carta] for carta, _ in movidas):
+            return evaluar_jugadas(estado, movidas, jugador, deck)
+        netos, _ = self.valores(estado, movidas, jugador)
+        evaluaciones = []
+        for movida, neto in zip(movidas, netos):
+            carta, captura = movida
+            pts = puntos_movida(estado.contadores[jugador], captura | BIT[carta], 1 if captura == estado.mesa else 0) if captura else 0
+            nueva_mesa = estado.mesa & ~captura if captura else estado.mesa | BIT[carta]
+            evaluaciones.append((movida, neto, pts, pts - neto, nueva_mesa))
+        return evaluaciones
+
+def evaluador_pimc(muestras=64, tiempo=None, procesos=1, semilla=0):
+    """ Función con la firma de evaluar_jugadas que usa PIMC (ver la clase PIMC). """
+    busqueda = PIMC(muestras, tiempo, procesos, semilla)
+    def evaluar(estado, movidas, jugador, deck=None):
+        return busqueda.evaluar(estado, movidas, jugador, deck)
+    evaluar.busqueda = busqueda
+    return evaluar
+
+# ==========================================
+# Final exacto (sin cartas por repartir)
+# ==========================================
+# Cuentas por categoría de calcular_puntuacion_final: (velo, sietes, oros, cartas).
+_CATEGORIAS = (MASCARA_VELO, MASCARA_SIETES, MASCARA_OROS, BARAJA_COMPLETA)
+
+def cuentas_categorias(mascara):
+    return tuple(contar_cartas(mascara & m) for m in _CATEGORIAS)
+
+def _sumar_cuentas(cuentas, mascara):
+    return tuple(c + contar_cartas(mascara & m) for c, m in zip(cuentas, _CATEGORIAS))
+
+def cartas_rival_estimadas(estado, jugador, mano=USUARIO):
+    """
+    Cartas que tiene en la mano el rival de 'jugador' cuando éste va a mover: las mismas
+    que 'jugador' si es mano (recibe primero y empieza cada reparto) y una menos si no.
+    """
+    if estado.manos[1 - jugador]:
+        return contar_cartas(estado.manos[1 - jugador])
+    cartas = contar_cartas(estado.manos[jugador]) - (0 if jugador == mano else 1)
+    return max(0, min(cartas, contar_cartas(estado.no_vistas(jugador))))
+
+def es_final(estado, jugador, mano=USUARIO):
+    """
+    True si ya no queda nada por repartir: todas las cartas que 'jugador' no ve están en
+    la mano de su rival, así que la posición es de información completa.
+    """
+    if estado.manos[1 - jugador]:
+        return not estado.baraja
+    return contar_cartas(estado.no_vistas(jugador)) == cartas_rival_estimadas(estado, jugador, mano)
+
+class SolucionadorFinal:
+    """
+    Minimax exacto para el final de la partida, cuando se conocen todas las cartas.
+    Los valores son diferencias de puntos (usuario menos oponente) desde la posición
+    hasta el final: escobas que se hagan a partir de ahí y resultado de las categorías
+    de calcular_puntuacion_final, con el barrido de la mesa para el último que capturó.
+    Se memoriza por posición: (mesa, manos, lado que mueve, último que capturó y
+    cuentas por categoría de cada montón); las escobas ya hechas no influyen. La mesa
+    y las manos se guardan en forma canónica (escoba.canonica), así que los finales
+    que sólo difieren en los palos intercambiables se resuelven una vez.
+    """
+    def __init__(self):
+        self.memo = {}
+        self.nodos = 0
+
+    def valor(self, mesa, manos, cuentas, ultimo, lado):
+        """ Diferencia de puntos (usuario menos oponente) desde la posición con juego perfecto. """
+        if not manos[0] and not manos[1]:
+            if mesa and ultimo is not None:
+                cuentas = (_sumar_cuentas(cuentas[0], mesa), cuentas[1]) if ultimo == USUARIO else \
+                          (cuentas[0], _sumar_cuentas(cuentas[1], mesa))
+            return sum((u > o) - (o > u) for u, o in zip(cuentas[0], cuentas[1]))
+        if not manos[lado]:
+            lado = 1 - lado
+        clave = (canonica(mesa, manos[0], manos[1]), lado, ultimo, cuentas)
+        valor = self.memo.get(clave)
+        if escoba.PERFIL is not None:
+            escoba.PERFIL.contar("final_fallos" if valor is None else "final_aciertos")
+        if valor is not None:
+            return valor
+        self.nodos += 1
+        if escoba.PERFIL is not None:
+            escoba.PERFIL.contar("nodos")
+        mejor = None
+        for carta in indices(manos[lado]):
+            for movida in jugadas_carta(mesa, carta):
+                v = self.valor_jugada(movida, mesa, manos, cuentas, ultimo, lado)
+                if mejor is None or (v > mejor if lado == USUARIO else v < mejor):
+                    mejor = v
+        self.memo[clave] = mejor
+        return mejor
+
+    def valor_jugada(self, movida, mesa, manos, cuentas, ultimo, lado):
+        """ Diferencia de puntos (usuario menos oponente) tras la jugada de 'lado', con juego perfecto. """
+        carta, captura = movida
+        bit = BIT[carta]
+        manos = (manos[0] & ~bit, manos[1]) if lado == USUARIO else (manos[0], manos[1] & ~bit)
+        escoba = 0
+        if captura:
+            mesa &= ~captura
+            ganadas = _sumar_cuentas(cuentas[lado], captura | bit)
+            cuentas = (ganadas, cuentas[1]) if lado == USUARIO else (cuentas[0], ganadas)
+            ultimo = lado
+            if not mesa:
+                escoba = 1 if lado == USUARIO else -1
+        else:
+            mesa |= bit
+        return escoba + self.valor(mesa, manos, cuentas, ultimo, 1 - lado)
+
+    def evaluar(self, estado, movidas, jugador, mano=USUARIO):
+        """
+        Evalúa las 'movidas' de 'jugador' con juego perfecto de ambos hasta el final.
+        Si no se conoce la mano del rival, son todas las cartas que 'jugador' no ve.
+        Retorna, como evaluar_jugadas, (movida, neto, puntos_jugador, expectativa_rival,
+        nueva_mesa), donde 'neto' es la diferencia final exacta de puntos para 'jugador'
+        (incluidas las escobas ya hechas).
+        """
+        manos = list(estado.manos)
+        if not manos[1 - jugador]:
+            manos[1 - jugador] = estado.no_vistas(jugador)
+        cuentas = (cuentas_categorias(estado.capturadas[0]), cuentas_categorias(estado.capturadas[1]))
+        signo = 1 if jugador == USUARIO else -1
+        escobas = signo * (estado.escobas[0] - estado.escobas[1])
+        evaluaciones = []
+        for movida in movidas:
+            carta, captura = movida
+            neto = escobas + signo * self.valor_jugada(movida, estado.mesa, tuple(manos), cuentas,
+                                                       estado.ultimo, jugador)
+            pts = puntos_movida(estado.contadores[jugador], captura | BIT[carta], 1 if captura == estado.mesa else 0) if captura else 0
+            nueva_mesa = estado.mesa & ~captura if captura else estado.mesa | BIT[carta]
+            evaluaciones.append((movida, neto, pts, pts - neto, nueva_mesa))
+        return evaluaciones
+
+def con_final_exacto(evaluar, mano=USUARIO):
+    """
+    Envuelve una función con la firma de evaluar_jugadas para que, cuando ya no quedan
+    cartas por repartir y 'jugador' juega de su mano, use el SolucionadorFinal.
+    """
+    solucionador = SolucionadorFinal()
+    def evaluar_con_final(estado, movidas, jugador, deck=None):
+        mano_jugador = estado.manos[jugador]
+        if (movidas and all(mano_jugador & BIT[carta] for carta, _ in movidas)
+                and es_final(estado, jugador, mano)):
+            if len(solucionador.memo) > 1000000:
+                solucionador.memo.clear()
+            return solucionador.evaluar(estado, movidas, jugador, mano)
+        return evaluar(estado, movidas, jugador, deck)
+    evaluar_con_final.busqueda = getattr(evaluar, "busqueda", None)
+    evaluar_con_final.solucionador = solucionador
+    return evaluar_con_final
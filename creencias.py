@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Seguimiento bayesiano de la mano oculta del oponente.
+
+evaluar_movida da a cada carta no vista la misma probabilidad de ser la siguiente
+del oponente, pero sus jugadas dicen algo de lo que tiene: quien deja una carta en
+la mesa (o renuncia a capturar) probablemente no tenía otra con la que capturar, y
+quien hace una captura pobre probablemente no tenía una mejor.
+
+CreenciaMano guarda un peso por carta (un array de 40 números) proporcional a la
+probabilidad de que esté en la mano del oponente. Con cada jugada observada del
+oponente, las cartas no vistas que le habrían dado una captura mejor que la que
+hizo multiplican su peso por la probabilidad de renunciar a ella (verosimilitud del
+modelo). Con cada reparto empieza una mano nueva y los pesos vuelven a 1. La mejor
+captura sólo depende del valor de la carta y de sus rasgos (si es oro, siete o el
+siete de oros), así que se calcula una vez por clase de carta que queda por ver
+(como mucho 20) y luego una sola pasada por las cartas no vistas aplica los pesos.
+
+evaluador_creencia() devuelve un evaluador con la firma de evaluar_jugadas que
+pondera las respuestas del oponente con esos pesos. Sin jugadas observadas desde el
+último reparto los pesos son iguales y el resultado es el de evaluar_jugadas.
+
+Uso:
+    evaluar = evaluador_creencia()
+    evaluaciones = evaluar(estado, estado.legal_moves(USUARIO), USUARIO)
+"""
+import array
+
+from escoba import (BIT, VALOR, OPONENTE, _JUGADA, _REPARTO, _BARRIDO, _DE_BARAJA,
+                    indices, indice_capturas, puntos_movida, rasgos_mascara, evaluar_jugadas)
+
+# Clase de cada carta para la mejor captura: su valor y sus rasgos.
+_CLASE = [(VALOR[i], rasgos_mascara(BIT[i])) for i in range(40)]
+
+# Probabilidad de que el oponente haga una jugada peor que la que le daría una carta
+# que tiene (jugar de forma conservadora, no ver la captura...).
+RENUNCIA = 0.3
+
+class CreenciaMano:
+    """
+    Pesos de las cartas de la mano oculta de 'rival', vista por su contrario. Se
+    sincroniza con un GameState leyendo las entradas nuevas de su historial.
+    """
+    def __init__(self, rival=OPONENTE, renuncia=RENUNCIA):
+        self.rival = rival
+        self.renuncia = renuncia
+        self.pesos = array.array("d", [1.0]) * 40
+        self.historial = None    # historial (lista) del estado seguido
+        self.procesadas = 0      # entradas ya leídas
+        self.ultima = None       # última entrada leída, para detectar otra partida o un undo()
+        self.mesa = 0            # mesa tras las entradas leídas
+
+    def reiniciar(self):
+        """ Mano nueva: todas las cartas vuelven a pesar lo mismo. """
+        pesos = self.pesos
+        for i in range(40):
+            pesos[i] = 1.0
+
+    def observar(self, mesa, carta, captura, contadores, no_vistas):
+        """
+        Actualiza los pesos con la jugada (carta, captura) del rival sobre 'mesa', con
+        'contadores' de su montón antes de jugar. 'no_vistas' son las cartas que podía
+        tener en la mano.
+        """
+        if captura:
+            hecha = puntos_movida(contadores, captura | BIT[carta], 1 if captura == mesa else 0)
+        else:
+            hecha = 0
+        indice = indice_capturas(mesa)
+        pesos = self.pesos
+        mejores = {}    # clase -> ¿habría capturado mejor que la jugada hecha?
+        for i in indices(no_vistas & ~BIT[carta]):
+            clase = _CLASE[i]
+            mejor = mejores.get(clase)
+            if mejor is None:
+                pts = max((puntos_movida(contadores, combo | BIT[i], 1 if combo == mesa else 0)
+                           for combo in indice.combos(15 - VALOR[i])), default=0)
+                mejor = mejores[clase] = pts > hecha + 1e-9
+            if mejor:
+                pesos[i] *= self.renuncia
+
+    def _leer(self, entrada, no_vistas):
+        tipo = entrada[0]
+        if tipo == _JUGADA:
+            _, jugador, carta, captura, origen, _, _, contadores = entrada
+            if jugador == self.rival and origen == _DE_BARAJA:
+                self.observar(self.mesa, carta, captura, contadores, no_vistas)
+            if captura:
+                self.mesa &= ~captura
+            else:
+                self.mesa |= BIT[carta]
+        elif tipo == _REPARTO:
+            self.reiniciar()
+        elif tipo == _BARRIDO:
+            self.mesa = 0
+
+    def sincronizar(self, estado):
+        """
+        Lee las entradas del historial de 'estado' que aún no se han leído. Si el estado
+        es otro o se ha deshecho alguna entrada, vuelve a leer desde el último reparto.
+        """
+        historial = estado.historial
+        n = self.procesadas
+        if (historial is not self.historial or len(historial) < n
+                or (n and historial[n - 1] is not self.ultima)):
+            self._reconstruir(estado)
+            return
+        # Las cartas que salieron de las no vistas después no importan: no estaban en su mano.
+        no_vistas = estado.no_vistas(1 - self.rival)
+        for entrada in historial[n:]:
+            self._leer(entrada, no_vistas)
+        self._marcar(historial)
+
+    def _reconstruir(self, estado):
+        inicio = estado.copia()
+        while inicio.historial and inicio.historial[-1][0] != _REPARTO:
+            inicio.undo()
+        self.reiniciar()
+        self.mesa = inicio.mesa
+        no_vistas = estado.no_vistas(1 - self.rival)
+        for entrada in estado.historial[len(inicio.historial):]:
+            self._leer(entrada, no_vistas)
+        self._marcar(estado.historial)
+
+    def _marcar(self, historial):
+        self.historial = historial
+        self.procesadas = len(historial)
+        self.ultima = historial[-1] if historial else None
+
+    def probabilidades(self, deck):
+        """ {índice de carta: probabilidad de ser la siguiente del rival} sobre 'deck' (máscara). """
+        cartas = list(indices(deck))
+        total = sum(self.pesos[i] for i in cartas)
+        if not total:
+            return {i: 1 / len(cartas) for i in cartas}
+        return {i: self.pesos[i] / total for i in cartas}
+
+def evaluador_creencia(creencia=None, evaluar=evaluar_jugadas):
+    """
+    Devuelve una función con la firma de evaluar_jugadas que, cuando juega el contrario
+    del rival de 'creencia', pondera las respuestas del rival con sus pesos. 'evaluar'
+    debe aceptar el argumento 'pesos' como evaluar_jugadas.
+    """
+    if creencia is None:
+        creencia = CreenciaMano()
+    def evaluar_con_creencia(estado, movidas, jugador, deck=None):
+        if jugador == creencia.rival:
+            return evaluar(estado, movidas, jugador, deck)
+        creencia.sincronizar(estado)
+        return evaluar(estado, movidas, jugador, deck, creencia.pesos)
+    evaluar_con_creencia.creencia = creencia
+    return evaluar_con_creencia
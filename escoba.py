@@ -19,6 +19,23 @@ Nota: El velo cuenta para las 4 categorías; los sietes que no sean el velo cuen
 los oros que no sean el velo cuentan para oros y cartas; el resto de cartas sólo cuentan para cartas.
 """
 
+import nucleo
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: sin él la evaluación usa bucles en Python
+    np = None
+
+# Instrumentación (ver instrumentacion.py): None salvo que se active. Activa, es un
+# objeto con contar(nombre, n) y decision(nombre, estado, jugador, movidas); las
+# funciones de búsqueda sólo comprueban si es None, así que apagada no cuesta nada.
+PERFIL = None
+
+# Tabla de respuestas del oponente (ver respuestas.py). expectativa_oponente la consulta
+# antes de enumerar capturas. None hasta la primera consulta, que abre respuestas.bin si
+# existe; False si no hay tabla (o se desactiva): entonces se enumeran las capturas.
+RESPUESTAS = None
+
 # ===============================
 # Funciones de manejo de cartas
 # ===============================
@@ -42,6 +59,10 @@ def parsear_carta(carta_str):
         return None
     return (valor, palo)
 
+def texto_carta(carta):
+    """ Inversa de parsear_carta: (10, 'C') -> '10c'. """
+    return f"{carta[0]}{carta[1].lower()}"
+
 def leer_cartas(mensaje, cantidad, allowed=None):
     """
     Solicita al usuario 'cantidad' de cartas separadas por comas y las valida.
@@ -69,6 +90,95 @@ def leer_cartas(mensaje, cantidad, allowed=None):
         if valido:
             return cartas
 
+# ==========================================
+# Conjuntos de cartas como máscaras de bits
+# ==========================================
+# Cada carta ocupa un bit de un entero de 40 bits: índice = palo*10 + (valor-1),
+# con los palos en el orden de inicializar_baraja() (O, C, E, B). Recorrer una
+# máscara de menor a mayor bit da las cartas en el mismo orden que la baraja.
+PALOS = ('O', 'C', 'E', 'B')
+CARTAS = tuple((valor, palo) for palo in PALOS for valor in range(1, 11))
+INDICE = {carta: i for i, carta in enumerate(CARTAS)}
+VALOR = tuple(c[0] for c in CARTAS)
+BIT = tuple(1 << i for i in range(40))
+BARAJA_COMPLETA = (1 << 40) - 1
+MASCARA_OROS = (1 << 10) - 1
+MASCARA_VELO = BIT[INDICE[(7, 'O')]]
+MASCARA_SIETES = sum(BIT[INDICE[(7, palo)]] for palo in PALOS)
+SIETES_SIN_VELO = MASCARA_SIETES & ~MASCARA_VELO
+OROS_SIN_VELO = MASCARA_OROS & ~MASCARA_VELO
+
+try:
+    contar_cartas = int.bit_count
+except AttributeError:  # Python < 3.10
+    def contar_cartas(mascara):
+        return bin(mascara).count('1')
+
+def a_mascara(cartas):
+    """ Convierte una lista de cartas (valor, palo) en su máscara de bits. """
+    mascara = 0
+    for c in cartas:
+        mascara |= BIT[INDICE[c]]
+    return mascara
+
+def indices(mascara):
+    """ Itera los índices de las cartas de la máscara, de menor a mayor. """
+    while mascara:
+        bajo = mascara & -mascara
+        yield bajo.bit_length() - 1
+        mascara ^= bajo
+
+def de_mascara(mascara):
+    """ Devuelve la lista de cartas (valor, palo) de una máscara, en orden de baraja. """
+    return [CARTAS[i] for i in indices(mascara)]
+
+def _como_mascara(cartas):
+    """ Acepta tanto una máscara como una lista de cartas. """
+    return cartas if isinstance(cartas, int) else a_mascara(cartas)
+
+# --- Simetría de palos ---
+# Para la puntuación sólo importa el valor de una carta y si es de oros (el velo es el
+# 7 de oros): las cartas de copas, espadas y bastos de un mismo valor se pueden
+# intercambiar, y cada valor por separado. Las cartas se agrupan en 20 clases: 0..9
+# son los oros de valor 1..10 y 10..19 las otras cartas de valor 1..10.
+CLASE = tuple(VALOR[i] - 1 + (0 if i < 10 else 10) for i in range(40))
+
+def canonizar(*zonas):
+    """
+    Forma canónica de una posición dada como máscaras disjuntas ('zonas': mesa, manos,
+    no vistas...). Los oros no cambian; las otras cartas de cada valor se reasignan a
+    copas, espadas y bastos, por este orden, según la zona en la que están (y, dentro
+    de una zona, por palo). Dos posiciones que sólo difieren en los palos intercambiables
+    tienen la misma forma canónica.
+    Retorna (tupla de máscaras canónicas, mapa), con mapa[i] el índice canónico de la
+    carta i de las zonas (las demás cartas no cambian).
+    """
+    libre = list(range(10, 20))    # libre[v-1]: siguiente índice canónico de valor v
+    mapa = list(range(40))
+    canonicas = []
+    for zona in zonas:
+        canonica = zona & MASCARA_OROS
+        for i in indices(zona & ~MASCARA_OROS):
+            j = libre[i % 10]
+            libre[i % 10] = j + 10
+            mapa[i] = j
+            canonica |= BIT[j]
+        canonicas.append(canonica)
+    return tuple(canonicas), mapa
+
+def canonica(*zonas):
+    """ Como canonizar, pero sólo las máscaras canónicas (tupla). """
+    libre = list(range(10, 20))
+    canonicas = []
+    for zona in zonas:
+        canonica = zona & MASCARA_OROS
+        for i in indices(zona & ~MASCARA_OROS):
+            j = libre[i % 10]
+            libre[i % 10] = j + 10
+            canonica |= BIT[j]
+        canonicas.append(canonica)
+    return tuple(canonicas)
+
 # ===================================
 # Funciones para el juego y el estado
 # ===================================
@@ -78,11 +188,8 @@ def inicializar_baraja():
 
 def remover_cartas(baraja, cartas_a_remover):
     """ Devuelve una copia de la baraja sin las cartas indicadas. """
-    nueva = baraja.copy()
-    for c in cartas_a_remover:
-        if c in nueva:
-            nueva.remove(c)
-    return nueva
+    quitar = a_mascara(cartas_a_remover)
+    return [c for c in baraja if not BIT[INDICE[c]] & quitar]
 
 # ====================================
 # Funciones para la evaluación y sugerencia
@@ -90,13 +197,210 @@ def remover_cartas(baraja, cartas_a_remover):
 def puntos_cartas_original(cartas, escobas=0):
     """
     Función simple de puntuación (usada para sugerir jugadas).
+    'cartas' puede ser una lista de cartas o una máscara de bits.
+    """
+    mascara = _como_mascara(cartas)
+    return nucleo.puntos(contar_cartas(mascara), contar_cartas(mascara & SIETES_SIN_VELO),
+                         contar_cartas(mascara & OROS_SIN_VELO), 1 if mascara & MASCARA_VELO else 0, escobas)
+
+def _combinaciones(orden, objetivo):
+    """
+    Recorrido de nucleo.combinaciones sobre una lista de índices de carta. Devuelve las
+    máscaras de las combinaciones cuya suma de valores es 'objetivo', en el orden del
+    backtracking sobre la lista de cartas original.
+    """
+    resultados = []
+    for posiciones in nucleo.combinaciones([VALOR[i] for i in orden], objetivo):
+        mascara = 0
+        for k, i in enumerate(orden):
+            if (posiciones >> k) & 1:
+                mascara |= BIT[i]
+        resultados.append(mascara)
+    return resultados
+
+# ==========================================
+# Índice de capturas por mesa
+# ==========================================
+# Una "forma" es un multiconjunto de valores codificado en un entero con 3 bits
+# por valor (bits 3*(v-1) .. 3*(v-1)+2 guardan cuántas cartas de valor v usa).
+# El índice guarda, para cada objetivo 0..14, las formas que suman ese objetivo
+# con las cartas de la mesa; las combinaciones concretas se obtienen expandiendo
+# cada forma por palo, de modo que los valores repetidos se enumeran una sola vez.
+OBJETIVO_MAX = 14
+MAX_INDICES = 4096
+_SUBCONJUNTOS = {}
+# Los índices se guardan por la mesa concreta, no por su forma canónica: sus
+# combinaciones son las cartas que se capturan. Lo que sólo depende de la forma
+# (los rasgos de las capturas) se guarda aparte, por la mesa canónica.
+_INDICES = {}
+_RASGOS = {}
+
+def _subconjuntos(mascara, k):
+    """ Devuelve (con memoria) los subconjuntos de 'k' cartas de 'mascara'. """
+    clave = (mascara, k)
+    subs = _SUBCONJUNTOS.get(clave)
+    if subs is None:
+        bits = [BIT[i] for i in indices(mascara)]
+        subs = []
+        def backtrack(start, actual, faltan):
+            if faltan == 0:
+                subs.append(actual)
+                return
+            for j in range(start, len(bits) - faltan + 1):
+                backtrack(j+1, actual | bits[j], faltan - 1)
+        backtrack(0, 0, k)
+        _SUBCONJUNTOS[clave] = subs
+    return subs
+
+class IndiceCapturas:
+    """
+    Todas las combinaciones de captura de una mesa, por objetivo (0..14).
+    Se actualiza incrementalmente con agregar()/quitar() en lugar de reconstruirse.
+    """
+    def __init__(self, mesa=0):
+        self.mesa = 0
+        self.por_valor = [0] * 11
+        self.formas = [[] for _ in range(OBJETIVO_MAX + 1)]
+        self.formas[0].append(0)
+        self._combos = [None] * (OBJETIVO_MAX + 1)
+        for i in indices(mesa):
+            self.agregar(i)
+
+    def copia(self):
+        nuevo = IndiceCapturas.__new__(IndiceCapturas)
+        nuevo.mesa = self.mesa
+        nuevo.por_valor = self.por_valor[:]
+        nuevo.formas = [f[:] for f in self.formas]
+        nuevo._combos = self._combos[:]
+        return nuevo
+
+    def agregar(self, i):
+        """ Añade a la mesa la carta de índice 'i'. """
+        v = VALOR[i]
+        desplazamiento = 3 * (v - 1)
+        usadas = contar_cartas(self.por_valor[v])
+        # Las formas nuevas son las que usan todas las cartas de valor v, incluida la nueva.
+        for t in range(OBJETIVO_MAX, v - 1, -1):
+            nuevas = [f + (1 << desplazamiento) for f in self.formas[t - v]
+                      if (f >> desplazamiento) & 7 == usadas]
+            self.formas[t].extend(nuevas)
+        self.por_valor[v] |= BIT[i]
+        self.mesa |= BIT[i]
+        self._invalidar(v)
+
+    def quitar(self, i):
+        """ Quita de la mesa la carta de índice 'i'. """
+        v = VALOR[i]
+        desplazamiento = 3 * (v - 1)
+        usadas = contar_cartas(self.por_valor[v])
+        for t in range(v, OBJETIVO_MAX + 1):
+            self.formas[t] = [f for f in self.formas[t] if (f >> desplazamiento) & 7 != usadas]
+        self.por_valor[v] &= ~BIT[i]
+        self.mesa &= ~BIT[i]
+        self._invalidar(v)
+
+    def _invalidar(self, v):
+        for t in range(v, OBJETIVO_MAX + 1):
+            self._combos[t] = None
+
+    def combos(self, objetivo):
+        """
+        Máscaras de las combinaciones que suman 'objetivo'.
+        La lista devuelta se comparte entre llamadas: no debe modificarse.
+        """
+        combos = self._combos[objetivo]
+        if combos is None:
+            combos = []
+            for forma in self.formas[objetivo]:
+                parciales = [0]
+                v = 1
+                while forma:
+                    k = forma & 7
+                    if k:
+                        subs = _subconjuntos(self.por_valor[v], k)
+                        parciales = [p | sub for p in parciales for sub in subs]
+                    forma >>= 3
+                    v += 1
+                combos.extend(parciales)
+            self._combos[objetivo] = combos
+            if PERFIL is not None:
+                PERFIL.contar("combos", len(combos))
+        return combos
+
+    def rasgos(self):
+        """
+        Matriz NumPy con una fila por combinación de captura de los objetivos 5..14:
+        (cartas, sietes sin velo, oros sin velo, velo, escoba, objetivo). Sólo depende
+        de la forma canónica de la mesa: se guarda en rasgos_capturas(), no aquí.
+        """
+        filas = [rasgos_mascara(combo) + (1 if combo == self.mesa else 0, objetivo)
+                 for objetivo in range(5, OBJETIVO_MAX + 1)
+                 for combo in self.combos(objetivo)]
+        return np.array(filas, dtype=np.int64).reshape(len(filas), 6)
+
+def indice_capturas(mesa, base=None):
+    """
+    Devuelve el índice de capturas de 'mesa' (máscara), construyéndolo una sola vez
+    por estado de la mesa. Si se da un índice 'base' de una mesa cercana, el nuevo
+    índice se deriva de él añadiendo y quitando las cartas que difieren.
+    """
+    indice = _INDICES.get(mesa)
+    if PERFIL is not None:
+        PERFIL.contar("indices_fallos" if indice is None else "indices_aciertos")
+    if indice is None:
+        if base is None:
+            indice = IndiceCapturas(mesa)
+        else:
+            indice = base.copia()
+            for i in indices(base.mesa & ~mesa):
+                indice.quitar(i)
+            for i in indices(mesa & ~base.mesa):
+                indice.agregar(i)
+        if len(_INDICES) >= MAX_INDICES:
+            _INDICES.clear()
+        _INDICES[mesa] = indice
+    return indice
+
+def rasgos_capturas(mesa):
+    """
+    IndiceCapturas.rasgos() de 'mesa', guardado por la forma canónica de la mesa: las
+    mesas que sólo difieren en los palos intercambiables comparten la matriz (con las
+    filas en otro orden, que no cambia los máximos que se calculan con ella).
+    """
+    clave = canonica(mesa)[0]
+    rasgos = _RASGOS.get(clave)
+    if PERFIL is not None:
+        PERFIL.contar("rasgos_fallos" if rasgos is None else "rasgos_aciertos")
+    if rasgos is None:
+        rasgos = indice_capturas(mesa).rasgos()
+        if len(_RASGOS) >= MAX_INDICES:
+            _RASGOS.clear()
+        _RASGOS[clave] = rasgos
+    return rasgos
+
+# Todas las memorias del módulo, por nombre (ver limpiar_caches y tam_caches).
+_CACHES = {"subconjuntos": _SUBCONJUNTOS, "indices": _INDICES, "rasgos": _RASGOS}
+
+def limpiar_caches():
     """
-    total_cartas = len(cartas)
-    pts_cartas = min(total_cartas, 21) / 21
-    pts_velo = sum(1 for c in cartas if c == (7, 'O'))
-    pts_sietes = min(sum(1 for c in cartas if c[0] == 7 and c != (7, 'O')), 3) * (1/3)
-    pts_oros = min(sum(1 for c in cartas if c[1] == 'O' and c != (7, 'O')), 6) * (1/6)
-    return pts_cartas + pts_velo + pts_sietes + pts_oros + escobas
+    Vacía todas las memorias del módulo: subconjuntos, índices de capturas y rasgos
+    guardados (para medir en frío o liberar memoria).
+    """
+    for cache in _CACHES.values():
+        cache.clear()
+
+def tam_caches():
+    """ Número de entradas de cada memoria del módulo, por nombre. """
+    return {nombre: len(cache) for nombre, cache in _CACHES.items()}
+
+def combinaciones_mascara(mesa, objetivo):
+    """
+    Como combinaciones_que_suman, pero sobre máscaras: devuelve una lista de máscaras.
+    La lista puede provenir del índice de capturas y no debe modificarse.
+    """
+    if 0 <= objetivo <= OBJETIVO_MAX:
+        return indice_capturas(mesa).combos(objetivo)
+    return _combinaciones(list(indices(mesa)), objetivo)
 
 def combinaciones_que_suman(cartas, objetivo):
     """
@@ -117,360 +421,644 @@ def combinaciones_que_suman(cartas, objetivo):
     backtrack(0, [], 0)
     return resultados
 
-def evaluar_movida(card, mesa, deck, movida):
+def capturas_mascara(mesa, objetivo):
+    """
+    Genera una a una las máscaras de las combinaciones de 'mesa' (máscara o lista de
+    cartas) que suman 'objetivo', con el recorrido podado de nucleo.capturas (de menor
+    a mayor valor). Para quien sólo necesita la primera: no construye la lista.
+    """
+    orden = list(indices(_como_mascara(mesa)))
+    for posiciones in nucleo.capturas([VALOR[i] for i in orden], objetivo):
+        combo = 0
+        k = 0
+        while posiciones:
+            if posiciones & 1:
+                combo |= BIT[orden[k]]
+            posiciones >>= 1
+            k += 1
+        yield combo
+
+def hay_captura(mesa, objetivo):
+    """ True si alguna combinación de 'mesa' suma 'objetivo'; se para en la primera. """
+    mesa = _como_mascara(mesa)
+    indice = _INDICES.get(mesa)
+    if indice is not None and 0 <= objetivo <= OBJETIVO_MAX:
+        return bool(indice.formas[objetivo])
+    for _ in capturas_mascara(mesa, objetivo):
+        return True
+    return False
+
+def rasgos_mascara(mascara):
+    """ (cartas, sietes sin velo, oros sin velo, velo) de una máscara, como en puntos_cartas_original. """
+    return (contar_cartas(mascara), contar_cartas(mascara & SIETES_SIN_VELO),
+            contar_cartas(mascara & OROS_SIN_VELO), 1 if mascara & MASCARA_VELO else 0)
+
+# --- Contadores de las cartas capturadas ---
+# Cada montón de capturas lleva unos contadores (cartas, sietes sin velo, oros sin velo, velo)
+# con los mismos rasgos que puntos_cartas_original. Así una movida se puntúa como la
+# diferencia de valor que produce en el montón, con los topes (21 cartas, 3 sietes,
+# 6 oros) aplicados a los totales reales. Con el montón vacío coincide con
+# puntos_cartas_original.
+CONTADORES_VACIOS = (0, 0, 0, 0)
+
+def sumar_contadores(contadores, rasgos):
+    return (contadores[0] + rasgos[0], contadores[1] + rasgos[1],
+            contadores[2] + rasgos[2], contadores[3] + rasgos[3])
+
+def valor_contadores(contadores):
+    """ Valor de un montón según la fórmula de puntos_cartas_original. """
+    cartas, sietes, oros, velo = contadores
+    return min(cartas, 21) / 21 + velo + min(sietes, 3) * (1/3) + min(oros, 6) * (1/6)
+
+def puntos_movida(contadores, captura, escobas=0):
+    """
+    Puntos de capturar 'captura' (máscara, incluida la carta jugada) para un jugador
+    cuyo montón tiene 'contadores': lo que aumenta el valor del montón más las escobas.
+    """
+    return valor_contadores(sumar_contadores(contadores, rasgos_mascara(captura))) - valor_contadores(contadores) + escobas
+
+# Evaluación vectorizada de las respuestas del oponente (requiere NumPy). Preparar los
+# arrays cuesta más que el bucle sobre pocas combinaciones: sólo se usa a partir de
+# MESA_VECTORIZADA cartas en la mesa, que es donde empieza a ganar en las medidas.
+VECTORIZAR = np is not None
+MESA_VECTORIZADA = 6
+if np is not None:
+    _RASGOS_CARTA = np.array([rasgos_mascara(b) for b in BIT], dtype=np.int64)
+    _OBJETIVO_CARTA = np.array([15 - v for v in VALOR], dtype=np.int64)
+
+def mejores_respuestas(mesa, cartas, contadores=CONTADORES_VACIOS):
+    """
+    Array de NumPy con la mejor captura (según puntos_movida, 0 si no captura) de cada
+    carta de 'cartas' (lista de índices) sobre 'mesa', para un montón con 'contadores'.
+    Puntúa a la vez todas las combinaciones de todas las cartas.
+    """
+    rasgos = rasgos_capturas(mesa)
+    if not len(rasgos):
+        return np.zeros(len(cartas))
+    # total[d, k] = contadores del oponente + rasgos de la combinación k + los de su carta d.
+    total = rasgos[None, :, :4] + _RASGOS_CARTA[cartas][:, None, :] + np.array(contadores, dtype=np.int64)
+    pts = (np.minimum(total[..., 0], 21) / 21 + total[..., 3]
+           + np.minimum(total[..., 1], 3) * (1/3) + np.minimum(total[..., 2], 6) * (1/6)
+           - valor_contadores(contadores) + rasgos[None, :, 4])
+    aplica = rasgos[None, :, 5] == _OBJETIVO_CARTA[cartas][:, None]
+    return np.where(aplica, pts, 0).max(axis=1)
+
+def expectativa_oponente_vectorizada(mesa, deck, contadores=CONTADORES_VACIOS, pesos=None):
+    """
+    Igual que expectativa_oponente, pero puntúa a la vez todas las combinaciones
+    de todas las cartas de 'deck' con arrays de NumPy (mejores_respuestas). Devuelve
+    el mismo valor: las operaciones por elemento son las de puntos_movida y la suma
+    final se hace en el orden de la baraja.
+    """
+    if not deck:
+        return 0
+    cartas = list(indices(deck))
+    mejores = mejores_respuestas(mesa, cartas, contadores)
+    if pesos is not None:
+        p = [pesos[i] for i in cartas]
+        total = sum(p)
+        if total > 0:
+            return sum((mejores * p).tolist()) / total
+    return sum(mejores.tolist()) / len(cartas)
+
+def mejor_respuesta(mesa, carta, contadores=CONTADORES_VACIOS):
+    """ Mejor captura (según puntos_movida, 0 si no captura) de la carta de índice 'carta' sobre 'mesa'. """
+    # Se recorre la lista del índice de capturas, que evaluar_movida_mascara ya ha derivado
+    # para esta mesa: es más rápido que el recorrido perezoso de capturas_mascara, y parar
+    # en una cota apenas ahorra (sólo la escoba o capturar toda la mesa la alcanzan).
+    bit = BIT[carta]
+    mejor = 0
+    for combo in combinaciones_mascara(mesa, 15 - VALOR[carta]):
+        pts = puntos_movida(contadores, combo | bit, 1 if combo == mesa else 0)
+        if pts > mejor:
+            mejor = pts
+    return mejor
+
+def _abrir_respuestas():
+    """ Abre la tabla de respuestas la primera vez que hace falta (False si no existe). """
+    global RESPUESTAS
+    import respuestas
+    RESPUESTAS = respuestas.abrir() or False
+    return RESPUESTAS
+
+def expectativa_oponente(mesa, deck, contadores=CONTADORES_VACIOS, pesos=None):
+    """
+    Media, sobre las cartas de 'deck' (máscara), de la mejor captura que puede
+    hacer el oponente sobre 'mesa' (máscara) según puntos_movida, partiendo de
+    los 'contadores' de su montón. Con 'pesos' (40 números, por índice de carta;
+    ver creencias.py) la media se pondera en lugar de dar a cada carta 1/len(deck).
+    """
+    if not deck:
+        return 0
+    tabla = RESPUESTAS if RESPUESTAS is not None else _abrir_respuestas()
+    if tabla:
+        valor = tabla.expectativa(mesa, deck, contadores, pesos)
+        if valor is not None:
+            return valor
+    if VECTORIZAR and contar_cartas(mesa) >= MESA_VECTORIZADA:
+        return expectativa_oponente_vectorizada(mesa, deck, contadores, pesos)
+    total_oponente = 0
+    total_pesos = 0
+    for i in indices(deck):
+        mejor = mejor_respuesta(mesa, i, contadores)
+        if pesos is not None:
+            mejor *= pesos[i]
+            total_pesos += pesos[i]
+        total_oponente += mejor
+    if pesos is not None and total_pesos > 0:
+        return total_oponente / total_pesos
+    if pesos is not None:
+        # Todos los pesos son 0: se vuelve a la media sin ponderar.
+        return expectativa_oponente(mesa, deck, contadores)
+    return total_oponente / contar_cartas(deck)
+
+def evaluar_movida_mascara(carta, mesa, deck, captura,
+                           contadores=CONTADORES_VACIOS, contadores_rival=CONTADORES_VACIOS, pesos=None):
+    """
+    Versión de evaluar_movida sobre máscaras. 'carta' es el índice de la carta jugada,
+    'mesa' y 'deck' son máscaras y 'captura' es la máscara capturada (None si no captura).
+    'contadores' y 'contadores_rival' son los de los montones de quien mueve y de su rival;
+    'pesos', los de la respuesta del rival (ver expectativa_oponente).
+    Retorna (neto, puntos_jugador, expectativa_oponente, nueva_mesa).
+    """
+    if PERFIL is not None:
+        PERFIL.contar("nodos")
+    if captura is not None:
+        nueva_mesa = mesa & ~captura
+        puntos_jugador = puntos_movida(contadores, captura | BIT[carta], 1 if not nueva_mesa else 0)
+    else:
+        nueva_mesa = mesa | BIT[carta]
+        puntos_jugador = 0
+    # El índice de la mesa resultante se deriva del de la mesa actual.
+    indice_capturas(nueva_mesa, base=indice_capturas(mesa))
+    expectativa = expectativa_oponente(nueva_mesa, deck, contadores_rival, pesos)
+    return puntos_jugador - expectativa, puntos_jugador, expectativa, nueva_mesa
+
+def evaluar_movida(card, mesa, deck, movida, contadores=CONTADORES_VACIOS, contadores_rival=CONTADORES_VACIOS):
     """
     Evalúa una movida para una carta dada.
     'movida' es una tupla (tipo, combinación) donde tipo es "captura" o "no captura".
     Retorna (neto, puntos_jugador, expectativa_oponente, new_mesa).
-    Se utiliza la función de puntos original para sugerencias.
+    Se utiliza la función de puntos original para sugerencias, aplicada como diferencia
+    sobre los contadores de los montones de cada jugador (vacíos por defecto).
     """
-    if movida[0] == "captura":
-        combo = movida[1]
-        new_mesa = [c for c in mesa if c not in combo]
-        puntos_jugador = puntos_cartas_original(combo + [card], 1 if len(new_mesa)==0 else 0)
+    captura = a_mascara(movida[1]) if movida[0] == "captura" else None
+    if PERFIL is None:
+        neto, puntos_jugador, expectativa, _ = evaluar_movida_mascara(
+            INDICE[card], a_mascara(mesa), a_mascara(deck), captura, contadores, contadores_rival)
     else:
-        new_mesa = mesa + [card]
-        puntos_jugador = 0
-    total_oponente = 0
-    if deck:
-        for op_card in deck:
-            target = 15 - op_card[0]
-            combos = combinaciones_que_suman(new_mesa, target)
-            mejor = 0
-            for combo in combos:
-                new_mesa_op = [c for c in new_mesa if c not in combo]
-                pts = puntos_cartas_original(combo + [op_card], 1 if len(new_mesa_op)==0 else 0)
-                if pts > mejor:
-                    mejor = pts
-            total_oponente += mejor
-        expectativa_oponente = total_oponente / len(deck)
+        with PERFIL.decision("evaluar_movida", None, None, 1, mesa=a_mascara(mesa)):
+            neto, puntos_jugador, expectativa, _ = evaluar_movida_mascara(
+                INDICE[card], a_mascara(mesa), a_mascara(deck), captura, contadores, contadores_rival)
+    if captura is not None:
+        new_mesa = [c for c in mesa if not BIT[INDICE[c]] & captura]
     else:
-        expectativa_oponente = 0
-    neto = puntos_jugador - expectativa_oponente
-    return neto, puntos_jugador, expectativa_oponente, new_mesa
-
-def sugerir_mejor_jugada(estado):
-    evaluaciones_totales = []
-    for card in estado['mano_usuario']:
-        target = 15 - card[0]
-        capture_combos = combinaciones_que_suman(estado['mesa'], target)
-        if capture_combos:
-            moves = [("captura", combo, card) for combo in capture_combos]
+        new_mesa = mesa + [card]
+    return neto, puntos_jugador, expectativa, new_mesa
+
+def _puntuacion(capturadas_usuario, capturadas_oponente, escobas_usuario, escobas_oponente):
+    """ Núcleo de calcular_puntuacion_final sobre máscaras. """
+    # Máscara de cada categoría; "cartas" cuenta todas las capturadas.
+    categorias = {"velo": MASCARA_VELO, "sietes": MASCARA_SIETES, "oros": MASCARA_OROS, "cartas": BARAJA_COMPLETA}
+    puntos = {"usuario": 0, "oponente": 0}
+    desglose = {"usuario": {}, "oponente": {}}
+    for cat, mascara in categorias.items():
+        count_user = contar_cartas(capturadas_usuario & mascara)
+        count_op = contar_cartas(capturadas_oponente & mascara)
+        if count_user > count_op:
+            puntos["usuario"] += 1
+            desglose["usuario"][cat] = 1
+            desglose["oponente"][cat] = 0
+        elif count_op > count_user:
+            puntos["oponente"] += 1
+            desglose["usuario"][cat] = 0
+            desglose["oponente"][cat] = 1
         else:
-            moves = [("no captura", None, card)]
-        for move in moves:
-            neto, pts, exp_op, new_mesa = evaluar_movida(card, estado['mesa'], estado['baraja'], (move[0], move[1]))
-            evaluaciones_totales.append((move, neto, pts, exp_op, new_mesa))
+            desglose["usuario"][cat] = 0
+            desglose["oponente"][cat] = 0
+    # Agregar escobas (1 punto cada una)
+    puntos["usuario"] += escobas_usuario
+    puntos["oponente"] += escobas_oponente
+    desglose["usuario"]["escobas"] = escobas_usuario
+    desglose["oponente"]["escobas"] = escobas_oponente
+    return puntos, desglose
+
+def calcular_puntuacion_final(estado):
+    """
+    Calcula el puntaje final para cada jugador según las categorías:
+      - "velo": N = 1, cuenta todas las cartas iguales a (7, 'O').
+      - "sietes": N = 4, cuenta todas las cartas con valor 7 (incluyendo el velo).
+      - "oros": N = 10, cuenta todas las cartas de oros (incluyendo el velo).
+      - "cartas": N = 40, cuenta todas las cartas capturadas.
+    El ganador de cada categoría (el que tenga más cartas capturadas en esa categoría) obtiene 1 punto;
+    en caso de empate, nadie obtiene puntos en esa categoría.
+    Las escobas suman 1 punto cada una.
+    'estado' puede ser un GameState o un diccionario con las cartas capturadas
+    (listas o máscaras de bits) y las escobas de cada jugador.
+    Devuelve un diccionario con el puntaje total y un desglose por categoría para ambos jugadores.
+    """
+    if isinstance(estado, GameState):
+        return _puntuacion(estado.capturadas[USUARIO], estado.capturadas[OPONENTE],
+                           estado.escobas[USUARIO], estado.escobas[OPONENTE])
+    return _puntuacion(_como_mascara(estado["capturadas_usuario"]), _como_mascara(estado["capturadas_oponente"]),
+                       estado["escobas_usuario"], estado["escobas_oponente"])
+
+# ==========================================
+# Estado de la partida (motor sin entrada/salida)
+# ==========================================
+USUARIO, OPONENTE = 0, 1
+JUGADORES = ("usuario", "oponente")
+# Tipos de entrada del historial de GameState.
+_JUGADA, _REPARTO, _BARRIDO = 0, 1, 2
+# Procedencia de la carta jugada: de la mano, de la baraja (mano del rival desconocida) o de ninguna.
+_DE_MANO, _DE_BARAJA, _DE_FUERA = 0, 1, 2
+
+def jugadas_carta(mesa, carta, renunciar=False):
+    """
+    Jugadas (carta, captura) posibles con la carta de índice 'carta' sobre 'mesa':
+    todas sus capturas y, si no puede capturar (o si se permite renunciar), dejarla en la mesa.
+    """
+    movidas = [(carta, combo) for combo in indice_capturas(mesa).combos(15 - VALOR[carta])]
+    if renunciar or not movidas:
+        movidas.append((carta, 0))
+    return movidas
+
+class GameState:
+    """
+    Estado compacto de una partida, sobre máscaras de bits y sin entrada/salida.
+    Las jugadas son tuplas (carta, captura): el índice de la carta jugada y la máscara
+    de las cartas que captura de la mesa (0 si no captura). apply() y undo() hacen y
+    deshacen jugadas, repartos y el barrido final sin copiar el estado.
+    """
+    __slots__ = ('mesa', 'baraja', 'manos', 'capturadas', 'contadores', 'escobas',
+                 'ultimo', 'turno', 'historial')
+
+    def __init__(self, mesa=0, manos=(0, 0), baraja=None, turno=USUARIO):
+        self.mesa = mesa
+        self.manos = list(manos)
+        if baraja is None:
+            baraja = BARAJA_COMPLETA & ~(mesa | manos[0] | manos[1])
+        self.baraja = baraja
+        self.capturadas = [0, 0]
+        self.contadores = [CONTADORES_VACIOS, CONTADORES_VACIOS]
+        self.escobas = [0, 0]
+        self.ultimo = None
+        self.turno = turno
+        self.historial = []
+
+    def copia(self):
+        nuevo = GameState.__new__(GameState)
+        nuevo.mesa = self.mesa
+        nuevo.baraja = self.baraja
+        nuevo.manos = self.manos[:]
+        nuevo.capturadas = self.capturadas[:]
+        nuevo.contadores = self.contadores[:]
+        nuevo.escobas = self.escobas[:]
+        nuevo.ultimo = self.ultimo
+        nuevo.turno = self.turno
+        nuevo.historial = self.historial[:]
+        return nuevo
+
+    def no_vistas(self, jugador):
+        """ Cartas que 'jugador' no ve: la baraja y la mano de su rival. """
+        return self.baraja | self.manos[1 - jugador]
+
+    def terminado(self):
+        """ La partida termina cuando no quedan cartas en las manos ni en la baraja. """
+        return not (self.manos[0] or self.manos[1] or self.baraja)
+
+    def repartir(self, jugador, cartas):
+        """ Pasa 'cartas' (máscara) de la baraja a la mano de 'jugador'. """
+        self.historial.append((_REPARTO, jugador, cartas & ~self.manos[jugador]))
+        self.baraja &= ~cartas
+        self.manos[jugador] |= cartas
+
+    def legal_moves(self, jugador=None):
+        """
+        Jugadas de 'jugador' (por defecto, el que tiene el turno) con las cartas de su mano:
+        cada carta captura si puede (con cualquiera de sus combinaciones) o se deja en la mesa.
+        """
+        if jugador is None:
+            jugador = self.turno
+        movidas = []
+        for carta in indices(self.manos[jugador]):
+            movidas.extend(jugadas_carta(self.mesa, carta))
+        return movidas
+
+    def apply(self, movida, jugador=None):
+        """
+        Aplica la jugada (carta, captura) de 'jugador' (por defecto, el que tiene el turno).
+        La carta sale de su mano o, si no está en ella, de la baraja (mano del rival desconocida).
+        Si 'jugador' no es el que tiene el turno, la jugada es fuera de turno y el turno no cambia.
+        """
+        carta, captura = movida
+        if jugador is None:
+            jugador = self.turno
+        bit = BIT[carta]
+        if self.manos[jugador] & bit:
+            origen = _DE_MANO
+            self.manos[jugador] ^= bit
+        elif self.baraja & bit:
+            origen = _DE_BARAJA
+            self.baraja ^= bit
+        else:
+            origen = _DE_FUERA
+        self.historial.append((_JUGADA, jugador, carta, captura, origen,
+                               self.ultimo, self.turno, self.contadores[jugador]))
+        if captura:
+            self.mesa &= ~captura
+            ganadas = captura | bit
+            self.capturadas[jugador] |= ganadas
+            self.contadores[jugador] = sumar_contadores(self.contadores[jugador], rasgos_mascara(ganadas))
+            self.ultimo = jugador
+            if not self.mesa:
+                self.escobas[jugador] += 1
+        else:
+            self.mesa |= bit
+        if jugador == self.turno:
+            self.turno = 1 - jugador
+
+    def barrer(self):
+        """
+        Final de la partida: las cartas que quedan en la mesa son para el último que capturó
+        (si nadie capturó, no se asignan). Devuelve el jugador que se las lleva o None.
+        """
+        jugador = self.ultimo
+        self.historial.append((_BARRIDO, jugador, self.mesa,
+                               None if jugador is None else self.contadores[jugador]))
+        if jugador is not None and self.mesa:
+            self.capturadas[jugador] |= self.mesa
+            self.contadores[jugador] = sumar_contadores(self.contadores[jugador], rasgos_mascara(self.mesa))
+        self.mesa = 0
+        return jugador
+
+    def undo(self):
+        """ Deshace la última jugada, reparto o barrido. """
+        entrada = self.historial.pop()
+        tipo = entrada[0]
+        if tipo == _JUGADA:
+            _, jugador, carta, captura, origen, ultimo, turno, contadores = entrada
+            bit = BIT[carta]
+            if captura:
+                if not self.mesa:
+                    self.escobas[jugador] -= 1
+                self.mesa |= captura
+                self.capturadas[jugador] &= ~(captura | bit)
+            else:
+                self.mesa &= ~bit
+            if origen == _DE_MANO:
+                self.manos[jugador] |= bit
+            elif origen == _DE_BARAJA:
+                self.baraja |= bit
+            self.contadores[jugador] = contadores
+            self.ultimo = ultimo
+            self.turno = turno
+        elif tipo == _REPARTO:
+            _, jugador, cartas = entrada
+            self.manos[jugador] &= ~cartas
+            self.baraja |= cartas
+        else:
+            _, jugador, mesa, contadores = entrada
+            if jugador is not None:
+                self.capturadas[jugador] &= ~mesa
+                self.contadores[jugador] = contadores
+            self.mesa = mesa
+
+    def score(self):
+        """
+        Puntuación (puntos, desglose) como calcular_puntuacion_final. Si la partida ha
+        terminado y queda mesa sin barrer, se cuenta para el último que capturó.
+        """
+        capturadas = self.capturadas[:]
+        if self.mesa and self.ultimo is not None and self.terminado():
+            capturadas[self.ultimo] |= self.mesa
+        return _puntuacion(capturadas[USUARIO], capturadas[OPONENTE],
+                           self.escobas[USUARIO], self.escobas[OPONENTE])
+
+# ====================================
+# Sugerencias interactivas
+# ====================================
+def evaluar_jugadas(estado, movidas, jugador, deck=None, pesos=None):
+    """
+    Evalúa las 'movidas' de 'jugador' con evaluar_movida_mascara. 'deck' son las cartas
+    que puede jugar el rival a continuación (por defecto, las que 'jugador' no ve) y
+    'pesos', si se dan, lo probable que es cada una (ver creencias.py).
+    Retorna una lista de (movida, neto, puntos_jugador, expectativa_rival, nueva_mesa).
+    """
+    if deck is None:
+        deck = estado.no_vistas(jugador)
+    propios, rival = estado.contadores[jugador], estado.contadores[1 - jugador]
+    evaluaciones = []
+    for movida in movidas:
+        carta, captura = movida
+        neto, pts, exp, nueva_mesa = evaluar_movida_mascara(carta, estado.mesa, deck, captura or None,
+                                                            propios, rival, pesos)
+        evaluaciones.append((movida, neto, pts, exp, nueva_mesa))
+    return evaluaciones
+
+def mejor_jugada(estado, jugador=None):
+    """
+    Jugada de mayor valor neto para 'jugador' (por defecto, el que tiene el turno),
+    sin interacción. Retorna (movida, neto) o (None, 0) si no tiene jugadas.
+    """
+    if jugador is None:
+        jugador = estado.turno
+    evaluaciones = evaluar_jugadas(estado, estado.legal_moves(jugador), jugador)
+    if not evaluaciones:
+        return None, 0
+    best = max(evaluaciones, key=lambda x: x[1])
+    return best[0], best[1]
+
+def evaluar_decision(nombre, evaluar, estado, movidas, jugador, deck=None):
+    """
+    Llama a 'evaluar' con las 'movidas' de 'jugador'. Si la instrumentación está
+    activa, la llamada se registra como la decisión 'nombre' (sin el tiempo de
+    respuesta del usuario, que se pide después).
+    """
+    if PERFIL is None:
+        return evaluar(estado, movidas, jugador, deck)
+    with PERFIL.decision(nombre, estado, jugador, len(movidas)):
+        return evaluar(estado, movidas, jugador, deck)
+
+def elegir_opcion(evaluaciones, mensaje):
+    """
+    Pide al usuario una de las 'evaluaciones' (numeradas desde 1); con Enter o con una
+    entrada no válida se escoge la de mayor valor neto. 'mensaje' recibe la opción por defecto.
+    """
+    best = max(evaluaciones, key=lambda x: x[1])
+    default_option = evaluaciones.index(best) + 1
+    choice = input(mensaje.format(default_option))
+    if choice.strip() == "":
+        return best
+    try:
+        index = int(choice) - 1
+    except:
+        print("Entrada no válida, se escoge la opción por defecto.")
+        return best
+    if index < 0 or index >= len(evaluaciones):
+        print("Opción no válida, se escoge la opción por defecto.")
+        return best
+    return evaluaciones[index]
+
+def sugerir_mejor_jugada(estado, evaluar=evaluar_jugadas):
+    """
+    Muestra las jugadas del usuario con su evaluación y devuelve la elegida (o None).
+    'evaluar' es la función de evaluación (por defecto, evaluar_jugadas a 1 jugada).
+    """
+    evaluaciones_totales = evaluar_decision("sugerir_mejor_jugada", evaluar, estado, estado.legal_moves(USUARIO), USUARIO)
     if evaluaciones_totales:
-        best = max(evaluaciones_totales, key=lambda x: x[1])
         print("\nEvaluación de jugadas posibles:")
         for i, eval_item in enumerate(evaluaciones_totales):
-            move, neto, pts, exp_op, new_mesa = eval_item
-            escoba_str = " (escoba)" if move[0]=="captura" and not new_mesa else ""
-            if move[0] == "captura":
-                print(f"{i+1}. Con la carta {move[2]}: Capturar {move[1]}{escoba_str} -> Puntos usuario: {pts:.2f}, Expectativa oponente: {exp_op:.2f}, Valor neto: {neto:.2f}")
+            (card, captura), neto, pts, exp_op, new_mesa = eval_item
+            escoba_str = " (escoba)" if captura and not new_mesa else ""
+            if captura:
+                print(f"{i+1}. Con la carta {CARTAS[card]}: Capturar {de_mascara(captura)}{escoba_str} -> Puntos usuario: {pts:.2f}, Expectativa oponente: {exp_op:.2f}, Valor neto: {neto:.2f}")
             else:
-                print(f"{i+1}. Con la carta {move[2]}: No capturar -> Puntos usuario: {pts:.2f}, Expectativa oponente: {exp_op:.2f}, Valor neto: {neto:.2f}")
-        default_option = evaluaciones_totales.index(best) + 1
-        choice = input(f"Elige la opción (presiona Enter para la opción {default_option}): ")
-        if choice.strip() == "":
-            chosen = best
+                print(f"{i+1}. Con la carta {CARTAS[card]}: No capturar -> Puntos usuario: {pts:.2f}, Expectativa oponente: {exp_op:.2f}, Valor neto: {neto:.2f}")
+        chosen = elegir_opcion(evaluaciones_totales, "Elige la opción (presiona Enter para la opción {}): ")
+        (card, captura), neto, pts, exp_op, new_mesa = chosen
+        escoba_str = " (escoba)" if captura and not new_mesa else ""
+        if captura:
+            print(f"Sugerencia: Jugar la carta {CARTAS[card]} capturando {de_mascara(captura)}{escoba_str}\n")
         else:
-            try:
-                index = int(choice) - 1
-                if index < 0 or index >= len(evaluaciones_totales):
-                    print("Opción no válida, se escoge la opción por defecto.")
-                    chosen = best
-                else:
-                    chosen = evaluaciones_totales[index]
-            except:
-                print("Entrada no válida, se escoge la opción por defecto.")
-                chosen = best
-        move, neto, pts, exp_op, new_mesa = chosen
-        escoba_str = " (escoba)" if move[0]=="captura" and not new_mesa else ""
-        if move[0] == "captura":
-            print(f"Sugerencia: Jugar la carta {move[2]} capturando {move[1]}{escoba_str}\n")
-        else:
-            print(f"Sugerencia: Jugar la carta {move[2]} sin capturar (colocándola en la mesa)\n")
-        return move, new_mesa
+            print(f"Sugerencia: Jugar la carta {CARTAS[card]} sin capturar (colocándola en la mesa)\n")
+        return chosen[0]
     else:
         print("No hay jugadas evaluables.")
-        return None, estado['mesa']
-
-def sugerir_movida_oponente(op_card, mesa, deck):
-    target = 15 - op_card[0]
-    capture_combos = combinaciones_que_suman(mesa, target)
-    moves = []
-    for combo in capture_combos:
-        moves.append(("captura", combo, op_card))
-    moves.append(("no captura", None, op_card))
-    evaluaciones = []
-    for move in moves:
-        neto, pts, exp_user, new_mesa = evaluar_movida(op_card, mesa, deck, (move[0], move[1]))
-        evaluaciones.append((move, neto, pts, exp_user, new_mesa))
-    return evaluaciones
+        return None
 
-def elegir_captura_usuario(estado):
-    evaluaciones = []
-    for card in estado['mano_usuario']:
-        target = 15 - card[0]
-        combos = combinaciones_que_suman(estado['mesa'], target)
-        if combos:
-            for combo in combos:
-                neto, pts, exp_op, new_mesa = evaluar_movida(card, estado['mesa'], estado['baraja'], ("captura", combo))
-                evaluaciones.append((("captura", combo, card), neto, pts, exp_op, new_mesa))
+def sugerir_movida_oponente(estado, op_card, deck=None, evaluar=evaluar_jugadas):
+    """
+    Evalúa las jugadas del oponente con la carta de índice 'op_card', incluida la de
+    renunciar a capturar. Por defecto la respuesta del usuario se promedia sobre la
+    baraja sin esa carta.
+    """
+    if deck is None:
+        deck = estado.baraja & ~BIT[op_card]
+    return evaluar_decision("sugerir_movida_oponente", evaluar, estado,
+                            jugadas_carta(estado.mesa, op_card, renunciar=True), OPONENTE, deck)
+
+def elegir_captura_usuario(estado, evaluar=evaluar_jugadas):
+    """ Captura del usuario cuando el oponente renuncia a capturar. """
+    movidas = [m for m in estado.legal_moves(USUARIO) if m[1]]
+    evaluaciones = evaluar_decision("elegir_captura_usuario", evaluar, estado, movidas, USUARIO)
     if not evaluaciones:
         print("No hay posibilidades de captura para el usuario.")
         return
     if len(evaluaciones) == 1:
         chosen = evaluaciones[0]
-        move, neto, pts, exp_op, new_mesa = chosen
+        (card, captura), neto, pts, exp_op, new_mesa = chosen
         escoba_str = " (escoba)" if not new_mesa else ""
-        print(f"Captura automática para el usuario: Jugar la carta {move[2]} capturando {move[1]}{escoba_str}")
+        print(f"Captura automática para el usuario: Jugar la carta {CARTAS[card]} capturando {de_mascara(captura)}{escoba_str}")
     else:
         print("\nEvaluación de jugadas de captura disponibles para el usuario:")
         for i, eval_item in enumerate(evaluaciones):
-            move, neto, pts, exp_op, new_mesa = eval_item
+            (card, captura), neto, pts, exp_op, new_mesa = eval_item
             escoba_str = " (escoba)" if not new_mesa else ""
-            print(f"{i+1}. Con la carta {move[2]}: Capturar {move[1]}{escoba_str} -> Puntos usuario: {pts:.2f}, Valor neto: {neto:.2f}")
-        best = max(evaluaciones, key=lambda x: x[1])
-        default_option = evaluaciones.index(best) + 1
-        choice = input(f"Elige la opción de captura (presiona Enter para la opción {default_option}): ")
-        if choice.strip() == "":
-            chosen = best
-        else:
-            try:
-                index = int(choice) - 1
-                if index < 0 or index >= len(evaluaciones):
-                    print("Opción no válida, se escoge la opción por defecto.")
-                    chosen = best
-                else:
-                    chosen = evaluaciones[index]
-            except:
-                print("Entrada no válida, se escoge la opción por defecto.")
-                chosen = best
-        move, neto, pts, exp_op, new_mesa = chosen
+            print(f"{i+1}. Con la carta {CARTAS[card]}: Capturar {de_mascara(captura)}{escoba_str} -> Puntos usuario: {pts:.2f}, Valor neto: {neto:.2f}")
+        chosen = elegir_opcion(evaluaciones, "Elige la opción de captura (presiona Enter para la opción {}): ")
+        (card, captura), neto, pts, exp_op, new_mesa = chosen
         escoba_str = " (escoba)" if not new_mesa else ""
-        print(f"Captura elegida para el usuario: Jugar la carta {move[2]} capturando {move[1]}{escoba_str}")
-    card = move[2]
-    captured = [c for c in estado['mesa'] if c not in new_mesa] + [card]
-    if card in estado['mano_usuario']:
-        estado['mano_usuario'].remove(card)
-    estado['capturadas_usuario'].extend(captured)
-    if not new_mesa:
-        estado['escobas_usuario'] += 1
-    estado['mesa'] = new_mesa
-    estado['last_capturador'] = "usuario"
-
-# --- FUNCIÓN DE PUNTOS FINAL POR CATEGORÍAS ---
-def calcular_puntuacion_final(estado):
-    """
-    Calcula el puntaje final para cada jugador según las categorías:
-      - "velo": N = 1, cuenta todas las cartas iguales a (7, 'O').
-      - "sietes": N = 4, cuenta todas las cartas con valor 7 (incluyendo el velo).
-      - "oros": N = 10, cuenta todas las cartas de oros (incluyendo el velo).
-      - "cartas": N = 40, cuenta todas las cartas capturadas.
-    El ganador de cada categoría (el que tenga más cartas capturadas en esa categoría) obtiene 1 punto;
-    en caso de empate, nadie obtiene puntos en esa categoría.
-    Las escobas suman 1 punto cada una.
-    Devuelve un diccionario con el puntaje total y un desglose por categoría para ambos jugadores.
-    """
-    def cuenta(cat, cartas):
-        if cat == "velo":
-            return sum(1 for c in cartas if c == (7, 'O'))
-        elif cat == "sietes":
-            return sum(1 for c in cartas if c[0] == 7)
-        elif cat == "oros":
-            return sum(1 for c in cartas if c[1] == 'O')
-        elif cat == "cartas":
-            return len(cartas)
-        else:
-            return 0
+        print(f"Captura elegida para el usuario: Jugar la carta {CARTAS[card]} capturando {de_mascara(captura)}{escoba_str}")
+    estado.apply(chosen[0], USUARIO)
 
-    categorias = ["velo", "sietes", "oros", "cartas"]
-    puntos = {"usuario": 0, "oponente": 0}
-    desglose = {"usuario": {}, "oponente": {}}
-    for cat in categorias:
-        count_user = cuenta(cat, estado["capturadas_usuario"])
-        count_op = cuenta(cat, estado["capturadas_oponente"])
-        if count_user > count_op:
-            puntos["usuario"] += 1
-            desglose["usuario"][cat] = 1
-            desglose["oponente"][cat] = 0
-        elif count_op > count_user:
-            puntos["oponente"] += 1
-            desglose["usuario"][cat] = 0
-            desglose["oponente"][cat] = 1
+def anunciar_barrido(estado):
+    """ Asigna (y anuncia) las cartas que quedan en la mesa al final de la partida. """
+    if estado.mesa:
+        mesa = de_mascara(estado.mesa)
+        if estado.ultimo == USUARIO:
+            print(f"\nÚltima mano: Ganas las cartas {mesa} que quedan en la mesa.")
+        elif estado.ultimo == OPONENTE:
+            print(f"\nÚltima mano: El oponente gana las cartas {mesa} que quedan en la mesa.")
         else:
-            desglose["usuario"][cat] = 0
-            desglose["oponente"][cat] = 0
-    # Agregar escobas (1 punto cada una)
-    puntos["usuario"] += estado["escobas_usuario"]
-    puntos["oponente"] += estado["escobas_oponente"]
-    desglose["usuario"]["escobas"] = estado["escobas_usuario"]
-    desglose["oponente"]["escobas"] = estado["escobas_oponente"]
-    return puntos, desglose
-
-# Las funciones sugerir_movida, sugerir_movida_oponente y elegir_captura_usuario se mantienen (ya incluidas arriba).
+            print("\nÚltima mano: No se asignan cartas, pues no hubo capturador final.")
+        estado.barrer()
 
 # ===============================
 # Función principal: escoba()
 # ===============================
-def escoba():
-    """ Función principal del juego. """
-    baraja = inicializar_baraja()
-    estado = {
-        'baraja': baraja,
-        'mesa': [],
-        'mano_usuario': [],
-        'capturadas_usuario': [],
-        'capturadas_oponente': [],
-        'escobas_usuario': 0,
-        'escobas_oponente': 0,
-        'last_capturador': None
-    }
-
+def escoba(evaluar=evaluar_jugadas, registro=None):
+    """
+    Función principal del juego: interfaz de texto sobre GameState.
+    'evaluar' es la función de evaluación de las sugerencias (ver busqueda.py).
+    'registro' es un registro.Escritor al que se añade la partida al terminar.
+    """
     user_inicia = input("¿Tienes tú la mano (S/N)? ").strip().upper() == 'S'
-    
+
     # Lectura inicial validada
-    estado['mesa'] = leer_cartas("Introduce las 4 cartas de la mesa: ", 4, allowed=estado['baraja'])
-    estado['baraja'] = remover_cartas(estado['baraja'], estado['mesa'])
-    estado['mano_usuario'] = leer_cartas("Introduce tus 3 cartas: ", 3, allowed=estado['baraja'])
-    estado['baraja'] = remover_cartas(estado['baraja'], estado['mano_usuario'])
+    mesa = leer_cartas("Introduce las 4 cartas de la mesa: ", 4, allowed=inicializar_baraja())
+    estado = GameState(mesa=a_mascara(mesa))
+    mano = leer_cartas("Introduce tus 3 cartas: ", 3, allowed=de_mascara(estado.baraja))
+    estado.repartir(USUARIO, a_mascara(mano))
 
     while True:
         print("\n--- Nueva jugada ---")
-        print(f"Mesa: {estado['mesa']}")
-        print(f"Tu mano: {estado['mano_usuario']}")
-        
-        move_user, new_mesa = sugerir_mejor_jugada(estado)
+        print(f"Mesa: {de_mascara(estado.mesa)}")
+        print(f"Tu mano: {de_mascara(estado.manos[USUARIO])}")
+
+        move_user = sugerir_mejor_jugada(estado, evaluar)
         if move_user is None:
             print("No hay jugadas evaluables. Pasando turno.")
         else:
-            card = move_user[2]
-            if move_user[0] == "captura":
-                escoba_str = " (escoba)" if not new_mesa else ""
-                print(f"Ejecutando jugada: Jugar la carta {card} capturando {move_user[1]}{escoba_str}")
-                estado['mano_usuario'].remove(card)
-                captured = [c for c in estado['mesa'] if c not in new_mesa] + [card]
-                estado['capturadas_usuario'].extend(captured)
-                estado['mesa'] = new_mesa
-                estado['last_capturador'] = "usuario"
-                if not estado['mesa']:
-                    estado['escobas_usuario'] += 1
+            card, captura = move_user
+            if captura:
+                escoba_str = " (escoba)" if captura == estado.mesa else ""
+                print(f"Ejecutando jugada: Jugar la carta {CARTAS[card]} capturando {de_mascara(captura)}{escoba_str}")
             else:
-                print(f"Ejecutando jugada: Jugar la carta {card} sin capturar, dejando la mesa en estado {new_mesa}")
-                estado['mano_usuario'].remove(card)
-                estado['mesa'] = new_mesa
-        
+                print(f"Ejecutando jugada: Jugar la carta {CARTAS[card]} sin capturar, dejando la mesa en estado {de_mascara(estado.mesa | BIT[card])}")
+            estado.apply(move_user, USUARIO)
+
         # Turno del oponente:
-        if estado["baraja"]:
-            op_carta = leer_cartas("Introduce la carta que juega tu oponente: ", 1, allowed=estado['baraja'])[0]
-            estado['baraja'] = remover_cartas(estado['baraja'], [op_carta])
+        if estado.baraja:
+            op_carta = leer_cartas("Introduce la carta que juega tu oponente: ", 1, allowed=de_mascara(estado.baraja))[0]
         else:
             op_carta = leer_cartas("Introduce la carta que juega tu oponente: ", 1)[0]
-        evaluaciones_op = sugerir_movida_oponente(op_carta, estado['mesa'], estado['baraja'])
-        if evaluaciones_op:
-            if len(evaluaciones_op) == 1:
-                chosen_op = evaluaciones_op[0]
-                move, neto, pts, exp_user, new_mesa_op = chosen_op
-                target = 15 - op_carta[0]
-                print("\nÚnica opción para el oponente, se ejecuta automáticamente:")
-                if not combinaciones_que_suman(estado['mesa'], target):
-                    print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} sin capturar")
-                    print("El oponente no puede capturar.")
-                else:
-                    if move[0] == "captura":
-                        escoba_str = " (escoba)" if not new_mesa_op else ""
-                        print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} capturando {move[1]}{escoba_str}")
-                    else:
-                        print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} sin capturar")
-                        print("El oponente renuncia a capturar.")
-            else:
-                best_op = max(evaluaciones_op, key=lambda x: x[1])
-                print("\nEvaluación de jugadas posibles para el oponente:")
-                for i, eval_item in enumerate(evaluaciones_op):
-                    move, neto, pts, exp_user, _ = eval_item
-                    escoba_str = " (escoba)" if move[0]=="captura" and not _ else ""
-                    if move[0] == "captura":
-                        print(f"{i+1}. Con la carta {move[2]}: Capturar {move[1]}{escoba_str} -> Puntos oponente: {pts:.2f}, Expectativa usuario: {exp_user:.2f}, Valor neto: {neto:.2f}")
-                    else:
-                        print(f"{i+1}. Con la carta {move[2]}: No capturar -> Puntos oponente: {pts:.2f}, Expectativa usuario: {exp_user:.2f}, Valor neto: {neto:.2f}")
-                default_option = evaluaciones_op.index(best_op) + 1
-                choice = input(f"Elige la opción que tomó tu oponente (presiona Enter para la opción {default_option}): ")
-                if choice.strip() == "":
-                    chosen_op = best_op
-                else:
-                    try:
-                        index = int(choice) - 1
-                        if index < 0 or index >= len(evaluaciones_op):
-                            print("Opción no válida, se escoge la opción por defecto.")
-                            chosen_op = best_op
-                        else:
-                            chosen_op = evaluaciones_op[index]
-                    except:
-                        print("Entrada no válida, se escoge la opción por defecto.")
-                        chosen_op = best_op
-            move, neto, pts, exp_user, new_mesa_op = chosen_op
-            if move[0] == "captura":
-                escoba_str = " (escoba)" if not new_mesa_op else ""
-                print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} capturando {move[1]}{escoba_str}")
-                capturadas = [c for c in estado['mesa'] if c not in new_mesa_op] + [op_carta]
-                estado['capturadas_oponente'].extend(capturadas)
-                estado['mesa'] = new_mesa_op
-                estado['last_capturador'] = "oponente"
-                if not estado['mesa']:
-                    estado['escobas_oponente'] += 1
-            else:
-                target = 15 - op_carta[0]
-                if not combinaciones_que_suman(estado['mesa'], target):
-                    print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} sin capturar")
-                    print("El oponente no puede capturar.")
+        op_card = INDICE[op_carta]
+        puede_capturar = hay_captura(estado.mesa, 15 - op_carta[0])
+        evaluaciones_op = sugerir_movida_oponente(estado, op_card, evaluar=evaluar)
+        if len(evaluaciones_op) == 1:
+            chosen_op = evaluaciones_op[0]
+            print("\nÚnica opción para el oponente, se ejecuta automáticamente:")
+            print(f"El oponente ejecuta la jugada: Jugar la carta {op_carta} sin capturar")
+            print("El oponente no puede capturar.")
+        else:
+            print("\nEvaluación de jugadas posibles para el oponente:")
+            for i, eval_item in enumerate(evaluaciones_op):
+                (card, captura), neto, pts, exp_user, new_mesa_op = eval_item
+                escoba_str = " (escoba)" if captura and not new_mesa_op else ""
+                if captura:
+                    print(f"{i+1}. Con la carta {op_carta}: Capturar {de_mascara(captura)}{escoba_str} -> Puntos oponente: {pts:.2f}, Expectativa usuario: {exp_user:.2f}, Valor neto: {neto:.2f}")
                 else:
-                    print(f"El oponente ejecuta la jugada: Jugar la carta {move[2]} sin capturar")
-                    print("El oponente renuncia a capturar.")
-                estado['mesa'].append(op_carta)
-                if combinaciones_que_suman(estado['mesa'], target):
-                    elegir_captura_usuario(estado)
+                    print(f"{i+1}. Con la carta {op_carta}: No capturar -> Puntos oponente: {pts:.2f}, Expectativa usuario: {exp_user:.2f}, Valor neto: {neto:.2f}")
+            chosen_op = elegir_opcion(evaluaciones_op, "Elige la opción que tomó tu oponente (presiona Enter para la opción {}): ")
+        (card, captura), neto, pts, exp_user, new_mesa_op = chosen_op
+        if captura:
+            escoba_str = " (escoba)" if not new_mesa_op else ""
+            print(f"El oponente ejecuta la jugada: Jugar la carta {op_carta} capturando {de_mascara(captura)}{escoba_str}")
+            estado.apply(chosen_op[0], OPONENTE)
         else:
-            estado['mesa'].append(op_carta)
-        
-        print(f"\nEstado actual de la mesa: {estado['mesa']}")
-        
+            print(f"El oponente ejecuta la jugada: Jugar la carta {op_carta} sin capturar")
+            print("El oponente renuncia a capturar." if puede_capturar else "El oponente no puede capturar.")
+            estado.apply(chosen_op[0], OPONENTE)
+            if hay_captura(estado.mesa, 15 - op_carta[0]):
+                elegir_captura_usuario(estado, evaluar)
+
+        print(f"\nEstado actual de la mesa: {de_mascara(estado.mesa)}")
+
         # Comprobación del final de la partida:
-        if not estado["mano_usuario"] and not estado["baraja"]:
-            if estado["mesa"]:
-                if estado["last_capturador"] == "usuario":
-                    print(f"\nÚltima mano: Ganas las cartas {estado['mesa']} que quedan en la mesa.")
-                    estado["capturadas_usuario"].extend(estado["mesa"])
-                elif estado["last_capturador"] == "oponente":
-                    print(f"\nÚltima mano: El oponente gana las cartas {estado['mesa']} que quedan en la mesa.")
-                    estado["capturadas_oponente"].extend(estado["mesa"])
-                else:
-                    print("\nÚltima mano: No se asignan cartas, pues no hubo capturador final.")
-                estado["mesa"] = []
+        if not estado.manos[USUARIO] and not estado.baraja:
+            anunciar_barrido(estado)
             break
-        
-        if not estado["mano_usuario"]:
-            if estado["baraja"]:
-                num_cards = 3 if len(estado["baraja"]) >= 3 else len(estado["baraja"])
-                nuevas = leer_cartas(f"Introduce tus {num_cards} nuevas cartas: ", num_cards, allowed=estado["baraja"])
-                estado["mano_usuario"] = nuevas
-                estado["baraja"] = remover_cartas(estado["baraja"], nuevas)
-            else:
-                if estado["mesa"]:
-                    if estado["last_capturador"] == "usuario":
-                        print(f"\nÚltima mano: Ganas las cartas {estado['mesa']} que quedan en la mesa.")
-                        estado["capturadas_usuario"].extend(estado["mesa"])
-                    elif estado["last_capturador"] == "oponente":
-                        print(f"\nÚltima mano: El oponente gana las cartas {estado['mesa']} que quedan en la mesa.")
-                        estado["capturadas_oponente"].extend(estado["mesa"])
-                    else:
-                        print("\nÚltima mano: No se asignan cartas, pues no hubo capturador final.")
-                    estado["mesa"] = []
-                break
-    
-    puntaje, desglose = calcular_puntuacion_final(estado)
+
+        if not estado.manos[USUARIO]:
+            num_cards = 3 if contar_cartas(estado.baraja) >= 3 else contar_cartas(estado.baraja)
+            nuevas = leer_cartas(f"Introduce tus {num_cards} nuevas cartas: ", num_cards, allowed=de_mascara(estado.baraja))
+            estado.repartir(USUARIO, a_mascara(nuevas))
+
+    if registro is not None:
+        registro.agregar(estado)
+
+    puntaje, desglose = estado.score()
     print("\n--- Puntuación Final ---")
     print(f"Usuario: {puntaje['usuario']:.2f} puntos")
     for cat, p in desglose["usuario"].items():
@@ -479,5 +1067,137 @@ def escoba():
     for cat, p in desglose["oponente"].items():
         print(f"   {cat}: {p:.2f}")
 
+# ====================================
+# Evaluador del consejero
+# ====================================
+def agregar_opciones_evaluador(parser, procesos=True):
+    """
+    Añade a 'parser' (argparse) las opciones del evaluador del consejero (ver crear_evaluador).
+    Con 'procesos' False no se añade --procesos (para quien ya lo usa con otro sentido).
+    """
+    parser.add_argument("--profundidad", type=int, default=1,
+                        help="jugadas que mira el consejero (1: evaluar_movida; más: expectimax)")
+    parser.add_argument("--pimc", type=int, default=None, metavar="MUESTRAS",
+                        help="usa Monte Carlo con información perfecta con este número de muestras")
+    parser.add_argument("--tiempo", type=float, default=None, metavar="MS",
+                        help="con --pimc, tiempo por decisión en milisegundos en lugar de un número fijo de muestras")
+    if procesos:
+        parser.add_argument("--procesos", dest="procesos_pimc", type=int, default=1,
+                            help="procesos para las simulaciones de --pimc")
+    parser.add_argument("--limite", type=float, default=None, metavar="MS",
+                        help="profundiza iterativamente hasta agotar este tiempo por decisión "
+                             "(hasta --profundidad jugadas si se da)")
+    parser.add_argument("--valoracion", default=None, metavar="PESOS",
+                        help="puntúa las jugadas con la valoración aprendida de estos pesos (ver valoracion.py)")
+    parser.add_argument("--creencias", action="store_true",
+                        help="a 1 jugada, pondera las respuestas del oponente según lo que sus jugadas dicen de su mano")
+    parser.add_argument("--aperturas", action="store_true",
+                        help="la primera decisión de la partida sale de la tabla de aperturas, si existe")
+    parser.add_argument("--final-exacto", action="store_true",
+                        help="en el último reparto, calcula la jugada exacta con minimax")
+
+def opciones_evaluador(args):
+    """ Argumentos de crear_evaluador a partir de las opciones de agregar_opciones_evaluador. """
+    return {"profundidad": args.profundidad, "pimc": args.pimc, "tiempo": args.tiempo,
+            "procesos": getattr(args, "procesos_pimc", 1), "limite": args.limite, "valoracion": args.valoracion,
+            "creencias": args.creencias, "aperturas": args.aperturas, "final_exacto": args.final_exacto}
+
+def comprobar_opciones_evaluador(profundidad=1, pimc=None, tiempo=None, limite=None, valoracion=None,
+                                 creencias=False, **_):
+    """ Lanza ValueError si las opciones de crear_evaluador no son compatibles, sin crear nada. """
+    if profundidad < 1:
+        raise ValueError("la profundidad tiene que ser al menos 1")
+    montecarlo = pimc is not None or tiempo is not None
+    if creencias and (montecarlo or limite is not None or profundidad > 1):
+        raise ValueError("las creencias sólo se aplican a 1 jugada")
+    if valoracion is not None and montecarlo:
+        raise ValueError("la valoración aprendida no se aplica a Monte Carlo")
+    if valoracion is not None and limite is not None:
+        raise ValueError("la valoración aprendida no se aplica a la búsqueda con límite de tiempo")
+
+def crear_evaluador(profundidad=1, pimc=None, tiempo=None, procesos=1, limite=None, valoracion=None,
+                    creencias=False, aperturas=False, final_exacto=False, mano=USUARIO, informe=None):
+    """
+    Evaluador del consejero, con la firma de evaluar_jugadas. Sin opciones es el de
+    siempre, evaluar_jugadas. Las búsquedas se eligen como en la línea de órdenes:
+    'pimc' (muestras) o 'tiempo' (ms), Monte Carlo con información perfecta (cerrar con
+    evaluar.busqueda.cerrar()); 'limite' (ms), profundización iterativa hasta
+    'profundidad' jugadas (8 si es 1), con 'informe(profundidad, ms)' tras cada decisión;
+    'profundidad' > 1, expectimax. 'valoracion' es un fichero de pesos de valoracion.py.
+    'creencias' (sólo a 1 jugada), 'aperturas' y 'final_exacto' añaden las envolturas de
+    creencias.py, aperturas.py y busqueda.con_final_exacto ('mano': quién es mano).
+    Lanza ValueError si las opciones no son compatibles (ver comprobar_opciones_evaluador).
+    """
+    comprobar_opciones_evaluador(profundidad, pimc, tiempo, limite, valoracion, creencias)
+    if valoracion is not None:
+        from valoracion import Valoracion
+        valoracion = Valoracion.cargar(valoracion)
+    if pimc is not None or tiempo is not None:
+        from busqueda import evaluador_pimc
+        evaluar = evaluador_pimc(pimc or 64, tiempo, procesos)
+    elif limite is not None:
+        from busqueda import evaluador_limitado
+        evaluar = evaluador_limitado(limite, profundidad if profundidad > 1 else 8, informe=informe)
+    elif profundidad > 1:
+        from busqueda import evaluador_expectimax
+        evaluar = evaluador_expectimax(profundidad, valoracion=valoracion)
+    elif valoracion is not None:
+        from valoracion import evaluador_valoracion
+        evaluar = evaluador_valoracion(valoracion)
+    else:
+        evaluar = evaluar_jugadas
+    busqueda = getattr(evaluar, "busqueda", None)
+    if creencias:
+        from creencias import evaluador_creencia
+        evaluar = evaluador_creencia(evaluar=evaluar)
+    if aperturas:
+        from aperturas import con_aperturas
+        evaluar = con_aperturas(evaluar)
+    if final_exacto:
+        from busqueda import con_final_exacto
+        evaluar = con_final_exacto(evaluar, mano)
+    if busqueda is not None:
+        evaluar.busqueda = busqueda
+    return evaluar
+
+def main(argv=None):
+    import argparse
+    # Si este fichero se ejecuta como __main__, es un módulo distinto del escoba que
+    # importan los demás: la partida y los globales (PERFIL, RESPUESTAS) son los de éste.
+    import escoba as modulo
+    parser = argparse.ArgumentParser(description="Escoba para 2 jugadores con sugerencia de jugadas.")
+    modulo.agregar_opciones_evaluador(parser)
+    parser.add_argument("--perfil", default=None, metavar="TRAZA",
+                        help="mide cada decisión, muestra el resumen al final y guarda la traza JSON en TRAZA")
+    parser.add_argument("--registro", default=None, metavar="FICHERO",
+                        help="añade la partida a este registro binario (ver registro.py)")
+    args = parser.parse_args(argv)
+    informe = lambda profundidad, ms: print(f"(búsqueda a {profundidad} jugadas en {ms:.0f} ms)")
+    try:
+        evaluar = modulo.crear_evaluador(informe=informe, **modulo.opciones_evaluador(args))
+    except ValueError as e:
+        parser.error(str(e))
+    perfil = None
+    if args.perfil:
+        import instrumentacion
+        perfil = instrumentacion.activar()
+    registro = None
+    if args.registro:
+        from registro import Escritor
+        registro = Escritor(args.registro)
+    try:
+        modulo.escoba(evaluar, registro)
+    finally:
+        busqueda = getattr(evaluar, "busqueda", None)
+        if busqueda is not None and hasattr(busqueda, "cerrar"):
+            busqueda.cerrar()
+        if registro is not None:
+            registro.cerrar()
+        if perfil is not None:
+            print("\n--- Perfil de las decisiones ---")
+            print(perfil.resumen())
+            perfil.guardar_traza(args.perfil)
+            print(f"Traza guardada en {args.perfil}")
+
 if __name__ == '__main__':
-    escoba()
+    main()
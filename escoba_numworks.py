@@ -1,20 +1,216 @@
-def fmt(s): return "\n".join(s[i:i+28] for i in range(0,len(s),28))
+VELO=(7,1)
+VACIOS=(0,0,0,0)
+def inicializar_baraja():
+ return[(v,su)for su in(1,2,3,4)for v in range(1,11)]
+def remover_cartas(baraja,cartas):
+ r=baraja[:]
+ for c in cartas:
+  if c in r:
+   r.remove(c)
+ return r
+def puntos(cartas,sietes,oros,velo,escobas=0):
+ return min(cartas,21)/21+velo+min(sietes,3)*(1/3)+min(oros,6)*(1/6)+escobas
+def contadores(cartas):
+ n=sietes=oros=velo=0
+ for c in cartas:
+  n+=1
+  if c==VELO:
+   velo+=1
+  elif c[0]==7:
+   sietes+=1
+  elif c[1]==1:
+   oros+=1
+ return n,sietes,oros,velo
+def puntos_movida(cont,n,sietes,oros,velo,escobas=0):
+ return(puntos(cont[0]+n,cont[1]+sietes,cont[2]+oros,cont[3]+velo)-puntos(cont[0],cont[1],cont[2],cont[3])+escobas)
+def combinaciones(valores,objetivo):
+ n=len(valores)
+ resto=[0]*(n+1)
+ for i in range(n-1,-1,-1):
+  resto[i]=resto[i+1]+valores[i]
+ m=0
+ s=0
+ i=0
+ while True:
+  if i<n and s+resto[i]>=objetivo:
+   v=valores[i]
+   if s+v<objetivo:
+    m|=1<<i
+    s+=v
+   elif s+v==objetivo:
+    yield m|1<<i
+   i+=1
+  else:
+   if not m:
+    return
+   j=i-1
+   while not((m>>j)&1):
+    j-=1
+   m^=1<<j
+   s-=valores[j]
+   i=j+1
+def capturas(valores,objetivo):
+ n=len(valores)
+ orden=sorted(range(n),key=lambda k:valores[k])
+ resto=[0]*(n+1)
+ for i in range(n-1,-1,-1):
+  resto[i]=resto[i+1]+valores[orden[i]]
+ m=0
+ s=0
+ i=0
+ while True:
+  if i<n and s+resto[i]>=objetivo and s+valores[orden[i]]<=objetivo:
+   v=valores[orden[i]]
+   if s+v<objetivo:
+    m|=1<<i
+    s+=v
+   else:
+    r=0
+    k=0
+    t=m|1<<i
+    while t:
+     if t&1:
+      r|=1<<orden[k]
+     t>>=1
+     k+=1
+    yield r
+   i+=1
+  else:
+   if not m:
+    return
+   j=i-1
+   while not((m>>j)&1):
+    j-=1
+   m^=1<<j
+   s-=valores[orden[j]]
+   i=j+1
+def combinaciones_que_suman(cartas,objetivo):
+ res=[]
+ for m in combinaciones([c[0]for c in cartas],objetivo):
+  res.append([cartas[k]for k in range(len(cartas))if(m>>k)&1])
+ return res
+def puede_capturar(cartas,objetivo):
+ for _ in capturas([c[0]for c in cartas],objetivo):
+  return True
+ return False
+_MEJORES=[0]*20
+def _mejores_valor(mesa,valores,v,todo,total,cont):
+ b0=b1=0
+ for m in(todo,)if total==15-v else combinaciones(valores,15-v):
+  n=sietes=oros=velo=0
+  k=0
+  r=m
+  while r:
+   if r&1:
+    c=mesa[k]
+    n+=1
+    if c[0]==7:
+     if c[1]==1:
+      velo+=1
+     else:
+      sietes+=1
+    elif c[1]==1:
+     oros+=1
+   r>>=1
+   k+=1
+  e=1 if m==todo else 0
+  if v==7:
+   p0=puntos_movida(cont,n+1,sietes+1,oros,velo,e)
+   p1=puntos_movida(cont,n+1,sietes,oros,velo+1,e)
+  else:
+   p0=puntos_movida(cont,n+1,sietes,oros,velo,e)
+   p1=puntos_movida(cont,n+1,sietes,oros+1,velo,e)
+  if p0>b0:
+   b0=p0
+  if p1>b1:
+   b1=p1
+ _MEJORES[2*(v-1)]=b0
+ _MEJORES[2*(v-1)+1]=b1
+def expectativa_oponente(mesa,deck,cont=VACIOS):
+ if not deck:
+  return 0
+ valores=[c[0]for c in mesa]
+ todo=(1<<len(mesa))-1
+ total=sum(valores)
+ hechos=0
+ tot=0
+ for op in deck:
+  v=op[0]
+  if not((hechos>>v)&1):
+   hechos|=1<<v
+   _mejores_valor(mesa,valores,v,todo,total,cont)
+  tot+=_MEJORES[2*(v-1)+(1 if op[1]==1 else 0)]
+ return tot/len(deck)
+def evaluar_movida(card,mesa,deck,movida,cont=VACIOS,cont_rival=VACIOS):
+ if movida[0]=="captura":
+  combo=movida[1]
+  nm=[c for c in mesa if c not in combo]
+  n,sietes,oros,velo=contadores(combo+[card])
+  pts=puntos_movida(cont,n,sietes,oros,velo,1 if len(nm)==0 else 0)
+ else:
+  nm=mesa+[card]
+  pts=0
+ exp=expectativa_oponente(nm,deck,cont_rival)
+ return pts-exp,pts,exp,nm
+def calcular_puntuacion_final(estado):
+ pts_final={"usuario":0,"oponente":0}
+ desg={"usuario":{},"oponente":{}}
+ cu_todas=estado["capturadas_usuario"]
+ co_todas=estado["capturadas_oponente"]
+ for cat in("velo","sietes","oros","cartas"):
+  if cat=="velo":
+   cu=sum(1 for c in cu_todas if c==VELO)
+   co=sum(1 for c in co_todas if c==VELO)
+  elif cat=="sietes":
+   cu=sum(1 for c in cu_todas if c[0]==7)
+   co=sum(1 for c in co_todas if c[0]==7)
+  elif cat=="oros":
+   cu=sum(1 for c in cu_todas if c[1]==1)
+   co=sum(1 for c in co_todas if c[1]==1)
+  else:
+   cu=len(cu_todas)
+   co=len(co_todas)
+  if cu>co:
+   pts_final["usuario"]+=1
+   desg["usuario"][cat]=1
+   desg["oponente"][cat]=0
+  elif co>cu:
+   pts_final["oponente"]+=1
+   desg["usuario"][cat]=0
+   desg["oponente"][cat]=1
+  else:
+   desg["usuario"][cat]=0
+   desg["oponente"][cat]=0
+ pts_final["usuario"]+=estado["escobas_usuario"]
+ pts_final["oponente"]+=estado["escobas_oponente"]
+ desg["usuario"]["escobas"]=estado["escobas_usuario"]
+ desg["oponente"]["escobas"]=estado["escobas_oponente"]
+ return pts_final,desg
+def fmt(s):
+ return "\n".join(s[i:i+28]for i in range(0,len(s),28))
+def f2(x):
+ return "{0:.2f}".format(x)
 def parsear_carta(s):
  s=s.strip()
- if len(s)<2: return None
- if "." not in s: return None
+ if len(s)<2:
+  return None
+ if "." not in s:
+  return None
  p=s.split(".")
- if len(p)!=2: return None
+ if len(p)!=2:
+  return None
  try:
-  v=int(p[0]); su=int(p[1])
+  v=int(p[0])
+  su=int(p[1])
  except:
   return None
- if not(1<=v<=10 and 1<=su<=4): return None
- return (v,su)
+ if not(1<=v<=10 and 1<=su<=4):
+  return None
+ return(v,su)
 def leer_cartas(mensaje,cantidad,allowed=None):
  while True:
   entrada=input(fmt(mensaje))
-  partes=[p.strip() for p in entrada.split(",")]
+  partes=[p.strip()for p in entrada.split(",")]
   if len(partes)!=cantidad:
    print(fmt("Error: Debes introducir "+str(cantidad)+" cartas"))
    continue
@@ -24,130 +220,87 @@ def leer_cartas(mensaje,cantidad,allowed=None):
    carta=parsear_carta(p)
    if carta==None:
     print(fmt("La carta '"+p+"' no es válida"))
-    ok=False; break
+    ok=False
+    break
    if allowed!=None and carta not in allowed:
     print(fmt("La carta "+str(carta)+" no está disponible"))
-    ok=False; break
+    ok=False
+    break
    cartas.append(carta)
-  if ok: return cartas
-def inicializar_baraja():
- return [(v,su) for su in (1,2,3,4) for v in range(1,11)]
-def remover_cartas(b,L):
- r=b[:]
- for c in L:
-  if c in r: r.remove(c)
- return r
-def puntos_cartas_original(cartas,esc=0):
- t=len(cartas)
- pts=min(t,21)/21
- pts_velo=sum(1 for c in cartas if c==(7,1))
- pts_sietes=min(sum(1 for c in cartas if c[0]==7 and c!=(7,1)),3)*(1/3)
- pts_oros=min(sum(1 for c in cartas if c[1]==1 and c!=(7,1)),6)*(1/6)
- return pts+pts_velo+pts_sietes+pts_oros+esc
-def combinaciones_que_suman(cartas,obj):
- res=[]
- def backtrack(i,cur,s):
-  if s==obj: res.append(cur.copy())
-  elif s>obj: return
-  else:
-   for j in range(i,len(cartas)):
-    cur.append(cartas[j])
-    backtrack(j+1,cur,s+cartas[j][0])
-    cur.pop()
- backtrack(0,[],0)
- return res
-def evaluar_movida(card,mesa,deck,movida):
- if movida[0]=="captura":
-  combo=movida[1]
-  nm=[c for c in mesa if c not in combo]
-  pts=puntos_cartas_original(combo+[card],1 if len(nm)==0 else 0)
- else:
-  nm=mesa+[card]; pts=0
- tot=0
- if deck:
-  for op in deck:
-   t=15-op[0]
-   comb=combinaciones_que_suman(nm,t)
-   mejor=0
-   for combo in comb:
-    nmop=[c for c in nm if c not in combo]
-    p=puntos_cartas_original(combo+[op],1 if len(nmop)==0 else 0)
-    if p>mejor: mejor=p
-   tot+=mejor
-  exp=tot/len(deck)
- else: exp=0
- net=pts-exp
- return net,pts,exp,nm
+  if ok:
+   return cartas
+def elegir(evals,mensaje,invalida,no_valida):
+ best=max(evals,key=lambda x:x[1])
+ d=evals.index(best)+1
+ c=input(fmt(mensaje+str(d)+"): "))
+ if c.strip()=="":
+  return best
+ try:
+  idx=int(c)-1
+ except:
+  print(fmt(invalida))
+  return best
+ if idx<0 or idx>=len(evals):
+  print(fmt(no_valida))
+  return best
+ return evals[idx]
 def sugerir_mejor_jugada(estado):
  evals=[]
+ cu=contadores(estado['capturadas_usuario'])
+ co=contadores(estado['capturadas_oponente'])
  for card in estado['mano_usuario']:
-  t=15-card[0]
-  cap=combinaciones_que_suman(estado['mesa'],t)
-  if cap: moves=[("captura",c,card) for c in cap]
-  else: moves=[("no captura",None,card)]
+  cap=combinaciones_que_suman(estado['mesa'],15-card[0])
+  if cap:
+   moves=[("captura",c,card)for c in cap]
+  else:
+   moves=[("no captura",None,card)]
   for move in moves:
-   net,pts,exp,nm=evaluar_movida(card,estado['mesa'],estado['baraja'],(move[0],move[1]))
+   net,pts,exp,nm=evaluar_movida(card,estado['mesa'],estado['baraja'],(move[0],move[1]),cu,co)
    evals.append((move,net,pts,exp,nm))
- if evals:
-  best=max(evals,key=lambda x: x[1])
-  print(fmt("Evaluación de jugadas posibles:"))
-  for i,ev in enumerate(evals):
-   move,net,pts,exp,nm=ev
-   esc=" (escoba)" if move[0]=="captura" and not nm else ""
-   if move[0]=="captura":
-    print(fmt(str(i+1)+". "+str(move[2])+": Capturar "+str(move[1])+esc+" -> Pts: "+str("{0:.2f}".format(pts))+", Exp: "+str("{0:.2f}".format(exp))+", Neto: "+str("{0:.2f}".format(net))))
-   else:
-    print(fmt(str(i+1)+". "+str(move[2])+": No capturar -> Pts: "+str("{0:.2f}".format(pts))+", Exp: "+str("{0:.2f}".format(exp))+", Neto: "+str("{0:.2f}".format(net))))
-  d=evals.index(best)+1
-  c=input(fmt("Elige la opción (Enter para "+str(d)+"): "))
-  if c.strip()=="":
-   chosen=best
-  else:
-   try:
-    idx=int(c)-1
-    if idx<0 or idx>=len(evals):
-     print(fmt("Opción no válida, se elige predeterminada"))
-     chosen=best
-    else: chosen=evals[idx]
-   except:
-    print(fmt("Entrada no válida, se elige predeterminada"))
-    chosen=best
-  move,net,pts,exp,nm=chosen
+ if not evals:
+  print(fmt("No hay jugadas evaluables."))
+  return None,estado['mesa']
+ print(fmt("Evaluación de jugadas posibles:"))
+ for i,ev in enumerate(evals):
+  move,net,pts,exp,nm=ev
   esc=" (escoba)" if move[0]=="captura" and not nm else ""
   if move[0]=="captura":
-   print(fmt("Sugerencia: "+str(move[2])+" capturando "+str(move[1])+esc+"\n"))
+   print(fmt(str(i+1)+". "+str(move[2])+": Capturar "+str(move[1])+esc+" -> Pts: "+f2(pts)+", Exp: "+f2(exp)+", Neto: "+f2(net)))
   else:
-   print(fmt("Sugerencia: "+str(move[2])+" sin capturar\n"))
-  return move,nm
+   print(fmt(str(i+1)+". "+str(move[2])+": No capturar -> Pts: "+f2(pts)+", Exp: "+f2(exp)+", Neto: "+f2(net)))
+ chosen=elegir(evals,"Elige la opción (Enter para ","Entrada no válida, se elige predeterminada","Opción no válida, se elige predeterminada")
+ evals=None
+ move,net,pts,exp,nm=chosen
+ esc=" (escoba)" if move[0]=="captura" and not nm else ""
+ if move[0]=="captura":
+  print(fmt("Sugerencia: "+str(move[2])+" capturando "+str(move[1])+esc+"\n"))
  else:
-  print(fmt("No hay jugadas evaluables."))
-  return None,estado['mesa']
-def sugerir_movida_oponente(op,mesa,deck):
- t=15-op[0]
- cap=combinaciones_que_suman(mesa,t)
- moves=[]
- for combo in cap: moves.append(("captura",combo,op))
+  print(fmt("Sugerencia: "+str(move[2])+" sin capturar\n"))
+ return move,nm
+def sugerir_movida_oponente(op,estado):
+ mesa=estado['mesa']
+ co=contadores(estado['capturadas_oponente'])
+ cu=contadores(estado['capturadas_usuario'])
+ moves=[("captura",combo,op)for combo in combinaciones_que_suman(mesa,15-op[0])]
  moves.append(("no captura",None,op))
  evals=[]
  for move in moves:
-  net,pts,exp,nm=evaluar_movida(op,mesa,deck,(move[0],move[1]))
+  net,pts,exp,nm=evaluar_movida(op,mesa,estado['baraja'],(move[0],move[1]),co,cu)
   evals.append((move,net,pts,exp,nm))
  return evals
 def elegir_captura_usuario(estado):
  evals=[]
+ cu=contadores(estado['capturadas_usuario'])
+ co=contadores(estado['capturadas_oponente'])
  for card in estado['mano_usuario']:
-  t=15-card[0]
-  combos=combinaciones_que_suman(estado['mesa'],t)
-  if combos:
-   for combo in combos:
-    net,pts,exp,nm=evaluar_movida(card,estado['mesa'],estado['baraja'],("captura",combo))
-    evals.append((("captura",combo,card),net,pts,exp,nm))
+  for combo in combinaciones_que_suman(estado['mesa'],15-card[0]):
+   net,pts,exp,nm=evaluar_movida(card,estado['mesa'],estado['baraja'],("captura",combo),cu,co)
+   evals.append((("captura",combo,card),net,pts,exp,nm))
  if not evals:
   print(fmt("No hay posibilidades de captura para el usuario."))
   return
  if len(evals)==1:
-  chosen=evals[0]
-  move,net,pts,exp,nm=chosen
+  move,net,pts,exp,nm=evals[0]
   esc=" (escoba)" if not nm else ""
   print(fmt("Captura automática: "+str(move[2])+" capturando "+str(move[1])+esc))
  else:
@@ -155,28 +308,13 @@ def elegir_captura_usuario(estado):
   for i,ev in enumerate(evals):
    move,net,pts,exp,nm=ev
    esc=" (escoba)" if not nm else ""
-   print(fmt(str(i+1)+". "+str(move[2])+" capturar "+str(move[1])+esc+" -> Pts: "+str("{0:.2f}".format(pts))+", Neto: "+str("{0:.2f}".format(net))))
-  best=max(evals,key=lambda x: x[1])
-  d=evals.index(best)+1
-  c=input(fmt("Elige captura (Enter para "+str(d)+"): "))
-  if c.strip()=="":
-   chosen=best
-  else:
-   try:
-    idx=int(c)-1
-    if idx<0 or idx>=len(evals):
-     print(fmt("Opción no válida, se elige predeterminada"))
-     chosen=best
-    else: chosen=evals[idx]
-   except:
-    print(fmt("Entrada no válida, se elige predeterminada"))
-    chosen=best
-  move,net,pts,exp,nm=chosen
+   print(fmt(str(i+1)+". "+str(move[2])+" capturar "+str(move[1])+esc+" -> Pts: "+f2(pts)+", Neto: "+f2(net)))
+  move,net,pts,exp,nm=elegir(evals,"Elige captura (Enter para ","Entrada no válida, se elige predeterminada","Opción no válida, se elige predeterminada")
   esc=" (escoba)" if not nm else ""
   print(fmt("Captura elegida: "+str(move[2])+" capturando "+str(move[1])+esc))
  evals=None
  card=move[2]
- cap=[c for c in estado['mesa'] if c not in nm]+[card]
+ cap=[c for c in estado['mesa']if c not in nm]+[card]
  if card in estado['mano_usuario']:
   estado['mano_usuario'].remove(card)
  estado['capturadas_usuario'].extend(cap)
@@ -184,39 +322,20 @@ def elegir_captura_usuario(estado):
   estado['escobas_usuario']+=1
  estado['mesa']=nm
  estado['last_capturador']="usuario"
-def calcular_puntuacion_final(estado):
- cats={"velo":1,"sietes":4,"oros":10,"cartas":40}
- pts_final={"usuario":0,"oponente":0}
- desg={"usuario":{},"oponente":{}}
- for cat,N in cats.items():
-  if cat=="velo":
-   cu=sum(1 for c in estado["capturadas_usuario"] if c==(7,1))
-   co=sum(1 for c in estado["capturadas_oponente"] if c==(7,1))
-  elif cat=="sietes":
-   cu=sum(1 for c in estado["capturadas_usuario"] if c[0]==7)
-   co=sum(1 for c in estado["capturadas_oponente"] if c[0]==7)
-  elif cat=="oros":
-   cu=sum(1 for c in estado["capturadas_usuario"] if c[1]==1)
-   co=sum(1 for c in estado["capturadas_oponente"] if c[1]==1)
-  elif cat=="cartas":
-   cu=len(estado["capturadas_usuario"])
-   co=len(estado["capturadas_oponente"])
-  if cu>co:
-   pts_final["usuario"]+=1; desg["usuario"][cat]=1; desg["oponente"][cat]=0
-  elif co>cu:
-   pts_final["oponente"]+=1; desg["usuario"][cat]=0; desg["oponente"][cat]=1
+def barrer(estado):
+ if estado["mesa"]:
+  if estado["last_capturador"]=="usuario":
+   print(fmt("Última mano: Ganas las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
+   estado["capturadas_usuario"].extend(estado["mesa"])
+  elif estado["last_capturador"]=="oponente":
+   print(fmt("Última mano: El oponente gana las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
+   estado["capturadas_oponente"].extend(estado["mesa"])
   else:
-   desg["usuario"][cat]=0; desg["oponente"][cat]=0
- pts_final["usuario"]+=estado["escobas_usuario"]
- pts_final["oponente"]+=estado["escobas_oponente"]
- desg["usuario"]["escobas"]=estado["escobas_usuario"]
- desg["oponente"]["escobas"]=estado["escobas_oponente"]
- return pts_final,desg
+   print(fmt("Última mano: No se asignan cartas, no hubo capturador final."))
+  estado["mesa"]=[]
 def escoba():
  print(fmt("Bienvenido a Escoba"))
- bar=inicializar_baraja()
- estado={'baraja':bar,'mesa':[],'mano_usuario':[],'capturadas_usuario':[],'capturadas_oponente':[],
- 'escobas_usuario':0,'escobas_oponente':0,'last_capturador':None}
+ estado={'baraja':inicializar_baraja(),'mesa':[],'mano_usuario':[],'capturadas_usuario':[],'capturadas_oponente':[],'escobas_usuario':0,'escobas_oponente':0,'last_capturador':None}
  estado['mesa']=leer_cartas("Introduce las 4 cartas de la mesa: ",4,allowed=estado['baraja'])
  estado['baraja']=remover_cartas(estado['baraja'],estado['mesa'])
  estado['mano_usuario']=leer_cartas("Introduce tus 3 cartas: ",3,allowed=estado['baraja'])
@@ -230,11 +349,11 @@ def escoba():
    print(fmt("Sin jugadas, turno pasado"))
   else:
    card=move_user[2]
+   estado['mano_usuario'].remove(card)
    if move_user[0]=="captura":
     escoba_str=" (escoba)" if not new_mesa else ""
     print(fmt("Ejecutando: "+str(card)+" capturando "+str(move_user[1])+escoba_str))
-    estado['mano_usuario'].remove(card)
-    cap=[c for c in estado['mesa'] if c not in new_mesa]+[card]
+    cap=[c for c in estado['mesa']if c not in new_mesa]+[card]
     estado['capturadas_usuario'].extend(cap)
     estado['mesa']=new_mesa
     estado['last_capturador']="usuario"
@@ -242,86 +361,51 @@ def escoba():
      estado['escobas_usuario']+=1
    else:
     print(fmt("Ejecutando: "+str(card)+" sin capturar, mesa "+str(new_mesa)))
-    estado['mano_usuario'].remove(card)
     estado['mesa']=new_mesa
   if estado["baraja"]:
    op_carta=leer_cartas("Carta oponente: ",1,allowed=estado['baraja'])[0]
    estado['baraja']=remover_cartas(estado['baraja'],[op_carta])
   else:
    op_carta=leer_cartas("Carta oponente: ",1)[0]
-  eval_op=sugerir_movida_oponente(op_carta,estado['mesa'],estado['baraja'])
-  if eval_op:
-   if len(eval_op)==1:
-    cho=eval_op[0]
-    move,net,pts,exp,new_mesa_op=cho
-    t=15-op_carta[0]
-    print(fmt("Única op. oponente:"))
-    if not combinaciones_que_suman(estado['mesa'],t):
-     print(fmt("Jugar "+str(move[2])+" sin capturar"))
-     print(fmt("No puede capturar"))
-    else:
-     if move[0]=="captura":
-      escoba_str=" (escoba)" if not new_mesa_op else ""
-      print(fmt("Jugar "+str(move[2])+" capturando "+str(move[1])+escoba_str))
-     else:
-      print(fmt("Jugar "+str(move[2])+" sin capturar"))
-      print(fmt("Renuncia a capturar"))
-   else:
-    best_op=max(eval_op,key=lambda x:x[1])
-    print(fmt("Op. posibles oponente:"))
-    for i,ev in enumerate(eval_op):
-     move,net,pts,exp,_=ev
-     escoba_str=" (escoba)" if move[0]=="captura" and not _ else ""
-     print(fmt(str(i+1)+". "+str(move[2])+": Capturar "+str(move[1])+escoba_str+" -> Pts: "+str("{0:.2f}".format(pts))+", Exp: "+str("{0:.2f}".format(exp))+", Neto: "+str("{0:.2f}".format(net))))
-    d=eval_op.index(best_op)+1
-    c=input(fmt("Elige op. oponente (Enter para "+str(d)+"): "))
-    if c.strip()=="":
-     cho=best_op
-    else:
-     try:
-      idx=int(c)-1
-      if idx<0 or idx>=len(eval_op):
-       print(fmt("Op. no válida, se elige pred."))
-       cho=best_op
-      else: cho=eval_op[idx]
-     except:
-      print(fmt("Entrada no válida, se elige pred."))
-      cho=best_op
+  t=15-op_carta[0]
+  eval_op=sugerir_movida_oponente(op_carta,estado)
+  if len(eval_op)==1:
+   cho=eval_op[0]
    move,net,pts,exp,new_mesa_op=cho
-   if move[0]=="captura":
-    escoba_str=" (escoba)" if not new_mesa_op else ""
-    print(fmt("Oponente: "+str(move[2])+" capturando "+str(move[1])+escoba_str))
-    cap=[c for c in estado['mesa'] if c not in new_mesa_op]+[op_carta]
-    estado['capturadas_oponente'].extend(cap)
-    estado['mesa']=new_mesa_op
-    estado['last_capturador']="oponente"
-    if not estado['mesa']:
-     estado['escobas_oponente']+=1
-   else:
-    t=15-op_carta[0]
-    if not combinaciones_que_suman(estado['mesa'],t):
-     print(fmt("Oponente: "+str(move[2])+" sin capturar"))
-     print(fmt("No puede capturar"))
-    else:
-     print(fmt("Oponente: "+str(move[2])+" sin capturar"))
-     print(fmt("Renuncia a capturar"))
-    estado['mesa'].append(op_carta)
-    if combinaciones_que_suman(estado['mesa'],t):
-     elegir_captura_usuario(estado)
+   print(fmt("Única op. oponente:"))
+   print(fmt("Jugar "+str(move[2])+" sin capturar"))
+   print(fmt("No puede capturar"))
+  else:
+   print(fmt("Op. posibles oponente:"))
+   for i,ev in enumerate(eval_op):
+    move,net,pts,exp,nm=ev
+    escoba_str=" (escoba)" if move[0]=="captura" and not nm else ""
+    print(fmt(str(i+1)+". "+str(move[2])+": Capturar "+str(move[1])+escoba_str+" -> Pts: "+f2(pts)+", Exp: "+f2(exp)+", Neto: "+f2(net)))
+   cho=elegir(eval_op,"Elige op. oponente (Enter para ","Entrada no válida, se elige pred.","Op. no válida, se elige pred.")
+  eval_op=None
+  move,net,pts,exp,new_mesa_op=cho
+  if move[0]=="captura":
+   escoba_str=" (escoba)" if not new_mesa_op else ""
+   print(fmt("Oponente: "+str(move[2])+" capturando "+str(move[1])+escoba_str))
+   cap=[c for c in estado['mesa']if c not in new_mesa_op]+[op_carta]
+   estado['capturadas_oponente'].extend(cap)
+   estado['mesa']=new_mesa_op
+   estado['last_capturador']="oponente"
+   if not estado['mesa']:
+    estado['escobas_oponente']+=1
   else:
+   if not puede_capturar(estado['mesa'],t):
+    print(fmt("Oponente: "+str(move[2])+" sin capturar"))
+    print(fmt("No puede capturar"))
+   else:
+    print(fmt("Oponente: "+str(move[2])+" sin capturar"))
+    print(fmt("Renuncia a capturar"))
    estado['mesa'].append(op_carta)
+   if puede_capturar(estado['mesa'],t):
+    elegir_captura_usuario(estado)
   print(fmt("Estado mesa: "+str(estado['mesa'])))
-  if not estado["mano_usuario"] and not estado["baraja"]:
-   if estado["mesa"]:
-    if estado["last_capturador"]=="usuario":
-     print(fmt("Última mano: Ganas las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
-     estado["capturadas_usuario"].extend(estado["mesa"])
-    elif estado["last_capturador"]=="oponente":
-     print(fmt("Última mano: El oponente gana las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
-     estado["capturadas_oponente"].extend(estado["mesa"])
-    else:
-     print(fmt("Última mano: No se asignan cartas, no hubo capturador final."))
-    estado["mesa"]=[]
+  if not estado["mano_usuario"]and not estado["baraja"]:
+   barrer(estado)
    break
   if not estado["mano_usuario"]:
    if estado["baraja"]:
@@ -330,22 +414,13 @@ def escoba():
     estado["mano_usuario"]=nuevas
     estado["baraja"]=remover_cartas(estado["baraja"],nuevas)
    else:
-    if estado["mesa"]:
-     if estado["last_capturador"]=="usuario":
-      print(fmt("Última mano: Ganas las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
-      estado["capturadas_usuario"].extend(estado["mesa"])
-     elif estado["last_capturador"]=="oponente":
-      print(fmt("Última mano: El oponente gana las cartas "+str(estado['mesa'])+" que quedan en la mesa."))
-      estado["capturadas_oponente"].extend(estado["mesa"])
-     else:
-      print(fmt("Última mano: No se asignan cartas, no hubo capturador final."))
-     estado["mesa"]=[]
+    barrer(estado)
     break
  print(fmt("Puntuación Final:"))
  pf,desg=calcular_puntuacion_final(estado)
  print(fmt("Usuario: "+str(pf["usuario"])+" puntos"))
  for cat,p in desg["usuario"].items():
-  print(fmt("   "+cat+": "+str("{0:.2f}".format(p))))
+  print(fmt("   "+cat+": "+f2(p)))
  print(fmt("Oponente: "+str(pf["oponente"])+" puntos"))
  for cat,p in desg["oponente"].items():
-  print(fmt("   "+cat+": "+str("{0:.2f}".format(p))))
+  print(fmt("   "+cat+": "+f2(p)))
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Genera escoba_numworks.py, la versión para la calculadora NUMWORKS.
+
+El fichero de la calculadora no se edita a mano: se construye con el núcleo portátil
+(nucleo.py) y la interfaz de 28 columnas (interfaz_numworks.py), quitando lo que
+ocupa memoria sin hacer nada en la calculadora: docstrings, comentarios, líneas en
+blanco, las importaciones entre ambos ficheros y los espacios que no hacen falta.
+La indentación pasa a ser de 1 espacio por nivel. Se escribe con finales de línea
+CRLF, como el resto de ficheros de la versión de escritorio y la calculadora.
+
+Con --comprobar, además, carga el fichero generado y compara su evaluar_movida con
+la de escoba.py en posiciones aleatorias (incluidas mesas grandes y montones de
+capturas ya empezados): los resultados deben ser idénticos.
+
+Uso:
+    python generar_numworks.py
+    python generar_numworks.py --comprobar 2000
+"""
+import argparse
+import io
+import os
+import random
+import tokenize
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+FUENTES = ("nucleo.py", "interfaz_numworks.py")
+DESTINO = "escoba_numworks.py"
+# Módulos que se juntan en el fichero generado: sus importaciones sobran.
+MODULOS = {os.path.splitext(f)[0] for f in FUENTES}
+
+_IGNORADOS = (tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER)
+
+def _palabra(caracter):
+    return caracter.isalnum() or caracter in "_'\""
+
+def _logicas(codigo):
+    """ Genera (nivel de indentación, tokens) de cada línea lógica de 'codigo'. """
+    nivel = 0
+    tokens = []
+    for tok in tokenize.generate_tokens(io.StringIO(codigo).readline):
+        if tok.type == tokenize.INDENT:
+            nivel += 1
+        elif tok.type == tokenize.DEDENT:
+            nivel -= 1
+        elif tok.type == tokenize.NEWLINE:
+            if tokens:
+                yield nivel, tokens
+            tokens = []
+        elif tok.type not in _IGNORADOS:
+            tokens.append(tok.string)
+
+def compactar(codigo):
+    """
+    'codigo' sin docstrings, comentarios, líneas en blanco ni importaciones de los
+    MODULOS, con cada línea lógica en una sola línea e indentada con 1 espacio por nivel.
+    """
+    lineas = []
+    for nivel, tokens in _logicas(codigo):
+        if len(tokens) == 1 and tokens[0][-1:] in "'\"":
+            continue  # docstring
+        if tokens[0] == "from" and tokens[1] in MODULOS or tokens[0] == "import" and tokens[1] in MODULOS:
+            continue
+        linea = tokens[0]
+        for anterior, tok in zip(tokens, tokens[1:]):
+            if _palabra(anterior[-1]) and _palabra(tok[0]):
+                linea += " "
+            linea += tok
+        lineas.append(" " * nivel + linea)
+    return "\n".join(lineas) + "\n"
+
+def generar(destino=None):
+    """ Escribe el fichero de la calculadora. Retorna su ruta. """
+    if destino is None:
+        destino = os.path.join(DIRECTORIO, DESTINO)
+    partes = []
+    for fuente in FUENTES:
+        with open(os.path.join(DIRECTORIO, fuente), encoding="utf-8") as f:
+            partes.append(compactar(f.read()))
+    with open(destino, "w", encoding="utf-8", newline="\r\n") as f:
+        f.write("".join(partes))
+    return destino
+
+def cargar(fichero):
+    """ Ejecuta el fichero generado y devuelve su espacio de nombres. """
+    with open(fichero, encoding="utf-8") as f:
+        codigo = compile(f.read(), fichero, "exec")
+    espacio = {"__name__": "escoba_numworks"}
+    exec(codigo, espacio)
+    return espacio
+
+def comprobar(fichero, n=1000, semilla=0):
+    """
+    Compara evaluar_movida del fichero generado con la de escoba.py en 'n' posiciones
+    aleatorias con mesas de 1 a 16 cartas. Las cartas que no están en la mesa, la mano
+    ni la baraja se reparten al azar entre los montones de capturas de los dos
+    jugadores, cuyos contadores se pasan a ambas versiones. Retorna la lista de
+    diferencias.
+    """
+    import escoba
+    calculadora = cargar(fichero)
+    palos = {1: 'O', 2: 'C', 3: 'E', 4: 'B'}
+    def a_escoba(cartas):
+        return [(v, palos[su]) for v, su in cartas]
+    def contadores(cartas):
+        return escoba.rasgos_mascara(escoba.a_mascara(a_escoba(cartas)))
+    rng = random.Random(semilla)
+    baraja = calculadora["inicializar_baraja"]()
+    diferencias = []
+    for _ in range(n):
+        cartas = rng.sample(baraja, 40)
+        k = rng.randint(1, 16)
+        d = k + 1 + rng.randint(0, 23)
+        mesa, card, deck = cartas[:k], cartas[k], sorted(cartas[k + 1:d], key=lambda c: (c[1], c[0]))
+        montones = ([], [])
+        for c in cartas[d:]:
+            montones[rng.randint(0, 1)].append(c)
+        propio, rival = montones
+        movidas = [("captura", c) for c in calculadora["combinaciones_que_suman"](mesa, 15 - card[0])]
+        movidas.append(("no captura", None))
+        for movida in movidas:
+            esperado = escoba.evaluar_movida(a_escoba([card])[0], a_escoba(mesa), a_escoba(deck),
+                                             (movida[0], a_escoba(movida[1] or [])),
+                                             contadores(propio), contadores(rival))
+            obtenido = calculadora["evaluar_movida"](card, mesa, deck, movida, calculadora["contadores"](propio),
+                                                     calculadora["contadores"](rival))
+            if tuple(esperado[:3]) != tuple(obtenido[:3]) or a_escoba(obtenido[3]) != esperado[3]:
+                diferencias.append((mesa, card, deck, movida, esperado, obtenido))
+    return diferencias
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera escoba_numworks.py a partir de nucleo.py e interfaz_numworks.py.")
+    parser.add_argument("--salida", default=None, help="fichero generado (por defecto, escoba_numworks.py)")
+    parser.add_argument("--comprobar", type=int, default=None, metavar="POSICIONES",
+                        help="compara el resultado con escoba.py en este número de posiciones aleatorias")
+    args = parser.parse_args(argv)
+    destino = generar(args.salida)
+    with open(destino, encoding="utf-8") as f:
+        codigo = f.read()
+    print(f"{destino}: {len(codigo.splitlines())} líneas, {len(codigo.encode('utf-8'))} bytes")
+    if args.comprobar:
+        diferencias = comprobar(destino, args.comprobar)
+        for mesa, card, deck, movida, esperado, obtenido in diferencias[:10]:
+            print(f"mesa {mesa}, carta {card}, {movida}: escoba.py {esperado[:3]}, calculadora {obtenido[:3]}")
+        print(f"{len(diferencias)} diferencias en {args.comprobar} posiciones")
+        if diferencias:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
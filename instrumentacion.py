@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación del consejero de Escoba.
+
+Con la instrumentación activa, cada decisión (sugerir_mejor_jugada,
+sugerir_movida_oponente, elegir_captura_usuario y cada llamada a evaluar_movida)
+registra su tiempo de reloj y lo que ha costado: nodos evaluados, combinaciones
+enumeradas, aciertos y fallos de los índices de capturas y de las tablas de la
+búsqueda (busqueda.py). El registro se puede ver como un resumen por jugada o
+guardar como una traza JSON para chrome://tracing o Perfetto.
+
+Apagada (lo normal), escoba.PERFIL es None y las funciones instrumentadas sólo
+comprueban esa variable.
+
+Uso:
+    import instrumentacion
+    perfil = instrumentacion.activar()
+    ...  # jugar o evaluar
+    instrumentacion.desactivar()
+    print(perfil.resumen())
+    perfil.guardar_traza("traza.json")
+
+o, desde la línea de órdenes, python escoba.py --perfil traza.json
+"""
+import contextlib
+import json
+import os
+import time
+
+import escoba
+from escoba import VALOR, contar_cartas, indices
+
+# Contadores que se muestran en el resumen, en este orden.
+COLUMNAS = ("nodos", "combos", "indices_aciertos", "indices_fallos", "rasgos_aciertos", "rasgos_fallos",
+            "tabla_aciertos", "tabla_fallos", "final_aciertos", "final_fallos")
+
+def forma_mesa(mesa):
+    """ Valores de las cartas de la mesa (máscara), ordenados: '1,1,2,5'. """
+    return ",".join(str(v) for v in sorted(VALOR[i] for i in indices(mesa)))
+
+class Perfil:
+    """
+    Registro de la instrumentación: contadores acumulados y una entrada por decisión
+    con su duración y lo que han aumentado los contadores durante ella.
+    """
+    def __init__(self, reloj=time.perf_counter):
+        self.reloj = reloj
+        self.contadores = {}
+        self.decisiones = []
+        self.origen = reloj()
+
+    def contar(self, nombre, n=1):
+        self.contadores[nombre] = self.contadores.get(nombre, 0) + n
+
+    @contextlib.contextmanager
+    def decision(self, nombre, estado=None, jugador=None, movidas=0, mesa=None):
+        """
+        Mide el bloque como la decisión 'nombre' de 'jugador' en 'estado' (GameState,
+        o None y la máscara 'mesa'), con 'movidas' jugadas a evaluar.
+        """
+        antes = dict(self.contadores)
+        inicio = self.reloj()
+        try:
+            yield
+        finally:
+            fin = self.reloj()
+            if estado is not None:
+                mesa = estado.mesa
+            registro = {
+                "decision": nombre,
+                "jugada": sum(1 for h in estado.historial if h[0] == escoba._JUGADA) if estado is not None else None,
+                "jugador": escoba.JUGADORES[jugador] if jugador is not None else None,
+                "mesa": forma_mesa(mesa or 0),
+                "cartas_mesa": contar_cartas(mesa or 0),
+                "movidas": movidas,
+                "inicio_ms": (inicio - self.origen) * 1e3,
+                "ms": (fin - inicio) * 1e3,
+            }
+            for clave, valor in self.contadores.items():
+                registro[clave] = valor - antes.get(clave, 0)
+            self.decisiones.append(registro)
+
+    def limpiar(self):
+        self.contadores = {}
+        self.decisiones = []
+        self.origen = self.reloj()
+
+    def resumen(self):
+        """ Tabla de texto con una línea por decisión y los totales. """
+        columnas = [c for c in COLUMNAS if c in self.contadores]
+        cabecera = ["jugada", "decision", "mesa", "movidas", "ms"] + columnas
+        filas = [[str(d["jugada"]) if d["jugada"] is not None else "-", d["decision"], d["mesa"] or "-",
+                  str(d["movidas"]), f"{d['ms']:.2f}"] + [str(d.get(c, 0)) for c in columnas]
+                 for d in self.decisiones]
+        filas.append(["total", f"{len(self.decisiones)} decisiones", "", "",
+                      f"{sum(d['ms'] for d in self.decisiones):.2f}"]
+                     + [str(self.contadores[c]) for c in columnas])
+        anchos = [max(len(f[k]) for f in [cabecera] + filas) for k in range(len(cabecera))]
+        return "\n".join("  ".join(f[k].ljust(anchos[k]) for k in range(len(f))) for f in [cabecera] + filas)
+
+    def por_forma(self):
+        """
+        Coste agregado por forma de la mesa: {forma: {"decisiones", "ms", "nodos", "combos"}},
+        de la más lenta a la más rápida.
+        """
+        formas = {}
+        for d in self.decisiones:
+            total = formas.setdefault(d["mesa"], {"decisiones": 0, "ms": 0.0, "nodos": 0, "combos": 0})
+            total["decisiones"] += 1
+            total["ms"] += d["ms"]
+            total["nodos"] += d.get("nodos", 0)
+            total["combos"] += d.get("combos", 0)
+        return dict(sorted(formas.items(), key=lambda x: -x[1]["ms"]))
+
+    def traza(self):
+        """ Las decisiones en el formato de eventos de Chrome (Trace Event Format). """
+        pid = os.getpid()
+        eventos = []
+        for d in self.decisiones:
+            args = {k: v for k, v in d.items() if k not in ("decision", "inicio_ms", "ms")}
+            eventos.append({"name": d["decision"], "cat": "decision", "ph": "X", "pid": pid, "tid": 0,
+                            "ts": d["inicio_ms"] * 1e3, "dur": d["ms"] * 1e3, "args": args})
+            eventos.append({"name": "contadores", "ph": "C", "pid": pid, "tid": 0,
+                            "ts": (d["inicio_ms"] + d["ms"]) * 1e3,
+                            "args": {"nodos": d.get("nodos", 0), "combos": d.get("combos", 0)}})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms"}
+
+    def guardar_traza(self, fichero):
+        with open(fichero, "w", encoding="utf-8") as f:
+            json.dump(self.traza(), f, ensure_ascii=False)
+
+def activar(perfil=None):
+    """ Activa la instrumentación con 'perfil' (por defecto, uno nuevo) y lo devuelve. """
+    if perfil is None:
+        perfil = Perfil()
+    escoba.PERFIL = perfil
+    return perfil
+
+def desactivar():
+    """ Desactiva la instrumentación y devuelve el perfil que estaba activo. """
+    perfil, escoba.PERFIL = escoba.PERFIL, None
+    return perfil
+
+@contextlib.contextmanager
+def perfilado(perfil=None):
+    """ Activa la instrumentación dentro de un bloque with: with perfilado() as perfil: ... """
+    anterior = escoba.PERFIL
+    perfil = activar(perfil)
+    try:
+        yield perfil
+    finally:
+        escoba.PERFIL = anterior
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Interfaz de texto de la versión para la calculadora NUMWORKS.
+
+Usa el núcleo portátil (nucleo.py) y ajusta toda la salida a 28 columnas. No se
+copia a la calculadora tal cual: generar_numworks.py la junta con el núcleo en
+escoba_numworks.py. En un ordenador también funciona directamente:
+    python -c "from interfaz_numworks import escoba; escoba()"
+"""
+from nucleo import (inicializar_baraja, remover_cartas, combinaciones_que_suman, puede_capturar,
+                    contadores, evaluar_movida, calcular_puntuacion_final)
+
+def fmt(s):
+    return "\n".join(s[i:i + 28] for i in range(0, len(s), 28))
+
+def f2(x):
+    return "{0:.2f}".format(x)
+
+def parsear_carta(s):
+    """ 'valor.palo' -> (valor, palo), o None si no es válida. """
+    s = s.strip()
+    if len(s) < 2:
+        return None
+    if "." not in s:
+        return None
+    p = s.split(".")
+    if len(p) != 2:
+        return None
+    try:
+        v = int(p[0])
+        su = int(p[1])
+    except:
+        return None
+    if not (1 <= v <= 10 and 1 <= su <= 4):
+        return None
+    return (v, su)
+
+def leer_cartas(mensaje, cantidad, allowed=None):
+    while True:
+        entrada = input(fmt(mensaje))
+        partes = [p.strip() for p in entrada.split(",")]
+        if len(partes) != cantidad:
+            print(fmt("Error: Debes introducir " + str(cantidad) + " cartas"))
+            continue
+        cartas = []
+        ok = True
+        for p in partes:
+            carta = parsear_carta(p)
+            if carta == None:
+                print(fmt("La carta '" + p + "' no es válida"))
+                ok = False
+                break
+            if allowed != None and carta not in allowed:
+                print(fmt("La carta " + str(carta) + " no está disponible"))
+                ok = False
+                break
+            cartas.append(carta)
+        if ok:
+            return cartas
+
+def elegir(evals, mensaje, invalida, no_valida):
+    """ Opción elegida entre 'evals' (por defecto, la de mayor valor neto). """
+    best = max(evals, key=lambda x: x[1])
+    d = evals.index(best) + 1
+    c = input(fmt(mensaje + str(d) + "): "))
+    if c.strip() == "":
+        return best
+    try:
+        idx = int(c) - 1
+    except:
+        print(fmt(invalida))
+        return best
+    if idx < 0 or idx >= len(evals):
+        print(fmt(no_valida))
+        return best
+    return evals[idx]
+
+def sugerir_mejor_jugada(estado):
+    evals = []
+    cu = contadores(estado['capturadas_usuario'])
+    co = contadores(estado['capturadas_oponente'])
+    for card in estado['mano_usuario']:
+        cap = combinaciones_que_suman(estado['mesa'], 15 - card[0])
+        if cap:
+            moves = [("captura", c, card) for c in cap]
+        else:
+            moves = [("no captura", None, card)]
+        for move in moves:
+            net, pts, exp, nm = evaluar_movida(card, estado['mesa'], estado['baraja'], (move[0], move[1]), cu, co)
+            evals.append((move, net, pts, exp, nm))
+    if not evals:
+        print(fmt("No hay jugadas evaluables."))
+        return None, estado['mesa']
+    print(fmt("Evaluación de jugadas posibles:"))
+    for i, ev in enumerate(evals):
+        move, net, pts, exp, nm = ev
+        esc = " (escoba)" if move[0] == "captura" and not nm else ""
+        if move[0] == "captura":
+            print(fmt(str(i + 1) + ". " + str(move[2]) + ": Capturar " + str(move[1]) + esc
+                      + " -> Pts: " + f2(pts) + ", Exp: " + f2(exp) + ", Neto: " + f2(net)))
+        else:
+            print(fmt(str(i + 1) + ". " + str(move[2]) + ": No capturar -> Pts: " + f2(pts)
+                      + ", Exp: " + f2(exp) + ", Neto: " + f2(net)))
+    chosen = elegir(evals, "Elige la opción (Enter para ", "Entrada no válida, se elige predeterminada",
+                    "Opción no válida, se elige predeterminada")
+    evals = None
+    move, net, pts, exp, nm = chosen
+    esc = " (escoba)" if move[0] == "captura" and not nm else ""
+    if move[0] == "captura":
+        print(fmt("Sugerencia: " + str(move[2]) + " capturando " + str(move[1]) + esc + "\n"))
+    else:
+        print(fmt("Sugerencia: " + str(move[2]) + " sin capturar\n"))
+    return move, nm
+
+def sugerir_movida_oponente(op, estado):
+    mesa = estado['mesa']
+    co = contadores(estado['capturadas_oponente'])
+    cu = contadores(estado['capturadas_usuario'])
+    moves = [("captura", combo, op) for combo in combinaciones_que_suman(mesa, 15 - op[0])]
+    moves.append(("no captura", None, op))
+    evals = []
+    for move in moves:
+        net, pts, exp, nm = evaluar_movida(op, mesa, estado['baraja'], (move[0], move[1]), co, cu)
+        evals.append((move, net, pts, exp, nm))
+    return evals
+
+def elegir_captura_usuario(estado):
+    evals = []
+    cu = contadores(estado['capturadas_usuario'])
+    co = contadores(estado['capturadas_oponente'])
+    for card in estado['mano_usuario']:
+        for combo in combinaciones_que_suman(estado['mesa'], 15 - card[0]):
+            net, pts, exp, nm = evaluar_movida(card, estado['mesa'], estado['baraja'], ("captura", combo), cu, co)
+            evals.append((("captura", combo, card), net, pts, exp, nm))
+    if not evals:
+        print(fmt("No hay posibilidades de captura para el usuario."))
+        return
+    if len(evals) == 1:
+        move, net, pts, exp, nm = evals[0]
+        esc = " (escoba)" if not nm else ""
+        print(fmt("Captura automática: " + str(move[2]) + " capturando " + str(move[1]) + esc))
+    else:
+        print(fmt("Evaluación de capturas disponibles para el usuario:"))
+        for i, ev in enumerate(evals):
+            move, net, pts, exp, nm = ev
+            esc = " (escoba)" if not nm else ""
+            print(fmt(str(i + 1) + ". " + str(move[2]) + " capturar " + str(move[1]) + esc
+                      + " -> Pts: " + f2(pts) + ", Neto: " + f2(net)))
+        move, net, pts, exp, nm = elegir(evals, "Elige captura (Enter para ",
+                                         "Entrada no válida, se elige predeterminada",
+                                         "Opción no válida, se elige predeterminada")
+        esc = " (escoba)" if not nm else ""
+        print(fmt("Captura elegida: " + str(move[2]) + " capturando " + str(move[1]) + esc))
+    evals = None
+    card = move[2]
+    cap = [c for c in estado['mesa'] if c not in nm] + [card]
+    if card in estado['mano_usuario']:
+        estado['mano_usuario'].remove(card)
+    estado['capturadas_usuario'].extend(cap)
+    if not nm:
+        estado['escobas_usuario'] += 1
+    estado['mesa'] = nm
+    estado['last_capturador'] = "usuario"
+
+def barrer(estado):
+    """ Final de la partida: las cartas de la mesa son para el último que capturó. """
+    if estado["mesa"]:
+        if estado["last_capturador"] == "usuario":
+            print(fmt("Última mano: Ganas las cartas " + str(estado['mesa']) + " que quedan en la mesa."))
+            estado["capturadas_usuario"].extend(estado["mesa"])
+        elif estado["last_capturador"] == "oponente":
+            print(fmt("Última mano: El oponente gana las cartas " + str(estado['mesa']) + " que quedan en la mesa."))
+            estado["capturadas_oponente"].extend(estado["mesa"])
+        else:
+            print(fmt("Última mano: No se asignan cartas, no hubo capturador final."))
+        estado["mesa"] = []
+
+def escoba():
+    print(fmt("Bienvenido a Escoba"))
+    estado = {'baraja': inicializar_baraja(), 'mesa': [], 'mano_usuario': [], 'capturadas_usuario': [],
+              'capturadas_oponente': [], 'escobas_usuario': 0, 'escobas_oponente': 0, 'last_capturador': None}
+    estado['mesa'] = leer_cartas("Introduce las 4 cartas de la mesa: ", 4, allowed=estado['baraja'])
+    estado['baraja'] = remover_cartas(estado['baraja'], estado['mesa'])
+    estado['mano_usuario'] = leer_cartas("Introduce tus 3 cartas: ", 3, allowed=estado['baraja'])
+    estado['baraja'] = remover_cartas(estado['baraja'], estado['mano_usuario'])
+    while True:
+        print(fmt("Nueva jugada:"))
+        print(fmt("Mesa: " + str(estado['mesa'])))
+        print(fmt("Mano: " + str(estado['mano_usuario'])))
+        move_user, new_mesa = sugerir_mejor_jugada(estado)
+        if move_user == None:
+            print(fmt("Sin jugadas, turno pasado"))
+        else:
+            card = move_user[2]
+            estado['mano_usuario'].remove(card)
+            if move_user[0] == "captura":
+                escoba_str = " (escoba)" if not new_mesa else ""
+                print(fmt("Ejecutando: " + str(card) + " capturando " + str(move_user[1]) + escoba_str))
+                cap = [c for c in estado['mesa'] if c not in new_mesa] + [card]
+                estado['capturadas_usuario'].extend(cap)
+                estado['mesa'] = new_mesa
+                estado['last_capturador'] = "usuario"
+                if not estado['mesa']:
+                    estado['escobas_usuario'] += 1
+            else:
+                print(fmt("Ejecutando: " + str(card) + " sin capturar, mesa " + str(new_mesa)))
+                estado['mesa'] = new_mesa
+        if estado["baraja"]:
+            op_carta = leer_cartas("Carta oponente: ", 1, allowed=estado['baraja'])[0]
+            estado['baraja'] = remover_cartas(estado['baraja'], [op_carta])
+        else:
+            op_carta = leer_cartas("Carta oponente: ", 1)[0]
+        t = 15 - op_carta[0]
+        eval_op = sugerir_movida_oponente(op_carta, estado)
+        if len(eval_op) == 1:
+            cho = eval_op[0]
+            move, net, pts, exp, new_mesa_op = cho
+            print(fmt("Única op. oponente:"))
+            print(fmt("Jugar " + str(move[2]) + " sin capturar"))
+            print(fmt("No puede capturar"))
+        else:
+            print(fmt("Op. posibles oponente:"))
+            for i, ev in enumerate(eval_op):
+                move, net, pts, exp, nm = ev
+                escoba_str = " (escoba)" if move[0] == "captura" and not nm else ""
+                print(fmt(str(i + 1) + ". " + str(move[2]) + ": Capturar " + str(move[1]) + escoba_str
+                          + " -> Pts: " + f2(pts) + ", Exp: " + f2(exp) + ", Neto: " + f2(net)))
+            cho = elegir(eval_op, "Elige op. oponente (Enter para ", "Entrada no válida, se elige pred.",
+                         "Op. no válida, se elige pred.")
+        eval_op = None
+        move, net, pts, exp, new_mesa_op = cho
+        if move[0] == "captura":
+            escoba_str = " (escoba)" if not new_mesa_op else ""
+            print(fmt("Oponente: " + str(move[2]) + " capturando " + str(move[1]) + escoba_str))
+            cap = [c for c in estado['mesa'] if c not in new_mesa_op] + [op_carta]
+            estado['capturadas_oponente'].extend(cap)
+            estado['mesa'] = new_mesa_op
+            estado['last_capturador'] = "oponente"
+            if not estado['mesa']:
+                estado['escobas_oponente'] += 1
+        else:
+            if not puede_capturar(estado['mesa'], t):
+                print(fmt("Oponente: " + str(move[2]) + " sin capturar"))
+                print(fmt("No puede capturar"))
+            else:
+                print(fmt("Oponente: " + str(move[2]) + " sin capturar"))
+                print(fmt("Renuncia a capturar"))
+            estado['mesa'].append(op_carta)
+            if puede_capturar(estado['mesa'], t):
+                elegir_captura_usuario(estado)
+        print(fmt("Estado mesa: " + str(estado['mesa'])))
+        if not estado["mano_usuario"] and not estado["baraja"]:
+            barrer(estado)
+            break
+        if not estado["mano_usuario"]:
+            if estado["baraja"]:
+                num = 3 if len(estado["baraja"]) >= 3 else len(estado["baraja"])
+                nuevas = leer_cartas("Introduce tus " + str(num) + " nuevas cartas: ", num, allowed=estado["baraja"])
+                estado["mano_usuario"] = nuevas
+                estado["baraja"] = remover_cartas(estado["baraja"], nuevas)
+            else:
+                barrer(estado)
+                break
+    print(fmt("Puntuación Final:"))
+    pf, desg = calcular_puntuacion_final(estado)
+    print(fmt("Usuario: " + str(pf["usuario"]) + " puntos"))
+    for cat, p in desg["usuario"].items():
+        print(fmt("   " + cat + ": " + f2(p)))
+    print(fmt("Oponente: " + str(pf["oponente"]) + " puntos"))
+    for cat, p in desg["oponente"].items():
+        print(fmt("   " + cat + ": " + f2(p)))
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Matriz de manos: lo que valdría cada mano posible sobre una mesa.
+
+Antes de un reparto, para una mesa y las cartas que no se ven, evalúa todas las manos
+de 3 cartas que pueden salir de las no vistas: el valor de cada una es el de su mejor
+jugada a 1 jugada (el mayor valor neto de sugerir_mejor_jugada). Hacerlo mano a mano
+repite casi todo el trabajo, porque las jugadas de una carta y las respuestas del
+oponente a cada una no dependen del resto de la mano. Aquí se calculan una vez:
+
+  - para cada jugada posible (carta no vista y captura), sus puntos y la mejor
+    respuesta del oponente con cada carta no vista sobre la mesa que deja
+    (escoba.mejores_respuestas, una vez por mesa resultante);
+  - con una mano H, el oponente responde con las no vistas que no están en H, así que
+    su expectativa es (suma de las mejores respuestas - las de las 3 cartas de H) / (n - 3).
+
+El valor de la mano es el máximo sobre las jugadas de sus 3 cartas, y con NumPy todas
+las manos se evalúan a la vez. Coincide con evaluar_jugadas salvo por el redondeo de
+la suma (diferencias del orden de 1e-15).
+
+Uso:
+    python manos.py --mesa 7o,5o,6b,5e
+    python manos.py --mesa 1o,2c --vistas 3e,4b,5o --mostrar 20
+"""
+import argparse
+import itertools
+import time
+
+import escoba
+from escoba import (BIT, CONTADORES_VACIOS, BARAJA_COMPLETA, np, indices, jugadas_carta, puntos_movida,
+                    mejor_respuesta, mejores_respuestas, a_mascara, parsear_carta, texto_carta)
+
+def jugadas_no_vistas(mesa, cartas, contadores=CONTADORES_VACIOS):
+    """
+    Jugadas posibles de cada carta de 'cartas' (lista de índices) sobre 'mesa'.
+    Retorna {carta: [(movida, puntos, nueva_mesa)]}.
+    """
+    jugadas = {}
+    for carta in cartas:
+        lista = []
+        for movida in jugadas_carta(mesa, carta):
+            captura = movida[1]
+            bit = BIT[carta]
+            if captura:
+                pts = puntos_movida(contadores, captura | bit, 1 if captura == mesa else 0)
+                nueva_mesa = mesa & ~captura
+            else:
+                pts = 0
+                nueva_mesa = mesa | bit
+            lista.append((movida, pts, nueva_mesa))
+        jugadas[carta] = lista
+    return jugadas
+
+def matriz_manos(mesa, no_vistas, contadores=CONTADORES_VACIOS, contadores_rival=CONTADORES_VACIOS, tam=3):
+    """
+    Valor de la mejor jugada de cada mano de 'tam' cartas sacada de 'no_vistas'
+    (máscara) sobre 'mesa' (máscara), con 'contadores' los del montón de quien recibe la
+    mano y 'contadores_rival' los de su rival. Retorna (manos, valores): con NumPy, un
+    array de enteros de forma (manos, tam) con los índices de las cartas de cada mano,
+    en el orden de itertools.combinations, y un array con su valor; sin NumPy, listas.
+    """
+    cartas = list(indices(no_vistas))
+    resto = len(cartas) - tam
+    if resto <= 0:
+        raise ValueError(f"hacen falta más de {tam} cartas no vistas")
+    jugadas = jugadas_no_vistas(mesa, cartas, contadores)
+    if np is None:
+        return _matriz_manos_bucle(cartas, jugadas, contadores_rival, tam, resto)
+    # Respuestas del oponente por mesa resultante: respuestas[m][d] para la carta de índice d.
+    respuestas = {}
+    for lista in jugadas.values():
+        for _, _, nueva_mesa in lista:
+            if nueva_mesa not in respuestas:
+                fila = np.zeros(40)
+                fila[cartas] = mejores_respuestas(nueva_mesa, cartas, contadores_rival)
+                respuestas[nueva_mesa] = fila
+    # Por carta, sus jugadas en columnas, rellenando con -inf hasta el máximo de jugadas.
+    ancho = max(len(lista) for lista in jugadas.values())
+    puntos = np.full((40, ancho), -np.inf)
+    sumas = np.zeros((40, ancho))
+    filas = np.zeros((40, ancho, 40))
+    for carta, lista in jugadas.items():
+        for k, (_, pts, nueva_mesa) in enumerate(lista):
+            fila = respuestas[nueva_mesa]
+            puntos[carta, k] = pts
+            sumas[carta, k] = fila.sum()
+            filas[carta, k] = fila
+    manos = np.array(list(itertools.combinations(cartas, tam)), dtype=np.int64)
+    valores = np.full(len(manos), -np.inf)
+    for j in range(tam):
+        carta = manos[:, j]
+        # Suma de las mejores respuestas a las cartas de la mano, para cada jugada de su carta j.
+        en_mano = sum(filas[carta, :, manos[:, i]] for i in range(tam))
+        neto = puntos[carta] - (sumas[carta] - en_mano) / resto
+        valores = np.maximum(valores, neto.max(axis=1))
+    return manos, valores
+
+def _matriz_manos_bucle(cartas, jugadas, contadores_rival, tam, resto):
+    """ matriz_manos sin NumPy: las mismas cuentas con listas. """
+    respuestas = {}
+    evaluadas = {}
+    for carta, lista in jugadas.items():
+        evaluadas[carta] = []
+        for _, pts, nueva_mesa in lista:
+            if nueva_mesa not in respuestas:
+                fila = [0.0] * 40
+                for d in cartas:
+                    fila[d] = mejor_respuesta(nueva_mesa, d, contadores_rival)
+                respuestas[nueva_mesa] = (fila, sum(fila))
+            evaluadas[carta].append((pts,) + respuestas[nueva_mesa])
+    manos = []
+    valores = []
+    for mano in itertools.combinations(cartas, tam):
+        mejor = None
+        for carta in mano:
+            for pts, fila, suma in evaluadas[carta]:
+                neto = pts - (suma - sum(fila[c] for c in mano)) / resto
+                if mejor is None or neto > mejor:
+                    mejor = neto
+        manos.append(mano)
+        valores.append(mejor)
+    return manos, valores
+
+def _leer(texto):
+    cartas = []
+    for parte in texto.split(","):
+        if parte.strip():
+            carta = parsear_carta(parte)
+            if carta is None:
+                raise argparse.ArgumentTypeError(f"la carta '{parte.strip()}' no es válida")
+            cartas.append(carta)
+    return cartas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Valor de todas las manos posibles sobre una mesa de Escoba.")
+    parser.add_argument("--mesa", type=_leer, required=True, help="cartas de la mesa (por ejemplo, 7o,5o,6b,5e)")
+    parser.add_argument("--vistas", type=_leer, default=[], help="otras cartas que ya no pueden salir (capturadas)")
+    parser.add_argument("--mostrar", type=int, default=10, help="manos que se muestran por arriba y por abajo")
+    args = parser.parse_args(argv)
+    mesa = a_mascara(args.mesa)
+    no_vistas = BARAJA_COMPLETA & ~mesa & ~a_mascara(args.vistas)
+    inicio = time.perf_counter()
+    manos, valores = matriz_manos(mesa, no_vistas)
+    tiempo = time.perf_counter() - inicio
+    orden = sorted(range(len(valores)), key=lambda k: -valores[k])
+    print(f"{len(valores)} manos en {1000 * tiempo:.0f} ms; valor medio {sum(valores) / len(valores):.3f}")
+    texto = lambda k: ",".join(texto_carta(escoba.CARTAS[int(c)]) for c in manos[k])
+    print("Mejores:")
+    for k in orden[:args.mostrar]:
+        print(f"  {texto(k):<12} {valores[k]:.3f}")
+    print("Peores:")
+    for k in orden[-args.mostrar:]:
+        print(f"  {texto(k):<12} {valores[k]:.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Motor persistente del consejero de Escoba, con un protocolo de texto por líneas.
+
+Inspirado en el UCI del ajedrez: se arranca una vez (python motor.py) y se le dan
+órdenes por la entrada estándar, una por línea; responde por la salida estándar. La
+partida se sigue con 'played' y 'deal', así que el seguimiento de la mano del oponente
+(creencias.py) funciona como en escoba.py --creencias, y las cachés (índices de capturas, tablas
+de transposición, final exacto, tabla de aperturas) se conservan entre posiciones y
+partidas.
+
+Las cartas se escriben como en escoba.py (7o, 10b...); las listas, separadas por comas
+y sin espacios ("-" es la lista vacía).
+
+Órdenes:
+    uci                       identifica el motor y sus opciones; termina con "uciok"
+    isready                   responde "readyok" (también mientras busca)
+    setoption name N value V  opciones: profundidad (1-8), limite (ms por jugada, 0 sin
+                              límite) y valoracion (fichero de pesos de valoracion.py, vacío
+                              para la heurística)
+    newgame                   empieza otra partida (también "ucinewgame")
+    position mesa C [mano C] [lado usuario|oponente] [inicia usuario|oponente]
+             [capturadas_usuario C] [capturadas_oponente C] [no_vistas C] [escobas U O]
+                              fija la posición: 'mano' es la del lado que mueve (por
+                              defecto el usuario), 'inicia' quién es mano en los repartos
+    deal C                    reparto de una mano nueva al usuario
+    played CARTA [CAPTURA]    jugada del lado que mueve (el oponente juega de las no vistas
+                              y puede renunciar a capturar)
+    go [profundidad N] [limite MS] [infinite]
+                              busca la jugada del lado que mueve: una línea "info" por
+                              jugada, de mejor a peor, y "bestmove CARTA [CAPTURA]"
+    stop                      acaba la búsqueda en curso (responde con su "bestmove")
+    score                     puntuación como calcular_puntuacion_final
+    quit                      termina
+
+Ejemplo:
+    position mesa 7o,5o,6b,5e mano 2c,3e,10b
+    go
+    info depth 1 multipv 1 score 1.1356 puntos 1.3095 expectativa 0.1739 time 1 pv 3e 5o,7o
+    info depth 1 multipv 2 score 1.0346 puntos 1.1429 expectativa 0.1082 time 1 pv 2c 7o,6b
+    ...
+    bestmove 3e 5o,7o
+    played 3e 5o,7o
+    played 4c
+    go limite 200
+    ...
+    bestmove 10b 5e
+
+(el oponente ha renunciado a capturar 6b,5e con el 4c).
+
+Los errores se indican con "info string error: ..." y la orden se ignora.
+"""
+import argparse
+import sys
+import threading
+import time
+
+from escoba import (BIT, CARTAS, INDICE, JUGADORES, USUARIO, BARAJA_COMPLETA, GameState, de_mascara,
+                    parsear_carta, texto_carta, jugadas_carta, rasgos_mascara, calcular_puntuacion_final)
+
+NOMBRE = "Escoba"
+MAX_PROFUNDIDAD = 8
+
+def leer_cartas(texto):
+    """ Máscara de una lista de cartas "7o,5o" ("-" o "" es la lista vacía). Lanza ValueError. """
+    mascara = 0
+    if texto in ("", "-"):
+        return 0
+    for parte in texto.split(","):
+        carta = parsear_carta(parte)
+        if carta is None:
+            raise ValueError(f"carta no válida: {parte!r}")
+        bit = BIT[INDICE[carta]]
+        if mascara & bit:
+            raise ValueError(f"carta repetida: {parte}")
+        mascara |= bit
+    return mascara
+
+def escribir_cartas(mascara):
+    return ",".join(texto_carta(c) for c in de_mascara(mascara)) or "-"
+
+def escribir_jugada(movida):
+    carta, captura = movida
+    texto = texto_carta(CARTAS[carta])
+    return f"{texto} {escribir_cartas(captura)}" if captura else texto
+
+class Motor:
+    """
+    Estado del motor: la partida en curso (un GameState), las opciones y los evaluadores,
+    que se crean una vez por configuración y se conservan con sus cachés.
+    """
+    def __init__(self, salida=sys.stdout):
+        self.salida = salida
+        self.escritura = threading.Lock()
+        self.opciones = {"profundidad": 1, "limite": 0, "valoracion": ""}
+        self.evaluadores = {}
+        self.valoraciones = {}
+        self.estado = None
+        self.inicia = USUARIO
+        self.hilo = None
+        self.busqueda = None
+
+    def escribir(self, linea):
+        with self.escritura:
+            self.salida.write(linea + "\n")
+            self.salida.flush()
+
+    # --- Evaluadores ---
+    def _valoracion(self, fichero):
+        if not fichero:
+            return None
+        valoracion = self.valoraciones.get(fichero)
+        if valoracion is None:
+            from valoracion import Valoracion
+            valoracion = self.valoraciones[fichero] = Valoracion.cargar(fichero)
+        return valoracion
+
+    def evaluador(self, profundidad, limite):
+        """
+        (evaluar, búsqueda que se puede detener o None) para la configuración dada, como
+        escoba.py --creencias --aperturas --final-exacto: a 1 jugada sin límite, creencias y
+        aperturas; si no, profundización iterativa hasta 'profundidad' durante 'limite' ms
+        (sin límite si es None).
+        """
+        fichero = self.opciones["valoracion"]
+        clave = (profundidad, limite, fichero, self.inicia)
+        guardado = self.evaluadores.get(clave)
+        if guardado is not None:
+            return guardado
+        from busqueda import BusquedaLimitada, con_final_exacto
+        valoracion = self._valoracion(fichero)
+        if profundidad == 1 and limite is None:
+            from aperturas import con_aperturas
+            from creencias import evaluador_creencia
+            if valoracion is None:
+                evaluar = con_aperturas(evaluador_creencia())
+            else:
+                from valoracion import evaluador_valoracion
+                evaluar = evaluador_creencia(evaluar=evaluador_valoracion(valoracion))
+            busqueda = None
+        else:
+            busqueda = BusquedaLimitada(float("inf") if limite is None else limite,
+                                        profundidad if profundidad > 1 else MAX_PROFUNDIDAD,
+                                        valoracion=valoracion)
+            evaluar = busqueda.evaluar
+        guardado = self.evaluadores[clave] = (con_final_exacto(evaluar, self.inicia), busqueda)
+        return guardado
+
+    # --- Órdenes ---
+    def orden(self, linea):
+        """ Ejecuta una línea. Retorna False si es 'quit'. """
+        partes = linea.split()
+        if not partes:
+            return True
+        nombre, args = partes[0].lower(), partes[1:]
+        if nombre == "quit":
+            self.detener()
+            return False
+        if nombre == "isready":
+            self.escribir("readyok")
+            return True
+        if nombre == "stop":
+            self.detener()
+            return True
+        metodo = getattr(self, "orden_" + nombre, None)
+        if metodo is None:
+            self.escribir(f"info string error: orden desconocida: {nombre}")
+            return True
+        # El resto de órdenes esperan a que acabe la búsqueda en curso.
+        self.esperar()
+        try:
+            metodo(args)
+        except ValueError as error:
+            self.escribir(f"info string error: {error}")
+        return True
+
+    def orden_uci(self, args):
+        self.escribir(f"id name {NOMBRE}")
+        self.escribir(f"option name profundidad type spin default 1 min 1 max {MAX_PROFUNDIDAD}")
+        self.escribir("option name limite type spin default 0 min 0 max 600000")
+        self.escribir("option name valoracion type string default")
+        self.escribir("uciok")
+
+    def orden_setoption(self, args):
+        texto = " ".join(args)
+        if not texto.startswith("name "):
+            raise ValueError("uso: setoption name NOMBRE value VALOR")
+        nombre, _, valor = texto[5:].partition(" value ")
+        nombre = nombre.strip().lower()
+        valor = valor.strip()
+        if nombre == "valoracion":
+            self._valoracion(valor)   # falla aquí si el fichero no vale
+            self.opciones[nombre] = valor
+        elif nombre in ("profundidad", "limite"):
+            minimo, maximo = (1, MAX_PROFUNDIDAD) if nombre == "profundidad" else (0, 600000)
+            try:
+                numero = int(valor)
+            except ValueError:
+                raise ValueError(f"'{nombre}' debe ser un entero") from None
+            if not minimo <= numero <= maximo:
+                raise ValueError(f"'{nombre}' debe estar entre {minimo} y {maximo}")
+            self.opciones[nombre] = numero
+        else:
+            raise ValueError(f"opción desconocida: {nombre}")
+
+    def orden_newgame(self, args):
+        self.estado = None
+
+    orden_ucinewgame = orden_newgame
+
+    def orden_position(self, args):
+        campos = {"escobas": (0, 0)}
+        k = 0
+        while k < len(args):
+            clave = args[k].lower()
+            if clave == "inicio":
+                k += 1
+                continue
+            if clave == "escobas":
+                try:
+                    campos["escobas"] = (int(args[k + 1]), int(args[k + 2]))
+                except (IndexError, ValueError):
+                    raise ValueError("uso: escobas USUARIO OPONENTE") from None
+                k += 3
+                continue
+            if k + 1 >= len(args):
+                raise ValueError(f"falta el valor de '{clave}'")
+            valor = args[k + 1]
+            if clave in ("lado", "inicia"):
+                if valor.lower() not in JUGADORES:
+                    raise ValueError(f"'{clave}' debe ser uno de {JUGADORES}")
+                campos[clave] = JUGADORES.index(valor.lower())
+            elif clave in ("mesa", "mano", "capturadas_usuario", "capturadas_oponente", "no_vistas"):
+                campos[clave] = leer_cartas(valor)
+            else:
+                raise ValueError(f"campo desconocido: {clave}")
+            k += 2
+        mesa = campos.get("mesa", 0)
+        mano = campos.get("mano", 0)
+        cap = (campos.get("capturadas_usuario", 0), campos.get("capturadas_oponente", 0))
+        usadas = [mesa, mano, cap[0], cap[1]]
+        if "no_vistas" in campos:
+            no_vistas = campos["no_vistas"]
+            usadas.append(no_vistas)
+        else:
+            no_vistas = BARAJA_COMPLETA & ~(mesa | mano | cap[0] | cap[1])
+        total = 0
+        for mascara in usadas:
+            if total & mascara:
+                raise ValueError("hay cartas en más de un sitio")
+            total |= mascara
+        lado = campos.get("lado", USUARIO)
+        manos = [0, 0]
+        manos[lado] = mano
+        estado = GameState(mesa=mesa, manos=manos, baraja=no_vistas, turno=lado)
+        estado.capturadas = list(cap)
+        estado.contadores = [rasgos_mascara(cap[0]), rasgos_mascara(cap[1])]
+        estado.escobas = list(campos["escobas"])
+        self.estado = estado
+        self.inicia = campos.get("inicia", USUARIO)
+
+    def _estado(self):
+        if self.estado is None:
+            raise ValueError("no hay posición: usa 'position'")
+        return self.estado
+
+    def orden_deal(self, args):
+        estado = self._estado()
+        if len(args) != 1:
+            raise ValueError("uso: deal CARTAS")
+        cartas = leer_cartas(args[0])
+        if cartas & ~estado.baraja:
+            raise ValueError("alguna carta del reparto ya ha salido")
+        estado.repartir(USUARIO, cartas)
+
+    def orden_played(self, args):
+        estado = self._estado()
+        if not 1 <= len(args) <= 2:
+            raise ValueError("uso: played CARTA [CAPTURA]")
+        carta = parsear_carta(args[0])
+        if carta is None:
+            raise ValueError(f"carta no válida: {args[0]!r}")
+        carta = INDICE[carta]
+        captura = leer_cartas(args[1]) if len(args) == 2 else 0
+        jugador = estado.turno
+        # Si se conoce la mano del que juega, la carta tiene que estar en ella; si no, en
+        # las cartas que el usuario no ha visto.
+        posibles = estado.manos[jugador] or estado.no_vistas(USUARIO)
+        if not posibles & BIT[carta]:
+            raise ValueError(f"{JUGADORES[jugador]} no puede tener {args[0]}")
+        # Como en escoba.py, el oponente puede renunciar a capturar.
+        if (carta, captura) not in jugadas_carta(estado.mesa, carta, renunciar=jugador != USUARIO):
+            raise ValueError(f"jugada no válida sobre la mesa {escribir_cartas(estado.mesa)}")
+        estado.apply((carta, captura))
+
+    def orden_score(self, args):
+        estado = self._estado()
+        puntos, _ = calcular_puntuacion_final(estado)
+        self.escribir("score " + " ".join(f"{j} {puntos[j]}" for j in JUGADORES))
+
+    def orden_go(self, args):
+        estado = self._estado()
+        profundidad = self.opciones["profundidad"]
+        limite = self.opciones["limite"] or None
+        k = 0
+        while k < len(args):
+            clave = args[k].lower()
+            if clave == "infinite":
+                limite = None
+                profundidad = MAX_PROFUNDIDAD
+                k += 1
+                continue
+            if clave not in ("profundidad", "limite") or k + 1 >= len(args):
+                raise ValueError("uso: go [profundidad N] [limite MS] [infinite]")
+            try:
+                numero = int(args[k + 1])
+            except ValueError:
+                raise ValueError(f"'{clave}' debe ser un entero") from None
+            if clave == "profundidad":
+                if not 1 <= numero <= MAX_PROFUNDIDAD:
+                    raise ValueError(f"'profundidad' debe estar entre 1 y {MAX_PROFUNDIDAD}")
+                profundidad = numero
+            else:
+                limite = numero or None
+            k += 2
+        jugador = estado.turno
+        if not estado.manos[jugador]:
+            raise ValueError(f"no se conoce la mano de {JUGADORES[jugador]}")
+        evaluar, busqueda = self.evaluador(profundidad, limite)
+        self.busqueda = busqueda
+        self.hilo = threading.Thread(target=self._buscar, args=(evaluar, busqueda, estado.copia(), jugador),
+                                     daemon=True)
+        self.hilo.start()
+
+    def _buscar(self, evaluar, busqueda, estado, jugador):
+        from busqueda import es_final
+        inicio = time.perf_counter()
+        try:
+            evaluaciones = evaluar(estado, estado.legal_moves(jugador), jugador)
+        except Exception as error:
+            self.escribir(f"info string error: {error}")
+            self.escribir("bestmove (none)")
+            return
+        ms = (time.perf_counter() - inicio) * 1000
+        if es_final(estado, jugador, self.inicia):
+            profundidad = "final"
+        elif busqueda is not None:
+            profundidad = busqueda.profundidad
+        else:
+            profundidad = 1
+        ordenadas = sorted(evaluaciones, key=lambda e: -e[1])
+        for k, (movida, neto, pts, exp, _) in enumerate(ordenadas, 1):
+            self.escribir(f"info depth {profundidad} multipv {k} score {neto:.4f} puntos {pts:.4f} "
+                          f"expectativa {exp:.4f} time {ms:.0f} pv {escribir_jugada(movida)}")
+        self.escribir(f"bestmove {escribir_jugada(ordenadas[0][0])}" if ordenadas else "bestmove (none)")
+
+    def detener(self):
+        """ Acaba la búsqueda en curso (la que se puede detener) y espera a que escriba su resultado. """
+        if self.busqueda is not None and self.hilo is not None:
+            # Cada búsqueda empieza sin detener: si el hilo aún no había empezado a buscar,
+            # se vuelve a pedir hasta que acaba.
+            while self.hilo.is_alive():
+                self.busqueda.detener()
+                self.hilo.join(0.01)
+        self.esperar()
+
+    def esperar(self):
+        if self.hilo is not None:
+            self.hilo.join()
+            self.hilo = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motor del consejero de Escoba con un protocolo de texto por líneas.")
+    parser.parse_args(argv)
+    motor = Motor()
+    for linea in sys.stdin:
+        if not motor.orden(linea):
+            break
+    motor.esperar()
+
+if __name__ == '__main__':
+    main()
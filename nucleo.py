@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Núcleo portátil de Escoba.
+
+Las reglas de puntuación y la evaluación a 1 jugada sobre listas de cartas
+(valor, palo), con el palo como número (1 = oros, 2 = copas, 3 = espadas,
+4 = bastos). Está escrito en el subconjunto de Python que entiende MicroPython:
+sin importaciones, sin f-strings y sin int.bit_length.
+
+generar_numworks.py construye escoba_numworks.py con este fichero y la interfaz de
+la calculadora (interfaz_numworks.py). escoba.py usa de aquí la fórmula de puntos y
+el recorrido de combinaciones.
+
+Como en escoba.py, cada montón de capturas se resume en unos contadores (cartas,
+sietes sin velo, oros sin velo, velo) y una captura vale lo que aumenta el valor del
+montón de quien la hace, con los topes aplicados a los totales. Con los montones
+vacíos (VACIOS, el valor por defecto) es la fórmula original (puntos_cartas_original
+de escoba.py).
+
+Para no agotar la memoria de la calculadora, las capturas se enumeran con un
+recorrido iterativo que no crea listas: cada combinación es un entero pequeño con un
+bit por posición de la mesa, y los rasgos de una combinación se cuentan recorriendo
+sus bits. capturas() hace el mismo recorrido sobre la mesa ordenada por valor, con
+poda, para las preguntas que se responden sin enumerarlas todas. Los resultados son
+los mismos que los de escoba.py (mismas operaciones en coma flotante, en el mismo
+orden).
+"""
+
+VELO = (7, 1)
+VACIOS = (0, 0, 0, 0)
+
+def inicializar_baraja():
+    """ Las 40 cartas, por palos y, dentro de cada palo, por valor. """
+    return [(v, su) for su in (1, 2, 3, 4) for v in range(1, 11)]
+
+def remover_cartas(baraja, cartas):
+    """ Copia de 'baraja' sin las 'cartas'. """
+    r = baraja[:]
+    for c in cartas:
+        if c in r:
+            r.remove(c)
+    return r
+
+def puntos(cartas, sietes, oros, velo, escobas=0):
+    """
+    Fórmula de puntuación de las sugerencias a partir del número de cartas, de sietes
+    y de oros (sin contar el velo en estos dos) y de si está el velo.
+    """
+    return min(cartas, 21) / 21 + velo + min(sietes, 3) * (1/3) + min(oros, 6) * (1/6) + escobas
+
+def contadores(cartas):
+    """ (cartas, sietes sin velo, oros sin velo, velo) de una lista de cartas capturadas. """
+    n = sietes = oros = velo = 0
+    for c in cartas:
+        n += 1
+        if c == VELO:
+            velo += 1
+        elif c[0] == 7:
+            sietes += 1
+        elif c[1] == 1:
+            oros += 1
+    return n, sietes, oros, velo
+
+def puntos_movida(cont, n, sietes, oros, velo, escobas=0):
+    """
+    Puntos de capturar n cartas con esos sietes, oros y velo (incluida la carta jugada)
+    para un montón con los contadores 'cont': lo que aumenta su valor más las escobas.
+    """
+    return (puntos(cont[0] + n, cont[1] + sietes, cont[2] + oros, cont[3] + velo)
+            - puntos(cont[0], cont[1], cont[2], cont[3]) + escobas)
+
+def combinaciones(valores, objetivo):
+    """
+    Genera las combinaciones de posiciones de 'valores' (enteros positivos) que suman
+    'objetivo' (positivo), como enteros con el bit k puesto si la posición k está en
+    la combinación. El orden es el del backtracking recursivo sobre la lista, pero sin
+    recursión ni listas intermedias: el camino actual es la propia máscara. Las ramas
+    en las que los valores que quedan ya no llegan al objetivo se podan.
+    """
+    n = len(valores)
+    resto = [0] * (n + 1)    # resto[i]: suma de los valores desde la posición i
+    for i in range(n - 1, -1, -1):
+        resto[i] = resto[i + 1] + valores[i]
+    m = 0
+    s = 0
+    i = 0
+    while True:
+        if i < n and s + resto[i] >= objetivo:
+            v = valores[i]
+            if s + v < objetivo:
+                m |= 1 << i
+                s += v
+            elif s + v == objetivo:
+                yield m | 1 << i
+            i += 1
+        else:
+            # Se quita la última posición del camino y se sigue por la siguiente.
+            if not m:
+                return
+            j = i - 1
+            while not ((m >> j) & 1):
+                j -= 1
+            m ^= 1 << j
+            s -= valores[j]
+            i = j + 1
+
+def capturas(valores, objetivo):
+    """
+    Como combinaciones, pero recorre las posiciones de menor a mayor valor y poda
+    las ramas en cuanto el siguiente valor se pasa del objetivo (los demás son
+    mayores) o los que quedan ya no llegan a él. Es la forma de preguntar por la
+    primera captura, o por la mejor con una cota, sin enumerarlas todas; el orden de
+    las combinaciones no es el de la lista.
+    """
+    n = len(valores)
+    orden = sorted(range(n), key=lambda k: valores[k])
+    resto = [0] * (n + 1)    # resto[i]: suma de los valores desde la posición ordenada i
+    for i in range(n - 1, -1, -1):
+        resto[i] = resto[i + 1] + valores[orden[i]]
+    m = 0
+    s = 0
+    i = 0
+    while True:
+        if i < n and s + resto[i] >= objetivo and s + valores[orden[i]] <= objetivo:
+            v = valores[orden[i]]
+            if s + v < objetivo:
+                m |= 1 << i
+                s += v
+            else:
+                # De posiciones ordenadas a posiciones de la lista.
+                r = 0
+                k = 0
+                t = m | 1 << i
+                while t:
+                    if t & 1:
+                        r |= 1 << orden[k]
+                    t >>= 1
+                    k += 1
+                yield r
+            i += 1
+        else:
+            if not m:
+                return
+            j = i - 1
+            while not ((m >> j) & 1):
+                j -= 1
+            m ^= 1 << j
+            s -= valores[orden[j]]
+            i = j + 1
+
+def combinaciones_que_suman(cartas, objetivo):
+    """ Listas de cartas de 'cartas' cuya suma de valores es 'objetivo'. """
+    res = []
+    for m in combinaciones([c[0] for c in cartas], objetivo):
+        res.append([cartas[k] for k in range(len(cartas)) if (m >> k) & 1])
+    return res
+
+def puede_capturar(cartas, objetivo):
+    """ True si alguna combinación de 'cartas' suma 'objetivo' (se para en la primera). """
+    for _ in capturas([c[0] for c in cartas], objetivo):
+        return True
+    return False
+
+# Mejor captura del rival por clase de carta: posición 2*(v-1) para las cartas de
+# valor v que no son de oros y 2*(v-1)+1 para la de oros.
+_MEJORES = [0] * 20
+
+def _mejores_valor(mesa, valores, v, todo, total, cont):
+    """
+    Guarda en _MEJORES la mejor captura sobre 'mesa' de una carta de valor 'v' de cada
+    clase, para un montón con los contadores 'cont'. Si puede hacer escoba ('total' es
+    la suma de la mesa), esa es la mejor.
+    """
+    b0 = b1 = 0
+    for m in (todo,) if total == 15 - v else combinaciones(valores, 15 - v):
+        n = sietes = oros = velo = 0
+        k = 0
+        r = m
+        while r:
+            if r & 1:
+                c = mesa[k]
+                n += 1
+                if c[0] == 7:
+                    if c[1] == 1:
+                        velo += 1
+                    else:
+                        sietes += 1
+                elif c[1] == 1:
+                    oros += 1
+            r >>= 1
+            k += 1
+        e = 1 if m == todo else 0
+        if v == 7:
+            p0 = puntos_movida(cont, n + 1, sietes + 1, oros, velo, e)
+            p1 = puntos_movida(cont, n + 1, sietes, oros, velo + 1, e)
+        else:
+            p0 = puntos_movida(cont, n + 1, sietes, oros, velo, e)
+            p1 = puntos_movida(cont, n + 1, sietes, oros + 1, velo, e)
+        if p0 > b0:
+            b0 = p0
+        if p1 > b1:
+            b1 = p1
+    _MEJORES[2 * (v - 1)] = b0
+    _MEJORES[2 * (v - 1) + 1] = b1
+
+def expectativa_oponente(mesa, deck, cont=VACIOS):
+    """
+    Media, sobre las cartas de 'deck', de la mejor captura del rival sobre 'mesa',
+    con los contadores 'cont' de su montón. Las combinaciones se recorren una vez por
+    valor, no por carta.
+    """
+    if not deck:
+        return 0
+    valores = [c[0] for c in mesa]
+    todo = (1 << len(mesa)) - 1
+    total = sum(valores)
+    hechos = 0
+    tot = 0
+    for op in deck:
+        v = op[0]
+        if not ((hechos >> v) & 1):
+            hechos |= 1 << v
+            _mejores_valor(mesa, valores, v, todo, total, cont)
+        tot += _MEJORES[2 * (v - 1) + (1 if op[1] == 1 else 0)]
+    return tot / len(deck)
+
+def evaluar_movida(card, mesa, deck, movida, cont=VACIOS, cont_rival=VACIOS):
+    """
+    Evalúa la movida (tipo, combinación) de 'card', con tipo "captura" o "no captura",
+    con los contadores 'cont' del montón de quien juega y 'cont_rival' del de su rival.
+    Retorna (neto, puntos, expectativa del rival, nueva mesa).
+    """
+    if movida[0] == "captura":
+        combo = movida[1]
+        nm = [c for c in mesa if c not in combo]
+        n, sietes, oros, velo = contadores(combo + [card])
+        pts = puntos_movida(cont, n, sietes, oros, velo, 1 if len(nm) == 0 else 0)
+    else:
+        nm = mesa + [card]
+        pts = 0
+    exp = expectativa_oponente(nm, deck, cont_rival)
+    return pts - exp, pts, exp, nm
+
+def calcular_puntuacion_final(estado):
+    """
+    Puntos por categoría (velo, sietes, oros, cartas) y escobas de un estado con las
+    listas 'capturadas_usuario' y 'capturadas_oponente' y los números de escobas.
+    Retorna (puntos, desglose).
+    """
+    pts_final = {"usuario": 0, "oponente": 0}
+    desg = {"usuario": {}, "oponente": {}}
+    cu_todas = estado["capturadas_usuario"]
+    co_todas = estado["capturadas_oponente"]
+    for cat in ("velo", "sietes", "oros", "cartas"):
+        if cat == "velo":
+            cu = sum(1 for c in cu_todas if c == VELO)
+            co = sum(1 for c in co_todas if c == VELO)
+        elif cat == "sietes":
+            cu = sum(1 for c in cu_todas if c[0] == 7)
+            co = sum(1 for c in co_todas if c[0] == 7)
+        elif cat == "oros":
+            cu = sum(1 for c in cu_todas if c[1] == 1)
+            co = sum(1 for c in co_todas if c[1] == 1)
+        else:
+            cu = len(cu_todas)
+            co = len(co_todas)
+        if cu > co:
+            pts_final["usuario"] += 1
+            desg["usuario"][cat] = 1
+            desg["oponente"][cat] = 0
+        elif co > cu:
+            pts_final["oponente"] += 1
+            desg["usuario"][cat] = 0
+            desg["oponente"][cat] = 1
+        else:
+            desg["usuario"][cat] = 0
+            desg["oponente"][cat] = 0
+    pts_final["usuario"] += estado["escobas_usuario"]
+    pts_final["oponente"] += estado["escobas_oponente"]
+    desg["usuario"]["escobas"] = estado["escobas_usuario"]
+    desg["oponente"]["escobas"] = estado["escobas_oponente"]
+    return pts_final, desg
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""
+Registro binario de partidas de Escoba.
+
+Un fichero de registro guarda partidas completas (o interrumpidas) de forma compacta
+y permite llegar a cualquier partida o posición sin leer las anteriores: el lector
+proyecta el fichero en memoria (mmap) y usa un índice con el desplazamiento de cada
+partida.
+
+Formato (enteros little-endian):
+  - Cabecera fija de 32 bytes: "ESCB", versión (u16), reservado (u16), número de
+    partidas (u64), número de posiciones (u64) y desplazamiento del índice (u64;
+    0 si el fichero no se cerró bien, y entonces el índice se reconstruye recorriendo
+    las partidas).
+  - Las partidas, una tras otra. Cada una empieza con 8 bytes: número de eventos
+    (16 bits), jugador que es mano (8 bits) y mesa inicial (máscara de 40 bits).
+    Siguen sus eventos, de 6 bytes cada uno: máscara de 40 bits, carta de 6 bits
+    (índice de escoba.CARTAS; 63 indica un reparto) y jugador (1 bit). En una jugada
+    la máscara es la captura (0 si no captura); en un reparto, las cartas repartidas.
+  - El índice: por partida, su desplazamiento (u64) y el número de posiciones de las
+    partidas anteriores (u64). Una posición es el estado antes de cada jugada.
+
+Uso:
+    with Escritor("partidas.escb") as escritor:
+        escritor.agregar(estado)          # GameState de una partida
+    with Lector("partidas.escb") as lector:
+        estado = lector.estado(1234)      # partida 1234 completa
+        estado, movida, jugador = lector.posicion(10**6)
+"""
+import array
+import mmap
+import os
+import struct
+import sys
+
+from escoba import GameState, _JUGADA, _REPARTO
+
+MAGICO = b"ESCB"
+VERSION = 1
+CABECERA = struct.Struct("<4sHHQQQ")
+ENTRADA_INDICE = struct.Struct("<QQ")
+CABECERA_PARTIDA = 8
+EVENTO = 6
+REPARTO = 63
+_MASCARA_40 = (1 << 40) - 1
+
+# ==========================================
+# Codificación de una partida
+# ==========================================
+def _inicio(estado):
+    """ Mesa, manos y jugador que es mano al empezar la partida de 'estado'. """
+    inicial = estado.copia()
+    while inicial.historial:
+        inicial.undo()
+    return inicial.mesa, inicial.manos, inicial.turno
+
+def codificar_partida(estado):
+    """
+    Codifica la partida del GameState 'estado' desde su creación (sus repartos y
+    jugadas; el barrido final se deduce). Retorna (bytes, número de posiciones).
+    """
+    mesa, manos, inicia = _inicio(estado)
+    eventos = []
+    for jugador in (0, 1):
+        if manos[jugador]:
+            eventos.append(manos[jugador] | REPARTO << 40 | jugador << 46)
+    posiciones = 0
+    for entrada in estado.historial:
+        if entrada[0] == _JUGADA:
+            _, jugador, carta, captura = entrada[:4]
+            eventos.append(captura | carta << 40 | jugador << 46)
+            posiciones += 1
+        elif entrada[0] == _REPARTO:
+            _, jugador, cartas = entrada
+            eventos.append(cartas | REPARTO << 40 | jugador << 46)
+    if len(eventos) >= 1 << 16:
+        raise ValueError("partida demasiado larga para el registro")
+    datos = bytearray((len(eventos) | inicia << 16 | mesa << 24).to_bytes(CABECERA_PARTIDA, "little"))
+    for evento in eventos:
+        datos += evento.to_bytes(EVENTO, "little")
+    return bytes(datos), posiciones
+
+def decodificar_partida(datos, desplazamiento=0):
+    """
+    Lee la partida que empieza en 'desplazamiento' de 'datos' (bytes o mmap).
+    Retorna (mesa, inicia, eventos), donde cada evento es (carta, mascara, jugador)
+    y la carta es REPARTO en los repartos.
+    """
+    cabecera = int.from_bytes(datos[desplazamiento:desplazamiento + CABECERA_PARTIDA], "little")
+    n = cabecera & 0xFFFF
+    inicia = (cabecera >> 16) & 0xFF
+    mesa = cabecera >> 24
+    eventos = []
+    pos = desplazamiento + CABECERA_PARTIDA
+    for _ in range(n):
+        evento = int.from_bytes(datos[pos:pos + EVENTO], "little")
+        eventos.append(((evento >> 40) & 63, evento & _MASCARA_40, (evento >> 46) & 1))
+        pos += EVENTO
+    return mesa, inicia, eventos
+
+def reproducir(mesa, inicia, eventos, jugadas=None):
+    """
+    GameState tras aplicar los 'eventos' de una partida. Si se da 'jugadas', se para
+    antes de la jugada número 'jugadas' (desde 0); si se aplican todos y la partida
+    ha terminado, se barre la mesa.
+    """
+    estado = GameState(mesa=mesa, turno=inicia)
+    hechas = 0
+    for carta, mascara, jugador in eventos:
+        if carta == REPARTO:
+            estado.repartir(jugador, mascara)
+            continue
+        if jugadas is not None and hechas == jugadas:
+            return estado
+        estado.apply((carta, mascara), jugador)
+        hechas += 1
+    if jugadas is None and estado.terminado():
+        estado.barrer()
+    return estado
+
+# ==========================================
+# Escritura
+# ==========================================
+def _leer_cabecera(datos):
+    magico, version, _, partidas, posiciones, indice = CABECERA.unpack_from(datos, 0)
+    if magico != MAGICO:
+        raise ValueError("no es un registro de partidas de Escoba")
+    if version != VERSION:
+        raise ValueError(f"versión de registro no soportada: {version}")
+    return partidas, posiciones, indice
+
+def _recorrer(datos, inicio, fin):
+    """ Genera (desplazamiento, posiciones) de cada partida completa entre 'inicio' y 'fin'. """
+    pos = inicio
+    while pos + CABECERA_PARTIDA <= fin:
+        n = int.from_bytes(datos[pos:pos + 2], "little")
+        siguiente = pos + CABECERA_PARTIDA + n * EVENTO
+        if siguiente > fin:
+            break
+        jugadas = 0
+        for k in range(pos + CABECERA_PARTIDA, siguiente, EVENTO):
+            if (datos[k + 5] & 63) != REPARTO:
+                jugadas += 1
+        yield pos, jugadas
+        pos = siguiente
+
+class Escritor:
+    """
+    Añade partidas a un fichero de registro (lo crea si no existe). Al abrirlo se quita
+    el índice del final, que se vuelve a escribir, con las partidas nuevas, al cerrar.
+    """
+    def __init__(self, fichero):
+        self.fichero = fichero
+        self.indice = array.array("Q")
+        existe = os.path.exists(fichero) and os.path.getsize(fichero) > 0
+        self.f = open(fichero, "r+b" if existe else "w+b")
+        if existe:
+            datos = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                partidas, self.posiciones, desplazamiento = _leer_cabecera(datos)
+                if desplazamiento:
+                    self.indice.frombytes(datos[desplazamiento:desplazamiento + partidas * ENTRADA_INDICE.size])
+                    if sys.byteorder != "little":
+                        self.indice.byteswap()
+                    fin = desplazamiento
+                else:
+                    self.posiciones = 0
+                    fin = CABECERA.size
+                    for pos, jugadas in _recorrer(datos, CABECERA.size, len(datos)):
+                        self.indice.extend((pos, self.posiciones))
+                        self.posiciones += jugadas
+                        fin = pos + CABECERA_PARTIDA + int.from_bytes(datos[pos:pos + 2], "little") * EVENTO
+            finally:
+                datos.close()
+            self.f.truncate(fin)
+        else:
+            self.posiciones = 0
+            fin = CABECERA.size
+        # Mientras está abierto, la cabecera no apunta a ningún índice.
+        self.f.seek(0)
+        self.f.write(CABECERA.pack(MAGICO, VERSION, 0, len(self.indice) // 2, self.posiciones, 0))
+        self.f.seek(fin)
+
+    def __len__(self):
+        return len(self.indice) // 2
+
+    def agregar(self, estado):
+        """ Añade la partida del GameState 'estado'. """
+        self.agregar_codificada(*codificar_partida(estado))
+
+    def agregar_codificada(self, datos, posiciones):
+        """ Añade una partida ya codificada con codificar_partida. """
+        self.indice.extend((self.f.tell(), self.posiciones))
+        self.f.write(datos)
+        self.posiciones += posiciones
+
+    def cerrar(self):
+        if self.f.closed:
+            return
+        desplazamiento = self.f.tell()
+        indice = self.indice
+        if sys.byteorder != "little":
+            indice = array.array("Q", indice)
+            indice.byteswap()
+        self.f.write(indice.tobytes())
+        self.f.seek(0)
+        self.f.write(CABECERA.pack(MAGICO, VERSION, 0, len(self), self.posiciones, desplazamiento))
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+# ==========================================
+# Lectura
+# ==========================================
+class Lector:
+    """
+    Acceso aleatorio a un fichero de registro proyectado en memoria. Abrirlo no lee
+    las partidas: cada partida o posición se decodifica al pedirla.
+    """
+    def __init__(self, fichero):
+        self.f = open(fichero, "rb")
+        self.datos = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.partidas, self.posiciones, self._indice = _leer_cabecera(self.datos)
+        self._reconstruido = None
+        if not self._indice:
+            # Fichero que no se cerró bien: el índice se reconstruye en memoria.
+            self._reconstruido = array.array("Q")
+            self.posiciones = 0
+            for pos, jugadas in _recorrer(self.datos, CABECERA.size, len(self.datos)):
+                self._reconstruido.extend((pos, self.posiciones))
+                self.posiciones += jugadas
+            self.partidas = len(self._reconstruido) // 2
+
+    def __len__(self):
+        return self.partidas
+
+    def entrada(self, i):
+        """ (desplazamiento, primera posición) de la partida 'i'. """
+        if not 0 <= i < self.partidas:
+            raise IndexError(i)
+        if self._reconstruido is not None:
+            return self._reconstruido[2 * i], self._reconstruido[2 * i + 1]
+        return ENTRADA_INDICE.unpack_from(self.datos, self._indice + i * ENTRADA_INDICE.size)
+
+    def partida(self, i):
+        """ (mesa, inicia, eventos) de la partida 'i' (ver decodificar_partida). """
+        return decodificar_partida(self.datos, self.entrada(i)[0])
+
+    def estado(self, i, jugadas=None):
+        """ GameState de la partida 'i' antes de su jugada 'jugadas' (por defecto, al final). """
+        return reproducir(*self.partida(i), jugadas)
+
+    def buscar_posicion(self, p):
+        """ (partida, jugada dentro de ella) de la posición global 'p' (búsqueda binaria en el índice). """
+        if not 0 <= p < self.posiciones:
+            raise IndexError(p)
+        bajo, alto = 0, self.partidas - 1
+        while bajo < alto:
+            medio = (bajo + alto + 1) // 2
+            if self.entrada(medio)[1] <= p:
+                bajo = medio
+            else:
+                alto = medio - 1
+        return bajo, p - self.entrada(bajo)[1]
+
+    def posicion(self, p):
+        """
+        Posición global 'p': (GameState antes de la jugada, jugada (carta, captura) que se
+        hizo, jugador que la hizo).
+        """
+        i, k = self.buscar_posicion(p)
+        mesa, inicia, eventos = self.partida(i)
+        jugadas = [(carta, mascara, jugador) for carta, mascara, jugador in eventos if carta != REPARTO]
+        carta, captura, jugador = jugadas[k]
+        return reproducir(mesa, inicia, eventos, k), (carta, captura), jugador
+
+    def __iter__(self):
+        for i in range(self.partidas):
+            yield self.partida(i)
+
+    def cerrar(self):
+        self.datos.close()
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
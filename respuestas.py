@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla precalculada de las mejores respuestas del oponente.
+
+El trabajo más repetido de evaluar_movida es la expectativa del oponente: para cada
+carta que puede jugar, la mejor captura que hace sobre la mesa. La respuesta sólo
+depende de la forma de la mesa (cuántas cartas hay de cada clase: valor y si es de
+oros, ver escoba.CLASE), del valor de la carta y de si es de oros, y de los contadores
+de su montón. Esta tabla guarda, para cada forma de mesa de hasta CARTAS_MAX cartas y
+cada valor de carta, los rasgos (cartas, sietes sin velo, oros sin velo, velo) de las
+capturas que no están dominadas por otra (otra con todos los rasgos mayores o
+iguales). Como los puntos de una captura crecen con cada rasgo, la mejor captura con
+cualquier montón está entre ellas: suelen ser 1 o 2, y nunca más de 7. La escoba no
+hace falta guardarla: es la única captura que suma lo mismo que toda la mesa.
+
+Así la expectativa pasa de enumerar capturas a leer unos pocos enteros por valor de
+carta, con el mismo resultado exacto que expectativa_oponente (las mismas operaciones
+en coma flotante, en el mismo orden). Las mesas de más de CARTAS_MAX cartas siguen
+el camino normal.
+
+Las formas se numeran por número de cartas y, dentro, con un sistema combinatorio
+(como en aperturas.py), de modo que una tabla con menos cartas es un prefijo de otra
+con más.
+
+Formato (little-endian): "ESCR", versión (u16), cartas máximas (u16), número de
+formas N (u64), número de rasgos (u64); por forma, el desplazamiento de sus rasgos
+(u32) y cuántos hay para cada valor de carta, 3 bits por valor (u32); y los rasgos
+(u16: cartas en los bits 0-3, sietes 4-5, oros 6-9, velo 10).
+
+Uso:
+    python respuestas.py --procesos 8    # genera respuestas.bin (unos 37 MiB; un par de minutos de CPU)
+    python escoba.py                     # la usa si existe respuestas.bin
+
+escoba.expectativa_oponente abre la tabla (abrir()) la primera vez que la necesita, en
+cada proceso y con cualquier punto de entrada; si no existe, enumera las capturas.
+"""
+import argparse
+import array
+import functools
+import mmap
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+import escoba
+from escoba import (BIT, VALOR, CLASE, CONTADORES_VACIOS, indices, contar_cartas, rasgos_mascara,
+                    sumar_contadores, valor_contadores)
+
+FICHERO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "respuestas.bin")
+MAGICO = b"ESCR"
+VERSION = 1
+CABECERA = struct.Struct("<4sHHQQ")
+FORMA = struct.Struct("<II")
+CARTAS_MAX = 8
+MAX_RASGOS = 7   # rasgos por valor de carta: caben en 3 bits
+
+# Clases de carta (escoba.CLASE): 0..9 son los oros de valor 1..10 y 10..19 el resto.
+CLASES = 20
+COPIAS = (1,) * 10 + (3,) * 10
+RASGOS_CARTA = tuple(rasgos_mascara(b) for b in BIT)
+
+# ==========================================
+# Numeración de las formas de mesa
+# ==========================================
+@functools.lru_cache(maxsize=None)
+def completar(clase, cartas):
+    """ Formas de repartir 'cartas' cartas entre las clases 'clase'..19. """
+    if clase == CLASES:
+        return 1 if cartas == 0 else 0
+    return sum(completar(clase + 1, cartas - a) for a in range(min(COPIAS[clase], cartas) + 1))
+
+# ANTES[t]: formas con menos de t cartas. SALTO[clase][t][a]: formas que quedan antes
+# de poner 'a' cartas de 'clase' cuando faltan 't' cartas por repartir.
+ANTES = [0]
+for _t in range(CARTAS_MAX + 1):
+    ANTES.append(ANTES[-1] + completar(0, _t))
+SALTO = tuple(tuple(tuple(sum(completar(clase + 1, t - b) for b in range(a)) for a in range(min(COPIAS[clase], t) + 1))
+                    for t in range(CARTAS_MAX + 1))
+              for clase in range(CLASES))
+FORMAS = ANTES[CARTAS_MAX + 1]
+
+def rango(cuentas, cartas):
+    """ Número de la forma con 'cuentas' (cartas por clase), que suman 'cartas' (<= CARTAS_MAX). """
+    r = ANTES[cartas]
+    t = cartas
+    for clase in range(CLASES):
+        a = cuentas[clase]
+        if a:
+            r += SALTO[clase][t][a]
+            t -= a
+            if not t:
+                break
+    return r
+
+def forma(r):
+    """ Inversa de rango(): cuentas por clase de la forma 'r'. """
+    cartas = 0
+    while ANTES[cartas + 1] <= r:
+        cartas += 1
+    r -= ANTES[cartas]
+    cuentas = [0] * CLASES
+    t = cartas
+    for clase in range(CLASES):
+        for a in range(min(COPIAS[clase], t) + 1):
+            n = completar(clase + 1, t - a)
+            if r < n:
+                break
+            r -= n
+        cuentas[clase] = a
+        t -= a
+    return cuentas
+
+# ==========================================
+# Generación
+# ==========================================
+def rasgos_forma(cuentas):
+    """
+    Para cada valor de carta 1..10, la lista ordenada de rasgos (cartas, sietes sin velo,
+    oros sin velo, velo) no dominados de las capturas de la forma 'cuentas'.
+    """
+    # alcanzables[t]: rasgos de las capturas que suman t (sólo hacen falta t <= 14).
+    alcanzables = [set() for _ in range(15)]
+    alcanzables[0].add((0, 0, 0, 0))
+    for v in range(1, 11):
+        oros, otras = cuentas[v - 1], cuentas[v + 9]
+        opciones = [(x, y) for x in range(oros + 1) for y in range(otras + 1) if (x or y) and (x + y) * v <= 14]
+        if not opciones:
+            continue
+        nuevos = [set(s) for s in alcanzables]
+        for t in range(15):
+            for x, y in opciones:
+                u = t + (x + y) * v
+                if u > 14:
+                    continue
+                for n, sietes, o, velo in alcanzables[t]:
+                    if v == 7:
+                        nuevos[u].add((n + x + y, sietes + y, o, velo + x))
+                    else:
+                        nuevos[u].add((n + x + y, sietes, o + x, velo))
+        alcanzables = nuevos
+    resultado = []
+    for v in range(1, 11):
+        candidatos = alcanzables[15 - v]
+        resultado.append(sorted(p for p in candidatos
+                                if not any(q != p and all(a >= b for a, b in zip(q, p)) for q in candidatos)))
+    return resultado
+
+def _codificar(rasgos):
+    n, sietes, oros, velo = rasgos
+    return n | sietes << 4 | oros << 6 | velo << 10
+
+def _generar_bloque(limites):
+    inicio, fin = limites
+    cuantos = array.array("I")
+    valores = array.array("H")
+    for r in range(inicio, fin):
+        empaquetado = 0
+        for v, lista in enumerate(rasgos_forma(forma(r))):
+            if len(lista) > MAX_RASGOS:
+                raise ValueError(f"la forma {r} tiene {len(lista)} capturas no dominadas con valor {v + 1}")
+            empaquetado |= len(lista) << 3 * v
+            valores.extend(_codificar(p) for p in lista)
+        cuantos.append(empaquetado)
+    return cuantos, valores
+
+def generar(fichero=FICHERO, procesos=None, cartas=CARTAS_MAX, bloque=5000, informe=sys.stderr):
+    """ Genera la tabla de las formas de hasta 'cartas' cartas en 'procesos' procesos y la escribe en 'fichero'. """
+    cartas = min(cartas, CARTAS_MAX)
+    n = ANTES[cartas + 1]
+    bloques = [(k, min(k + bloque, n)) for k in range(0, n, bloque)]
+    formas = array.array("I")
+    total = 0
+    inicio = time.perf_counter()
+    temporal = fichero + ".tmp"
+    pool = multiprocessing.Pool(procesos) if procesos != 1 else None
+    try:
+        resultados = pool.imap(_generar_bloque, bloques) if pool else map(_generar_bloque, bloques)
+        with open(temporal + ".valores", "wb") as valores:
+            for k, (cuantos, v) in enumerate(resultados, 1):
+                for empaquetado in cuantos:
+                    formas.append(total)
+                    formas.append(empaquetado)
+                    total += sum((empaquetado >> 3 * i) & 7 for i in range(10))
+                if sys.byteorder != "little":
+                    v.byteswap()
+                valores.write(v.tobytes())
+                if informe and k % 20 == 0:
+                    hechas = bloques[k - 1][1]
+                    print(f"{hechas}/{n} formas ({hechas / (time.perf_counter() - inicio):.0f}/s)", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if sys.byteorder != "little":
+        formas.byteswap()
+    with open(temporal, "wb") as f:
+        f.write(CABECERA.pack(MAGICO, VERSION, cartas, n, total))
+        f.write(formas.tobytes())
+        with open(temporal + ".valores", "rb") as valores:
+            while True:
+                trozo = valores.read(1 << 20)
+                if not trozo:
+                    break
+                f.write(trozo)
+    os.remove(temporal + ".valores")
+    os.replace(temporal, fichero)
+    return n, total
+
+# ==========================================
+# Consulta
+# ==========================================
+class TablaRespuestas:
+    """ Tabla de respuestas en disco. Se proyecta en memoria la primera vez que se consulta. """
+    def __init__(self, fichero=FICHERO):
+        self.fichero = fichero
+        self.datos = None
+        self.disponible = None
+        self.formas = 0
+        self.cartas = 0
+
+    def _cargar(self):
+        self.disponible = os.path.exists(self.fichero)
+        if not self.disponible:
+            return
+        with open(self.fichero, "rb") as f:
+            self.datos = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, version, self.cartas, self.formas, _ = CABECERA.unpack_from(self.datos, 0)
+        if magico != MAGICO or version != VERSION or self.formas != ANTES[min(self.cartas, CARTAS_MAX) + 1]:
+            raise ValueError(f"{self.fichero} no es una tabla de respuestas válida")
+        self._valores = CABECERA.size + FORMA.size * self.formas
+
+    def rasgos(self, mesa):
+        """
+        (lista por valor de carta 1..10 de los rasgos no dominados de sus capturas, suma de
+        la mesa) de 'mesa' (máscara), o None si la mesa no está en la tabla.
+        """
+        if self.disponible is None:
+            self._cargar()
+        if not self.disponible:
+            return None
+        cartas = contar_cartas(mesa)
+        if cartas > self.cartas:
+            return None
+        cuentas = [0] * CLASES
+        suma = 0
+        for i in indices(mesa):
+            cuentas[CLASE[i]] += 1
+            suma += VALOR[i]
+        desde, empaquetado = FORMA.unpack_from(self.datos, CABECERA.size + FORMA.size * rango(cuentas, cartas))
+        total = 0
+        for v in range(10):
+            total += (empaquetado >> 3 * v) & 7
+        codigos = struct.unpack_from(f"<{total}H", self.datos, self._valores + 2 * desde)
+        por_valor = []
+        k = 0
+        for v in range(10):
+            c = (empaquetado >> 3 * v) & 7
+            por_valor.append([(x & 15, (x >> 4) & 3, (x >> 6) & 15, x >> 10) for x in codigos[k:k + c]])
+            k += c
+        return por_valor, suma
+
+    def expectativa(self, mesa, deck, contadores=CONTADORES_VACIOS, pesos=None):
+        """
+        Como escoba.expectativa_oponente (mismo valor exacto), desde la tabla. Retorna
+        None si la mesa no está en la tabla.
+        """
+        tabla = self.rasgos(mesa)
+        if tabla is None:
+            return None
+        por_valor, suma = tabla
+        base = valor_contadores(contadores)
+        # mejores[2*(v-1)] para las cartas de valor v que no son de oros; +1 para la de oros.
+        mejores = [None] * 20
+        total_oponente = 0
+        total_pesos = 0
+        for i in indices(deck):
+            v = VALOR[i]
+            clase = 2 * (v - 1) + (1 if i < 10 else 0)
+            mejor = mejores[clase]
+            if mejor is None:
+                mejor = 0
+                escobas = 1 if suma == 15 - v else 0
+                carta = RASGOS_CARTA[i]
+                for rasgos in por_valor[v - 1]:
+                    pts = valor_contadores(sumar_contadores(sumar_contadores(contadores, rasgos), carta)) - base + escobas
+                    if pts > mejor:
+                        mejor = pts
+                mejores[clase] = mejor
+            if pesos is not None:
+                mejor *= pesos[i]
+                total_pesos += pesos[i]
+            total_oponente += mejor
+        if pesos is not None and total_pesos > 0:
+            return total_oponente / total_pesos
+        if pesos is not None:
+            return self.expectativa(mesa, deck, contadores)
+        return total_oponente / contar_cartas(deck)
+
+def abrir(fichero=FICHERO):
+    """ TablaRespuestas de 'fichero' si existe; si no, None. """
+    if not os.path.exists(fichero):
+        return None
+    return TablaRespuestas(fichero)
+
+def activar(fichero=FICHERO):
+    """
+    Hace que escoba.expectativa_oponente consulte la tabla de 'fichero' en lugar de
+    respuestas.bin (y la devuelve). Si no existe, desactiva la tabla y devuelve None.
+    """
+    tabla = abrir(fichero)
+    escoba.RESPUESTAS = tabla or False
+    return tabla
+
+def comprobar(n=1000, fichero=FICHERO, semilla=0):
+    """
+    Compara la expectativa de la tabla con la de expectativa_oponente en 'n' posiciones
+    aleatorias (mesas dentro de la tabla, montones y pesos al azar). Retorna las diferencias.
+    """
+    tabla = TablaRespuestas(fichero)
+    rng = random.Random(semilla)
+    diferencias = []
+    # expectativa_oponente debe enumerar las capturas, no consultar la tabla.
+    activa, escoba.RESPUESTAS = escoba.RESPUESTAS, False
+    try:
+        for _ in range(n):
+            cartas = rng.sample(range(40), 40)
+            k = rng.randint(0, CARTAS_MAX)
+            mesa = sum(BIT[i] for i in cartas[:k])
+            deck = sum(BIT[i] for i in cartas[k:k + rng.randint(1, 30)])
+            contadores = (rng.randint(0, 24), rng.randint(0, 3), rng.randint(0, 8), rng.randint(0, 1))
+            pesos = [rng.random() for _ in range(40)] if rng.random() < 0.3 else None
+            obtenido = tabla.expectativa(mesa, deck, contadores, pesos)
+            if obtenido is None:
+                continue
+            esperado = escoba.expectativa_oponente(mesa, deck, contadores, pesos)
+            if obtenido != esperado:
+                diferencias.append((mesa, deck, contadores, esperado, obtenido))
+    finally:
+        escoba.RESPUESTAS = activa
+    return diferencias
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera la tabla de respuestas del oponente del consejero de Escoba.")
+    parser.add_argument("--salida", default=FICHERO, help="fichero de la tabla (por defecto, respuestas.bin)")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--cartas", type=int, default=CARTAS_MAX,
+                        help=f"cartas máximas de la mesa (hasta {CARTAS_MAX}; con menos, la tabla es más pequeña)")
+    parser.add_argument("--comprobar", type=int, default=None, metavar="POSICIONES",
+                        help="compara la tabla con expectativa_oponente en este número de posiciones aleatorias")
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+    n, total = generar(args.salida, args.procesos, args.cartas)
+    print(f"{n} formas, {total} rasgos, {os.path.getsize(args.salida) / 2**20:.1f} MiB "
+          f"en {time.perf_counter() - inicio:.0f} s")
+    if args.comprobar:
+        diferencias = comprobar(args.comprobar, args.salida)
+        for mesa, deck, contadores, esperado, obtenido in diferencias[:10]:
+            print(f"mesa {escoba.de_mascara(mesa)}, contadores {contadores}: {esperado} en lugar de {obtenido}")
+        print(f"{len(diferencias)} diferencias en {args.comprobar} posiciones")
+        if diferencias:
+            raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio HTTP/JSON del consejero de Escoba.
+
+Recibe una posición y devuelve las jugadas de quien mueve ordenadas por valor neto,
+las mismas que muestra sugerir_mejor_jugada con las mismas opciones (por defecto, las
+de python escoba.py sin opciones: evaluar_jugadas). Es un servidor asyncio: el cálculo se
+hace en un grupo de procesos, las peticiones simultáneas de la misma posición se
+agrupan en un único cálculo y los resultados se guardan en una caché LRU acotada
+por posición canónica: las cartas como máscaras, sin depender del orden en que
+vengan, y con copas, espadas y bastos reasignados como en escoba.canonizar. Las
+posiciones que sólo difieren en esos palos comparten cálculo y entrada de la caché;
+las jugadas se devuelven con las cartas de la petición.
+
+Peticiones:
+    POST /sugerencia   {"mesa": ["7o", "5o"], "mano": ["2c", "3e", "10b"],
+                        "lado": "usuario",                     (opcional; o "oponente")
+                        "no_vistas": ["1o", ...],              (opcional; por defecto, el resto)
+                        "capturadas": {"usuario": [...], "oponente": [...]},   (opcional)
+                        "profundidad": 1,                      (opcional, como en escoba.py)
+                        "limite_ms": 200,                      (opcional: profundización iterativa
+                                                                con este tiempo, hasta 'profundidad';
+                                                                a más de 1 jugada, por defecto
+                                                                LIMITE_POR_DEFECTO_MS)
+                        "aperturas": false,                    (opcional, como escoba.py --aperturas)
+                        "final_exacto": false}                 (opcional, como escoba.py --final-exacto)
+    GET /estado        contadores del servicio (peticiones, aciertos de la caché, agrupadas...)
+
+Respuesta de /sugerencia:
+    {"jugadas": [{"carta": "2c", "captura": ["7o", "5o"], "escoba": false, "neto": 0.3,
+                  "puntos": 0.5, "expectativa": 0.2}, ...],
+     "profundidad": 1,                 (alcanzada; "final" si se resolvió el final exacto)
+     "cache": false}
+
+Sólo se guardan en la caché los resultados que llegan a la profundidad pedida (o que
+no tenían nada que buscar: una sola jugada posible): si el límite de tiempo cortó la
+búsqueda, el resultado depende de la carga de la máquina y otra petición igual puede
+llegar más lejos.
+
+Uso:
+    python servicio.py --puerto 8015 --procesos 4
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+
+from escoba import (BIT, CARTAS, INDICE, JUGADORES, USUARIO, BARAJA_COMPLETA, GameState, de_mascara,
+                    parsear_carta, texto_carta, indices, rasgos_mascara, canonizar, evaluar_jugadas)
+
+MAX_CUERPO = 1 << 16
+MAX_PROFUNDIDAD = 4
+MAX_PROFUNDIDAD_LIMITADA = 8
+MAX_LIMITE_MS = 60000
+# Sin 'limite_ms', las búsquedas de más de 1 jugada se cortan a este tiempo: una sola
+# petición no puede ocupar un proceso durante minutos.
+LIMITE_POR_DEFECTO_MS = 10000
+
+# ==========================================
+# Posiciones
+# ==========================================
+def _mascara(cartas, campo):
+    if not isinstance(cartas, list):
+        raise ValueError(f"'{campo}' debe ser una lista de cartas")
+    mascara = 0
+    for texto in cartas:
+        carta = parsear_carta(texto) if isinstance(texto, str) else None
+        if carta is None:
+            raise ValueError(f"carta no válida en '{campo}': {texto!r}")
+        bit = BIT[INDICE[carta]]
+        if mascara & bit:
+            raise ValueError(f"carta repetida en '{campo}': {texto}")
+        mascara |= bit
+    return mascara
+
+def posicion_canonica(peticion):
+    """
+    Clave canónica de una petición y traducción de sus cartas. La clave es (mesa, mano,
+    no_vistas, capturadas_usuario, capturadas_oponente, lado, profundidad, limite_ms,
+    aperturas, final_exacto), con las cartas como máscaras en forma canónica; la traducción, un diccionario del
+    texto de cada carta canónica al de la carta de la petición (ver traducir()).
+    Lanza ValueError si la posición no es válida.
+    """
+    if not isinstance(peticion, dict):
+        raise ValueError("la petición debe ser un objeto JSON")
+    mesa = _mascara(peticion.get("mesa", []), "mesa")
+    mano = _mascara(peticion.get("mano", []), "mano")
+    lado = peticion.get("lado", "usuario")
+    if lado not in JUGADORES:
+        raise ValueError(f"'lado' debe ser uno de {JUGADORES}")
+    capturadas = peticion.get("capturadas", {})
+    if not isinstance(capturadas, dict):
+        raise ValueError("'capturadas' debe ser un objeto con 'usuario' y 'oponente'")
+    cap = tuple(_mascara(capturadas.get(j, []), f"capturadas.{j}") for j in JUGADORES)
+    usadas = [mesa, mano, cap[0], cap[1]]
+    if "no_vistas" in peticion:
+        no_vistas = _mascara(peticion["no_vistas"], "no_vistas")
+        usadas.append(no_vistas)
+    else:
+        no_vistas = BARAJA_COMPLETA & ~(mesa | mano | cap[0] | cap[1])
+    total = 0
+    for mascara in usadas:
+        if total & mascara:
+            raise ValueError("hay cartas en más de un sitio")
+        total |= mascara
+    if not mano:
+        raise ValueError("la mano está vacía")
+    limite = peticion.get("limite_ms")
+    if limite is not None and (isinstance(limite, bool) or not isinstance(limite, (int, float))
+                               or not 0 < limite <= MAX_LIMITE_MS):
+        raise ValueError(f"'limite_ms' debe ser un número entre 0 y {MAX_LIMITE_MS}")
+    maxima = MAX_PROFUNDIDAD if limite is None else MAX_PROFUNDIDAD_LIMITADA
+    profundidad = peticion.get("profundidad", 1 if limite is None else maxima)
+    if isinstance(profundidad, bool) or not isinstance(profundidad, int) or not 1 <= profundidad <= maxima:
+        raise ValueError(f"'profundidad' debe ser un entero entre 1 y {maxima}")
+    opciones = []
+    for opcion in ("aperturas", "final_exacto"):
+        valor = peticion.get(opcion, False)
+        if not isinstance(valor, bool):
+            raise ValueError(f"'{opcion}' debe ser true o false")
+        opciones.append(valor)
+    presentes = mesa | mano | no_vistas | cap[0] | cap[1]
+    (mesa, mano, no_vistas, cap_usuario, cap_oponente), mapa = canonizar(mesa, mano, no_vistas, cap[0], cap[1])
+    textos = {texto_carta(CARTAS[mapa[i]]): texto_carta(CARTAS[i]) for i in indices(presentes)}
+    return (mesa, mano, no_vistas, cap_usuario, cap_oponente, JUGADORES.index(lado), profundidad, limite,
+            *opciones), textos
+
+def traducir(resultado, textos):
+    """ 'resultado' de calcular() con las cartas canónicas cambiadas por las de 'textos'. """
+    jugadas = [dict(jugada, carta=textos[jugada["carta"]],
+                    captura=sorted((textos[c] for c in jugada["captura"]), key=lambda t: INDICE[parsear_carta(t)]))
+               for jugada in resultado["jugadas"]]
+    return dict(resultado, jugadas=jugadas)
+
+def estado_de_posicion(clave):
+    """ GameState de una clave canónica, con la mano en el lado que mueve. """
+    mesa, mano, no_vistas, cap_usuario, cap_oponente, lado = clave[:6]
+    manos = [0, 0]
+    manos[lado] = mano
+    estado = GameState(mesa=mesa, manos=manos, baraja=no_vistas, turno=lado)
+    estado.capturadas = [cap_usuario, cap_oponente]
+    estado.contadores = [rasgos_mascara(cap_usuario), rasgos_mascara(cap_oponente)]
+    return estado
+
+# ==========================================
+# Cálculo (en los procesos del grupo)
+# ==========================================
+_EVALUADORES = {}
+
+def _evaluador(profundidad, limite=None, aperturas=False, final_exacto=False):
+    """
+    El evaluador del consejero, como python escoba.py con --aperturas y --final-exacto si
+    se piden; se conserva entre peticiones.
+    """
+    clave = (profundidad, limite, aperturas, final_exacto)
+    evaluar = _EVALUADORES.get(clave)
+    if evaluar is None:
+        if limite is not None:
+            from busqueda import evaluador_limitado
+            evaluar = evaluador_limitado(limite, profundidad)
+        else:
+            evaluar = evaluar_jugadas
+        busqueda = getattr(evaluar, "busqueda", None)
+        if aperturas:
+            from aperturas import con_aperturas
+            evaluar = con_aperturas(evaluar)
+        if final_exacto:
+            from busqueda import con_final_exacto
+            evaluar = con_final_exacto(evaluar)
+        if busqueda is not None:
+            evaluar.busqueda = busqueda
+        _EVALUADORES[clave] = evaluar
+    return evaluar
+
+def calcular(clave):
+    """
+    Jugadas de la posición 'clave' ordenadas por valor neto y profundidad alcanzada,
+    listas para JSON.
+    """
+    estado = estado_de_posicion(clave)
+    lado, profundidad, limite, aperturas, final_exacto = clave[5:]
+    if limite is None and profundidad > 1:
+        limite = LIMITE_POR_DEFECTO_MS
+    from busqueda import es_final
+    evaluar = _evaluador(profundidad, limite, aperturas, final_exacto)
+    evaluaciones = evaluar(estado, estado.legal_moves(lado), lado)
+    if final_exacto and es_final(estado, lado, USUARIO):
+        profundidad = "final"
+    elif limite is not None:
+        profundidad = evaluar.busqueda.profundidad
+    jugadas = []
+    for (carta, captura), neto, pts, exp, nueva_mesa in sorted(evaluaciones, key=lambda e: -e[1]):
+        jugadas.append({"carta": texto_carta(CARTAS[carta]),
+                        "captura": [texto_carta(c) for c in de_mascara(captura)],
+                        "escoba": bool(captura) and not nueva_mesa,
+                        "neto": neto, "puntos": pts, "expectativa": exp})
+    return {"jugadas": jugadas, "profundidad": profundidad}
+
+# ==========================================
+# Servicio
+# ==========================================
+class Servicio:
+    """
+    Resuelve posiciones con caché LRU de 'capacidad' entradas y agrupación de las
+    peticiones en curso, calculando en 'ejecutor' (un concurrent.futures.Executor).
+    """
+    def __init__(self, ejecutor, capacidad=10000):
+        self.ejecutor = ejecutor
+        self.capacidad = capacidad
+        self.cache = collections.OrderedDict()
+        self.en_curso = {}
+        self.contadores = collections.Counter()
+
+    async def sugerencia(self, clave):
+        """ Retorna (resultado de calcular(), si venía de la caché). """
+        self.contadores["peticiones"] += 1
+        resultado = self.cache.get(clave)
+        if resultado is not None:
+            self.cache.move_to_end(clave)
+            self.contadores["aciertos"] += 1
+            return resultado, True
+        futuro = self.en_curso.get(clave)
+        if futuro is None:
+            futuro = asyncio.get_running_loop().run_in_executor(self.ejecutor, calcular, clave)
+            self.en_curso[clave] = futuro
+            futuro.add_done_callback(lambda f, clave=clave: self._terminado(clave, f))
+            self.contadores["calculadas"] += 1
+        else:
+            self.contadores["agrupadas"] += 1
+        # shield: si un cliente se va, el cálculo sigue para los demás y para la caché.
+        return await asyncio.shield(futuro), False
+
+    def _terminado(self, clave, futuro):
+        del self.en_curso[clave]
+        if futuro.cancelled() or futuro.exception() is not None:
+            self.contadores["errores"] += 1
+            return
+        resultado = futuro.result()
+        if resultado["profundidad"] not in ("final", clave[6]) and len(resultado["jugadas"]) > 1:
+            # Cortado por el tiempo: no se guarda.
+            self.contadores["incompletas"] += 1
+            return
+        self.cache[clave] = resultado
+        if len(self.cache) > self.capacidad:
+            self.cache.popitem(last=False)
+
+    def estado(self):
+        return dict(self.contadores, cache=len(self.cache), en_curso=len(self.en_curso),
+                    capacidad=self.capacidad)
+
+    async def atender(self, metodo, ruta, cuerpo):
+        """ Retorna (código HTTP, objeto JSON de respuesta). """
+        if ruta == "/estado":
+            if metodo != "GET":
+                return 405, {"error": "usa GET"}
+            return 200, self.estado()
+        if ruta != "/sugerencia":
+            return 404, {"error": f"ruta desconocida: {ruta}"}
+        if metodo != "POST":
+            return 405, {"error": "usa POST"}
+        try:
+            clave, textos = posicion_canonica(json.loads(cuerpo or b"null"))
+        except ValueError as error:  # incluye los errores de JSON
+            return 400, {"error": str(error)}
+        try:
+            resultado, cache = await self.sugerencia(clave)
+        except Exception as error:
+            return 500, {"error": f"error al calcular la posición: {error}"}
+        return 200, dict(traducir(resultado, textos), cache=cache)
+
+    async def conexion(self, lector, escritor):
+        """ Atiende una conexión HTTP/1.1 (con keep-alive) hasta que el cliente la cierra. """
+        try:
+            while True:
+                linea = await lector.readline()
+                if not linea:
+                    break
+                try:
+                    metodo, ruta, version = linea.decode("latin-1").split()
+                except ValueError:
+                    await _responder(escritor, 400, {"error": "petición mal formada"}, False)
+                    break
+                cabeceras = {}
+                while True:
+                    linea = await lector.readline()
+                    if linea in (b"\r\n", b"\n", b""):
+                        break
+                    nombre, _, valor = linea.decode("latin-1").partition(":")
+                    cabeceras[nombre.strip().lower()] = valor.strip()
+                longitud = int(cabeceras.get("content-length", 0) or 0)
+                if longitud > MAX_CUERPO:
+                    await _responder(escritor, 413, {"error": "petición demasiado grande"}, False)
+                    break
+                cuerpo = await lector.readexactly(longitud) if longitud else b""
+                seguir = (cabeceras.get("connection", "").lower() != "close"
+                          and version.upper() == "HTTP/1.1")
+                codigo, respuesta = await self.atender(metodo.upper(), ruta.split("?")[0], cuerpo)
+                await _responder(escritor, codigo, respuesta, seguir)
+                if not seguir:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+_MOTIVOS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error"}
+
+async def _responder(escritor, codigo, objeto, seguir):
+    cuerpo = json.dumps(objeto, ensure_ascii=False).encode("utf-8")
+    escritor.write((f"HTTP/1.1 {codigo} {_MOTIVOS[codigo]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(cuerpo)}\r\n"
+                    f"Connection: {'keep-alive' if seguir else 'close'}\r\n\r\n").encode("latin-1") + cuerpo)
+    await escritor.drain()
+
+async def servir(anfitrion="127.0.0.1", puerto=8015, procesos=None, capacidad=10000):
+    """ Arranca el servicio y atiende peticiones hasta que se cancela. """
+    # Con fork, los procesos (que se crean según hacen falta) heredarían las conexiones
+    # abiertas y los clientes no verían cerrarse la suya: se usa spawn.
+    contexto = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(procesos, mp_context=contexto) as ejecutor:
+        servicio = Servicio(ejecutor, capacidad)
+        servidor = await asyncio.start_server(servicio.conexion, anfitrion, puerto)
+        print(f"Consejero de Escoba en http://{anfitrion}:{puerto}/sugerencia")
+        async with servidor:
+            await servidor.serve_forever()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio HTTP/JSON del consejero de Escoba.")
+    parser.add_argument("--anfitrion", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8015)
+    parser.add_argument("--procesos", type=int, default=None, help="procesos de cálculo (por defecto, uno por núcleo)")
+    parser.add_argument("--cache", type=int, default=10000, help="posiciones que se guardan en la caché")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(servir(args.anfitrion, args.puerto, args.procesos, args.cache))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Simulador de partidas de Escoba.
+Reparte partidas aleatorias a partir de una semilla y juega los dos asientos con la
+heurística de sugerencia (la jugada de mayor valor neto, como sugerir_mejor_jugada).
+El resultado de cada partida (puntos, desglose de calcular_puntuacion_final y escobas)
+se escribe como una línea JSON. Las partidas se reparten entre varios procesos y la
+salida es la misma con cualquier número de procesos: la partida i de la semilla s
+siempre se reparte igual.
+
+Con --registro las partidas completas (repartos y jugadas) se añaden además a un
+registro binario (ver registro.py).
+
+Uso:
+    python simulador.py -n 10000 --semilla 1 --procesos 8 --salida partidas.jsonl
+    python simulador.py -n 100000 --registro partidas.escb
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import time
+
+from escoba import BIT, JUGADORES, USUARIO, GameState, mejor_jugada
+from registro import Escritor, codificar_partida
+
+def barajar(semilla, partida):
+    """ Orden de la baraja (lista de índices de carta) de la partida 'partida' de 'semilla'. """
+    orden = list(range(40))
+    random.Random(f"{semilla}:{partida}").shuffle(orden)
+    return orden
+
+def a_mascara_indices(orden):
+    mascara = 0
+    for i in orden:
+        mascara |= BIT[i]
+    return mascara
+
+def politica_heuristica(estado):
+    """ Jugada de mayor valor neto para el jugador que tiene el turno. """
+    return mejor_jugada(estado)[0]
+
+def continuar_partida(estado, orden, inicia, politicas=(politica_heuristica, politica_heuristica)):
+    """
+    Juega lo que queda de partida desde 'estado'. Cada vez que las manos se vacían se
+    reparten 3 cartas a cada jugador de 'orden' (índices de la baraja, en el orden en que
+    salen), empezando por 'inicia', el que es mano. 'politicas' tiene una función por
+    asiento que recibe el GameState y devuelve la jugada. Devuelve el estado, con la
+    mesa ya barrida.
+    """
+    pos = 0
+    while True:
+        if not estado.manos[0] and not estado.manos[1]:
+            if not estado.baraja:
+                break
+            for jugador in (inicia, 1 - inicia):
+                estado.repartir(jugador, a_mascara_indices(orden[pos:pos+3]))
+                pos += 3
+        if not estado.manos[estado.turno]:
+            # Sin cartas en la mano pasa el turno (sólo en posiciones que no vienen de un reparto normal).
+            estado.turno = 1 - estado.turno
+            continue
+        estado.apply(politicas[estado.turno](estado))
+    estado.barrer()
+    return estado
+
+def jugar_partida(orden, inicia=USUARIO, politicas=(politica_heuristica, politica_heuristica)):
+    """
+    Juega una partida completa con la baraja en el orden 'orden': 4 cartas a la mesa y,
+    cada vez que las manos se vacían, 3 cartas a cada jugador empezando por el que es mano.
+    Devuelve el GameState final, con la mesa ya barrida.
+    """
+    estado = GameState(mesa=a_mascara_indices(orden[:4]), turno=inicia)
+    return continuar_partida(estado, orden[4:], inicia, politicas)
+
+def resultado_partida(estado, semilla, partida, inicia):
+    """ Resumen serializable de una partida terminada. """
+    puntos, desglose = estado.score()
+    return {"semilla": semilla, "partida": partida, "inicia": JUGADORES[inicia],
+            "puntos": puntos, "desglose": desglose}
+
+def simular_partida(semilla, partida):
+    """ Juega la partida 'partida' de 'semilla' (el que es mano se alterna) y devuelve su resumen. """
+    inicia = partida % 2
+    estado = jugar_partida(barajar(semilla, partida), inicia)
+    return resultado_partida(estado, semilla, partida, inicia)
+
+def _simular_linea(args):
+    """ Línea JSON de la partida y, si se pide, la partida codificada para el registro. """
+    semilla, partida, registrar = args
+    inicia = partida % 2
+    estado = jugar_partida(barajar(semilla, partida), inicia)
+    linea = json.dumps(resultado_partida(estado, semilla, partida, inicia), ensure_ascii=False)
+    return linea, codificar_partida(estado) if registrar else None
+
+def simular(n, semilla=0, procesos=None, salida=None, informe=sys.stderr, registro=None):
+    """
+    Simula 'n' partidas de 'semilla' en 'procesos' procesos (por defecto, uno por núcleo)
+    y escribe una línea JSON por partida en 'salida' (None: no se guardan). Si se da
+    'registro', las partidas se añaden a ese fichero de registro binario. Devuelve un
+    diccionario con el total de partidas, el tiempo, las partidas por segundo y los
+    puntos y escobas medios por jugador.
+    """
+    trabajos = ((semilla, i, registro is not None) for i in range(n))
+    totales = {j: {"puntos": 0, "escobas": 0} for j in JUGADORES}
+    inicio = time.perf_counter()
+    destino = open(salida, "w", encoding="utf-8") if salida else None
+    escritor = Escritor(registro) if registro else None
+    pool = multiprocessing.Pool(procesos) if procesos != 1 else None
+    try:
+        if pool is None:
+            lineas = map(_simular_linea, trabajos)
+        else:
+            trozo = max(1, n // ((procesos or multiprocessing.cpu_count()) * 16))
+            lineas = pool.imap(_simular_linea, trabajos, chunksize=trozo)
+        for k, (linea, codificada) in enumerate(lineas, 1):
+            if destino:
+                destino.write(linea + "\n")
+            if escritor is not None:
+                escritor.agregar_codificada(*codificada)
+            partida = json.loads(linea)
+            for j in JUGADORES:
+                totales[j]["puntos"] += partida["puntos"][j]
+                totales[j]["escobas"] += partida["desglose"][j]["escobas"]
+            if informe and k % 1000 == 0:
+                print(f"{k} partidas, {k / (time.perf_counter() - inicio):.1f} partidas/s", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if destino:
+            destino.close()
+        if escritor is not None:
+            escritor.cerrar()
+    tiempo = time.perf_counter() - inicio
+    resumen = {"partidas": n, "segundos": tiempo, "partidas_por_segundo": n / tiempo if tiempo else 0.0}
+    for j in JUGADORES:
+        resumen[j] = {"puntos_medios": totales[j]["puntos"] / n if n else 0.0,
+                      "escobas_medias": totales[j]["escobas"] / n if n else 0.0}
+    return resumen
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador de partidas de Escoba con la heurística de sugerencia.")
+    parser.add_argument("-n", "--partidas", type=int, default=1000, help="número de partidas")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de los repartos")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--salida", default=None, help="fichero JSONL con el resultado de cada partida")
+    parser.add_argument("--registro", default=None, help="registro binario al que se añaden las partidas completas")
+    args = parser.parse_args(argv)
+    resumen = simular(args.partidas, args.semilla, args.procesos, args.salida, registro=args.registro)
+    print(f"{resumen['partidas']} partidas en {resumen['segundos']:.2f} s "
+          f"({resumen['partidas_por_segundo']:.1f} partidas/s)")
+    for j in JUGADORES:
+        print(f"{j}: {resumen[j]['puntos_medios']:.3f} puntos, {resumen[j]['escobas_medias']:.3f} escobas por partida")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del analizador de partidas (analizador.py): decisiones de una partida válida y
+registros de error para las líneas que no lo son, sin parar el análisis.
+Se ejecutan con: python -m pytest
+"""
+import io
+import json
+
+import pytest
+
+from analizador import analizar_lineas
+
+VALIDA = {"id": 1, "mesa": ["7o", "5o", "6b", "5e"], "repartos": [["2c", "3e", "10b"]],
+          "jugadas": [{"jugador": "usuario", "carta": "3e", "captura": ["5o", "7o"]},
+                      {"jugador": "oponente", "carta": "4c", "captura": []}]}
+
+def analizar(*lineas):
+    destino = io.StringIO()
+    totales = analizar_lineas(lineas, destino)
+    return [json.loads(l) for l in destino.getvalue().splitlines()], totales
+
+def test_partida_valida():
+    registros, totales = analizar(json.dumps(VALIDA))
+    assert totales["partidas"] == 1 and totales["errores"] == 0
+    usuario, oponente, resumen = registros
+    assert usuario["decision"] == "sugerir_mejor_jugada" and usuario["puesto"] == 1
+    assert oponente["decision"] == "sugerir_movida_oponente"
+    assert resumen["resumen"] and resumen["decisiones"] == {"usuario": 1, "oponente": 1}
+
+@pytest.mark.parametrize("linea", [
+    "[1, 2]",
+    '"partida"',
+    "{",
+    '{"mesa": [7]}',
+    '{"mesa": "7o"}',
+    '{"mesa": ["7o"], "repartos": [["2c", 3]]}',
+    '{"mesa": ["7o"], "jugadas": [["usuario", "2c"]]}',
+    '{"mesa": ["7o"], "repartos": [["2c"]], "jugadas": [{"jugador": "usuario", "carta": 2}]}',
+    '{"mesa": ["7o"], "repartos": [["8c"]], "jugadas": [{"jugador": "usuario", "carta": "8c", "captura": [7]}]}',
+    '{"mesa": ["7x"]}',
+    '{"mesa": ["7o"], "jugadas": [{"jugador": "nadie", "carta": "2c"}]}',
+    '{"mesa": ["7o"], "repartos": [["2c"]], "jugadas": [{"jugador": "usuario", "carta": "3c"}]}',
+])
+def test_linea_mala_da_un_registro_de_error(linea):
+    registros, totales = analizar(linea, json.dumps(VALIDA))
+    assert totales["errores"] == 1 and totales["partidas"] == 1
+    error = registros[0]
+    assert set(error) == {"partida", "linea", "error"} and error["linea"] == 1
+    # La partida válida de después se analiza entera.
+    assert [r.get("jugada") for r in registros[1:]] == [1, 2, None]
+
+def test_error_con_id_lo_conserva():
+    registros, _ = analizar('{"id": 9, "mesa": [7]}')
+    assert registros == [{"partida": 9, "linea": 1, "error": "'mesa' debe ser una lista de cartas (textos)"}]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la tabla de aperturas (aperturas.py) contra evaluar_jugadas, con una tabla
+parcial generada para la prueba.
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+from escoba import BIT, USUARIO, GameState, evaluar_jugadas
+import aperturas
+
+N = 300
+
+@pytest.fixture(scope="module")
+def tabla(tmp_path_factory):
+    fichero = str(tmp_path_factory.mktemp("aperturas") / "aperturas.bin")
+    aperturas.generar(fichero, procesos=1, posiciones=N, informe=None)
+    return aperturas.TablaAperturas(fichero)
+
+def apertura(r, azar):
+    """ GameState de la posición canónica 'r' con cartas concretas de cada clase elegidas al azar. """
+    mesa, mano = aperturas.posicion(r)
+    m, h = 0, 0
+    for clase in range(aperturas.CLASES):
+        cartas = list(aperturas.CARTAS_CLASE[clase])
+        azar.shuffle(cartas)
+        for i in cartas[:mesa[clase]]:
+            m |= BIT[i]
+        for i in cartas[mesa[clase]:mesa[clase] + mano[clase]]:
+            h |= BIT[i]
+    return GameState(mesa=m, manos=(h, 0))
+
+def test_la_tabla_coincide_con_evaluar_jugadas(tabla):
+    azar = random.Random(0)
+    for r in list(range(0, N, 7)) + [N - 1]:
+        estado = apertura(r, azar)
+        movidas = estado.legal_moves(USUARIO)
+        desde_tabla = tabla.evaluar(estado, movidas, USUARIO)
+        assert desde_tabla is not None
+        for (movida, neto, pts, exp, mesa), esperado in zip(desde_tabla, evaluar_jugadas(estado, movidas, USUARIO)):
+            assert movida == esperado[0] and mesa == esperado[4]
+            assert (neto, pts, exp) == pytest.approx(esperado[1:4])
+
+def test_fuera_de_la_tabla_no_responde(tabla):
+    estado = apertura(N, random.Random(1))
+    assert tabla.evaluar(estado, estado.legal_moves(USUARIO), USUARIO) is None
+    # Ni cuando ya no es una apertura.
+    estado = apertura(0, random.Random(2))
+    estado.apply(estado.legal_moves(USUARIO)[0])
+    assert tabla.evaluar(estado, estado.legal_moves(USUARIO), USUARIO) is None
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la arena (arena.py): los nombres de las políticas y el ajuste del Elo.
+Se ejecutan con: python -m pytest
+"""
+import math
+import random
+
+import pytest
+
+from arena import POLITICAS, ajustar_elo, arena, crear_politica, fabrica_politica
+from simulador import barajar, jugar_partida
+
+@pytest.mark.parametrize("nombre, base, argumento", [
+    ("azar", "azar", None),
+    ("neto", "neto", None),
+    ("expectimax:3", "expectimax", "3"),
+    ("valoracion:pesos.npz", "valoracion", "pesos.npz"),
+])
+def test_fabrica_de_las_politicas_del_modulo(nombre, base, argumento):
+    assert fabrica_politica(nombre) == (POLITICAS[base], argumento)
+
+def test_fabrica_de_otro_modulo():
+    fabrica, argumento = fabrica_politica("arena.politica_azar:x")
+    assert fabrica.__name__ == "politica_azar" and argumento == "x"
+
+@pytest.mark.parametrize("nombre", ["nada", "nada:3", "modulo_que_no_existe.fabrica", "random.nada", "math.pi"])
+def test_nombres_que_no_existen(nombre):
+    with pytest.raises(ValueError, match="política desconocida"):
+        fabrica_politica(nombre)
+    with pytest.raises(ValueError):
+        arena(["azar", nombre], n=1, procesos=1, informe=None)
+
+@pytest.mark.parametrize("nombre", ["azar", "voraz", "neto", "expectimax:1"])
+def test_las_politicas_juegan_partidas_completas(nombre):
+    politicas = tuple(crear_politica(nombre, random.Random(asiento), 0) for asiento in (0, 1))
+    estado = jugar_partida(barajar(0, 0), 0, politicas)
+    assert estado.terminado()
+
+def test_elo_con_resultados_iguales_es_cero():
+    elo = ajustar_elo(["a", "b", "c"], {("a", "b"): (5, 10), ("a", "c"): (5, 10), ("b", "c"): (5, 10)})
+    assert all(abs(e) < 1e-6 for e in elo.values())
+
+def test_elo_de_dos_politicas():
+    # Con el empate ficticio, la probabilidad estimada es (7 + 0.5) / (10 + 1).
+    elo = ajustar_elo(["a", "b"], {("a", "b"): (7, 10)})
+    p = 7.5 / 11
+    assert elo["a"] - elo["b"] == pytest.approx(400 * math.log10(p / (1 - p)))
+    assert elo["a"] + elo["b"] == pytest.approx(0, abs=1e-9)
+
+def test_elo_recupera_fuerzas_conocidas():
+    # Resultados que son justo los esperados con estas fuerzas (contando el empate ficticio).
+    fuerzas = {"a": 4.0, "b": 2.0, "c": 1.0, "d": 0.5}
+    nombres = list(fuerzas)
+    resultados = {}
+    for i, a in enumerate(nombres):
+        for b in nombres[i + 1:]:
+            n = 40
+            resultados[a, b] = ((n + 1) * fuerzas[a] / (fuerzas[a] + fuerzas[b]) - 0.5, n)
+    elo = ajustar_elo(nombres, resultados)
+    media = sum(400 * math.log10(f) for f in fuerzas.values()) / len(fuerzas)
+    for p, f in fuerzas.items():
+        assert elo[p] == pytest.approx(400 * math.log10(f) - media, abs=1e-6)
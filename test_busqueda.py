@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de las búsquedas de busqueda.py: el final exacto contra la fuerza bruta.
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+from escoba import BIT, USUARIO, OPONENTE, GameState, rasgos_mascara
+from busqueda import SolucionadorFinal
+
+def final_al_azar(semilla):
+    """
+    Final de partida al azar: mesa de 0 a 4 cartas, de 1 a 3 cartas en cada mano, la
+    baraja vacía y el resto de las cartas repartidas entre los dos montones.
+    """
+    azar = random.Random(semilla)
+    cartas = list(range(40))
+    azar.shuffle(cartas)
+    k = azar.randint(0, 4)
+    u = azar.randint(1, 3)
+    o = azar.randint(1, 3)
+    mascara = lambda lista: sum(BIT[i] for i in lista)
+    estado = GameState(mesa=mascara(cartas[:k]), manos=(mascara(cartas[k:k+u]), mascara(cartas[k+u:k+u+o])),
+                       baraja=0, turno=azar.randint(0, 1))
+    for i in cartas[k+u+o:]:
+        estado.capturadas[azar.randint(0, 1)] |= BIT[i]
+    estado.contadores = [rasgos_mascara(m) for m in estado.capturadas]
+    estado.escobas = [azar.randint(0, 2), azar.randint(0, 2)]
+    estado.ultimo = azar.choice((None, USUARIO, OPONENTE))
+    return estado
+
+def fuerza_bruta(estado):
+    """ Diferencia final de puntos (usuario menos oponente) con juego perfecto, sin memoria. """
+    if not estado.manos[USUARIO] and not estado.manos[OPONENTE]:
+        estado.barrer()
+        puntos, _ = estado.score()
+        estado.undo()
+        return puntos["usuario"] - puntos["oponente"]
+    turno = estado.turno
+    lado = turno if estado.manos[turno] else 1 - turno
+    estado.turno = lado
+    valores = []
+    for movida in estado.legal_moves():
+        estado.apply(movida)
+        valores.append(fuerza_bruta(estado))
+        estado.undo()
+    estado.turno = turno
+    return max(valores) if lado == USUARIO else min(valores)
+
+@pytest.mark.parametrize("semilla", range(40))
+def test_final_exacto_coincide_con_la_fuerza_bruta(semilla):
+    estado = final_al_azar(semilla)
+    jugador = estado.turno
+    signo = 1 if jugador == USUARIO else -1
+    solucionador = SolucionadorFinal()
+    for movida, neto, _, _, _ in solucionador.evaluar(estado, estado.legal_moves(), jugador):
+        estado.apply(movida)
+        assert neto == signo * fuerza_bruta(estado)
+        estado.undo()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la creencia sobre la mano del oponente (creencias.py): la actualización por
+clases de carta contra la que mira todas las capturas de cada carta no vista.
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+from escoba import BIT, VALOR, CONTADORES_VACIOS, BARAJA_COMPLETA, indices, indice_capturas, puntos_movida
+from creencias import RENUNCIA, CreenciaMano
+from simulador import barajar, jugar_partida
+
+def observar_directo(pesos, mesa, carta, captura, contadores, no_vistas):
+    """ La regla de CreenciaMano.observar, buscando la mejor captura de cada carta. """
+    hecha = puntos_movida(contadores, captura | BIT[carta], 1 if captura == mesa else 0) if captura else 0
+    for i in indices(no_vistas & ~BIT[carta]):
+        mejor = max((puntos_movida(contadores, combo | BIT[i], 1 if combo == mesa else 0)
+                     for combo in indice_capturas(mesa).combos(15 - VALOR[i])), default=0)
+        if mejor > hecha + 1e-9:
+            pesos[i] *= RENUNCIA
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_observar_coincide_con_la_busqueda_directa(semilla):
+    azar = random.Random(semilla)
+    creencia = CreenciaMano()
+    esperado = list(creencia.pesos)
+    for _ in range(20):
+        cartas = azar.sample(range(40), azar.randint(1, 8))
+        mesa = sum(BIT[i] for i in cartas[1:])
+        carta = cartas[0]
+        combos = indice_capturas(mesa).combos(15 - VALOR[carta])
+        captura = azar.choice(combos) if combos else 0
+        contadores = azar.choice((CONTADORES_VACIOS, (10, 1, 3, 0), (20, 2, 5, 1)))
+        no_vistas = BARAJA_COMPLETA & ~mesa
+        creencia.observar(mesa, carta, captura, contadores, no_vistas)
+        observar_directo(esperado, mesa, carta, captura, contadores, no_vistas)
+        assert list(creencia.pesos) == pytest.approx(esperado)
+
+def test_sincronizar_tras_un_undo_reconstruye_los_pesos():
+    estado = jugar_partida(barajar(0, 0), 0)
+    while len(estado.historial) > 20:
+        estado.undo()
+    creencia = CreenciaMano()
+    creencia.sincronizar(estado)
+    estado.undo()
+    estado.undo()
+    creencia.sincronizar(estado)
+    nueva = CreenciaMano()
+    nueva.sincronizar(estado)
+    assert list(creencia.pesos) == list(nueva.pesos)
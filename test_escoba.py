@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de GameState (apply/undo/barrer/score), de los contadores de los montones y
+de la forma canónica de las posiciones (simetría de palos).
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+from escoba import (BIT, BARAJA_COMPLETA, USUARIO, OPONENTE, CONTADORES_VACIOS, GameState, rasgos_mascara,
+                    puntos_movida, puntos_cartas_original, valor_contadores, calcular_puntuacion_final,
+                    de_mascara, indices, canonica, canonizar, evaluar_jugadas)
+from simulador import barajar, a_mascara_indices
+
+def foto(estado):
+    """ Todo lo que apply/undo deben restaurar. """
+    return (estado.mesa, estado.baraja, tuple(estado.manos), tuple(estado.capturadas),
+            tuple(estado.contadores), tuple(estado.escobas), estado.ultimo, estado.turno,
+            tuple(estado.historial))
+
+def jugar_al_azar(semilla, al_jugar=None):
+    """
+    Juega una partida con jugadas al azar, repartiendo como simulador.jugar_partida.
+    Llama a 'al_jugar(estado, movida)' antes de aplicar cada jugada. Devuelve
+    (estado final barrido, fotos antes de cada paso).
+    """
+    azar = random.Random(semilla)
+    orden = barajar(semilla, 0)
+    estado = GameState(mesa=a_mascara_indices(orden[:4]), turno=semilla % 2)
+    fotos = []
+    pos = 4
+    while True:
+        if not estado.manos[0] and not estado.manos[1]:
+            if not estado.baraja:
+                break
+            for jugador in (semilla % 2, 1 - semilla % 2):
+                fotos.append(foto(estado))
+                estado.repartir(jugador, a_mascara_indices(orden[pos:pos+3]))
+                pos += 3
+        movida = azar.choice(estado.legal_moves())
+        if al_jugar is not None:
+            al_jugar(estado, movida)
+        fotos.append(foto(estado))
+        estado.apply(movida)
+    fotos.append(foto(estado))
+    estado.barrer()
+    return estado, fotos
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_apply_undo_restauran_el_estado(semilla):
+    estado, fotos = jugar_al_azar(semilla)
+    assert estado.terminado()
+    assert len(estado.historial) == len(fotos)
+    for anterior in reversed(fotos):
+        estado.undo()
+        assert foto(estado) == anterior
+    assert not estado.historial
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_contadores_siguen_a_las_capturadas(semilla):
+    def comprobar(estado, movida):
+        for j in (USUARIO, OPONENTE):
+            assert estado.contadores[j] == rasgos_mascara(estado.capturadas[j])
+    estado, _ = jugar_al_azar(semilla, comprobar)
+    comprobar(estado, None)
+    # Todas las cartas acaban en un montón (o en la mesa si nadie capturó).
+    assert estado.capturadas[USUARIO] | estado.capturadas[OPONENTE] | estado.mesa == BARAJA_COMPLETA
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_puntos_movida_suman_el_valor_de_los_montones(semilla):
+    sumas = [0, 0]
+    def sumar(estado, movida):
+        carta, captura = movida
+        if captura:
+            j = estado.turno
+            sumas[j] += puntos_movida(estado.contadores[j], captura | BIT[carta],
+                                      1 if captura == estado.mesa else 0)
+    estado, _ = jugar_al_azar(semilla, sumar)
+    # El barrido final añade la mesa al último que capturó, sin escoba.
+    _, jugador, mesa, contadores = estado.historial[-1]
+    if jugador is not None:
+        sumas[jugador] += puntos_movida(contadores, mesa)
+    _, desglose = estado.score()
+    for j, nombre in ((USUARIO, "usuario"), (OPONENTE, "oponente")):
+        esperado = valor_contadores(rasgos_mascara(estado.capturadas[j])) + desglose[nombre]["escobas"]
+        assert sumas[j] == pytest.approx(esperado)
+
+def test_puntos_movida_con_monton_vacio_es_la_formula_original():
+    azar = random.Random(0)
+    for _ in range(500):
+        captura = 0
+        for i in azar.sample(range(40), azar.randint(1, 8)):
+            captura |= BIT[i]
+        escoba = azar.randint(0, 1)
+        assert puntos_movida(CONTADORES_VACIOS, captura, escoba) == pytest.approx(
+            puntos_cartas_original(captura, escoba))
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_score_coincide_con_calcular_puntuacion_final(semilla):
+    estado, _ = jugar_al_azar(semilla)
+    listas = {
+        "capturadas_usuario": de_mascara(estado.capturadas[USUARIO]),
+        "capturadas_oponente": de_mascara(estado.capturadas[OPONENTE]),
+        "escobas_usuario": estado.escobas[USUARIO],
+        "escobas_oponente": estado.escobas[OPONENTE],
+    }
+    assert estado.score() == calcular_puntuacion_final(listas)
+
+def zonas_al_azar(azar, n=4):
+    """ 'n' máscaras disjuntas al azar (mesa, manos, no vistas...). """
+    cartas = list(range(40))
+    azar.shuffle(cartas)
+    cortes = sorted(azar.sample(range(41), n - 1))
+    return [sum(BIT[i] for i in cartas[a:b]) for a, b in zip([0] + cortes, cortes + [40])]
+
+def permutar_palos(azar):
+    """ Índice de cada carta tras permutar al azar copas, espadas y bastos en cada valor. """
+    mapa = list(range(40))
+    for v in range(10):
+        palos = [1, 2, 3]
+        azar.shuffle(palos)
+        for palo, nuevo in zip((1, 2, 3), palos):
+            mapa[10 * palo + v] = 10 * nuevo + v
+    return mapa
+
+def aplicar(mapa, mascara):
+    return sum(BIT[mapa[i]] for i in indices(mascara))
+
+@pytest.mark.parametrize("semilla", range(50))
+def test_canonica_no_cambia_al_permutar_los_palos(semilla):
+    azar = random.Random(semilla)
+    zonas = zonas_al_azar(azar, azar.randint(1, 5))
+    mapa = permutar_palos(azar)
+    assert canonica(*zonas) == canonica(*[aplicar(mapa, z) for z in zonas])
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_canonizar_lleva_cada_carta_a_su_clase(semilla):
+    zonas = zonas_al_azar(random.Random(semilla))
+    canonicas, mapa = canonizar(*zonas)
+    assert canonicas == canonica(*zonas)
+    for zona, canon in zip(zonas, canonicas):
+        assert aplicar(mapa, zona) == canon
+        # Mismos valores y mismos oros: la puntuación no cambia.
+        assert rasgos_mascara(zona) == rasgos_mascara(canon)
+        assert sorted(i % 10 for i in indices(zona)) == sorted(i % 10 for i in indices(canon))
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_evaluar_jugadas_no_cambia_al_permutar_los_palos(semilla):
+    azar = random.Random(semilla)
+    cartas = azar.sample(range(40), 7)
+    mesa, mano = sum(BIT[i] for i in cartas[:4]), sum(BIT[i] for i in cartas[4:])
+    mapa = permutar_palos(azar)
+    valores = []
+    for m, h in ((mesa, mano), (aplicar(mapa, mesa), aplicar(mapa, mano))):
+        estado = GameState(mesa=m, manos=(h, 0))
+        evaluaciones = evaluar_jugadas(estado, estado.legal_moves(USUARIO), USUARIO)
+        valores.append(sorted(round(neto, 9) for _, neto, _, _, _ in evaluaciones))
+    assert valores[0] == valores[1]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la matriz de manos (manos.py) contra evaluar_jugadas, con NumPy y con el
+bucle que la sustituye sin NumPy, sobre mesas y montones sorteados.
+Se ejecutan con: python -m pytest
+"""
+import itertools
+import random
+
+import pytest
+
+import manos
+from escoba import BIT, CONTADORES_VACIOS, USUARIO, GameState, evaluar_jugadas, indices, rasgos_mascara, sumar_contadores
+
+def mascara(cartas):
+    return sum(BIT[i] for i in cartas)
+
+def posicion(semilla):
+    """ Mesa, no vistas y contadores de los dos montones, sorteados con 'semilla'. """
+    azar = random.Random(semilla)
+    cartas = list(range(40))
+    azar.shuffle(cartas)
+    k = azar.randint(0, 5)
+    mesa = mascara(cartas[:k])
+    no_vistas = mascara(cartas[k:k + azar.randint(6, 11)])
+    resto = cartas[k + 11:]
+    contadores = [CONTADORES_VACIOS, CONTADORES_VACIOS]
+    for i in resto[:azar.randint(0, len(resto))]:
+        j = azar.randint(0, 1)
+        contadores[j] = sumar_contadores(contadores[j], rasgos_mascara(BIT[i]))
+    return mesa, no_vistas, contadores
+
+def valor_mano(mesa, mano, no_vistas, contadores):
+    """ Mejor neto de 'mano' según evaluar_jugadas, con el rival jugando las demás no vistas. """
+    estado = GameState(mesa=mesa, manos=(mano, 0))
+    estado.contadores = list(contadores)
+    evaluaciones = evaluar_jugadas(estado, estado.legal_moves(USUARIO), USUARIO, deck=no_vistas & ~mano)
+    return max(neto for _, neto, _, _, _ in evaluaciones)
+
+@pytest.mark.parametrize("numpy", [True, False])
+@pytest.mark.parametrize("semilla", range(8))
+def test_la_matriz_coincide_con_evaluar_jugadas(monkeypatch, semilla, numpy):
+    if numpy:
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(manos, "np", None)
+    mesa, no_vistas, contadores = posicion(semilla)
+    lista, valores = manos.matriz_manos(mesa, no_vistas, *contadores)
+    combinaciones = [tuple(int(c) for c in mano) for mano in lista]
+    assert combinaciones == [tuple(c) for c in itertools.combinations(indices(no_vistas), 3)]
+    for mano, valor in zip(combinaciones, valores):
+        assert valor == pytest.approx(valor_mano(mesa, mascara(mano), no_vistas, contadores), abs=1e-12)
+
+def test_pocas_no_vistas():
+    with pytest.raises(ValueError):
+        manos.matriz_manos(0, mascara([0, 1, 2]))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del protocolo del motor (motor.py), con las órdenes dadas a Motor.orden y la
+salida en un StringIO.
+Se ejecutan con: python -m pytest
+"""
+import io
+
+import pytest
+
+from escoba import BIT, INDICE, USUARIO, OPONENTE, parsear_carta
+from motor import Motor
+
+def bit(texto):
+    return BIT[INDICE[parsear_carta(texto)]]
+
+@pytest.fixture
+def motor():
+    motor = Motor(io.StringIO())
+    yield motor
+    motor.orden("quit")
+
+def ordenes(motor, *lineas):
+    """ Da las órdenes, espera a la búsqueda en curso y devuelve las líneas nuevas de la salida. """
+    inicio = len(motor.salida.getvalue())
+    for linea in lineas:
+        motor.orden(linea)
+    motor.esperar()
+    return motor.salida.getvalue()[inicio:].splitlines()
+
+def test_uci_y_opciones(motor):
+    salida = ordenes(motor, "uci", "setoption name profundidad value 2", "setoption name limite value 50")
+    assert salida[0].startswith("id name ") and salida[-1] == "uciok"
+    assert motor.opciones["profundidad"] == 2 and motor.opciones["limite"] == 50
+
+def test_go_da_una_linea_por_jugada_y_la_mejor(motor):
+    salida = ordenes(motor, "position mesa 7o,5o,6b,5e mano 2c,3e,10b", "go")
+    info = [l for l in salida if l.startswith("info depth")]
+    assert len(info) == 5
+    assert salida[-1] == "bestmove " + info[0].split(" pv ")[1]
+    assert salida[-1] == "bestmove 3e 5o,7o"
+
+def test_played_sigue_la_partida(motor):
+    assert ordenes(motor, "position mesa 7o,5o,6b,5e mano 2c,3e,10b", "played 3e 5o,7o", "played 4c") == []
+    estado = motor.estado
+    assert estado.manos[USUARIO] == bit("2c") | bit("10b")
+    assert estado.mesa == bit("6b") | bit("5e") | bit("4c")
+    assert estado.capturadas[USUARIO] == bit("3e") | bit("5o") | bit("7o")
+    assert estado.turno == USUARIO
+    assert ordenes(motor, "go limite 50")[-1].startswith("bestmove ")
+
+def test_isready_y_stop_durante_la_busqueda(motor):
+    salida = ordenes(motor, "position mesa 7o,5o,6b,5e mano 2c,3e,10b", "go infinite", "isready", "stop")
+    assert salida.index("readyok") < len(salida) - 1
+    assert salida[-1].startswith("bestmove ")
+    assert sum(l.startswith("bestmove") for l in salida) == 1
+    # Otra búsqueda después de la detenida no empieza detenida.
+    salida = ordenes(motor, "go profundidad 2")
+    assert all(" depth 2 " in l for l in salida if l.startswith("info depth"))
+    assert salida[-1].startswith("bestmove ")
+
+def test_ordenes_durante_la_busqueda_esperan_a_que_acabe(motor):
+    salida = ordenes(motor, "position mesa 7o,5o,6b,5e mano 2c,3e,10b", "go limite 50", "played 3e 5o,7o")
+    assert salida[-1].startswith("bestmove ")
+    assert motor.estado.turno == OPONENTE
+
+@pytest.mark.parametrize("lineas, error", [
+    (["bailar"], "orden desconocida"),
+    (["go"], "no hay posición"),
+    (["position mesa 7o mano 7o"], "más de un sitio"),
+    (["position mesa 7x"], "carta no válida"),
+    (["position mesa 7o mano 2c,3e,10b", "played 1o"], "usuario no puede tener 1o"),
+    (["position mesa 7o mano 2c,3e,10b", "played 2c 7o"], "jugada no válida"),
+    (["position mesa 7o mano 2c,3e,10b", "played 2c", "played 2c"], "oponente no puede tener 2c"),
+    (["position mesa 7o mano 2c,3e,10b", "deal 2c,4o,5o"], "ya ha salido"),
+    (["position mesa 7o lado oponente", "go"], "no se conoce la mano"),
+    (["position mesa 7o mano 2c", "go profundidad 9"], "'profundidad' debe estar entre"),
+    (["setoption name profundidad value x"], "debe ser un entero"),
+    (["setoption name color value rojo"], "opción desconocida"),
+])
+def test_errores(motor, lineas, error):
+    salida = ordenes(motor, *lineas)
+    assert len(salida) == 1 and salida[0].startswith("info string error: ") and error in salida[0]
+
+def test_error_no_cambia_el_estado(motor):
+    ordenes(motor, "position mesa 7o mano 2c,3e,10b")
+    antes = (motor.estado.mesa, tuple(motor.estado.manos), motor.estado.turno)
+    ordenes(motor, "played 1o", "played 2c 7o")
+    assert (motor.estado.mesa, tuple(motor.estado.manos), motor.estado.turno) == antes
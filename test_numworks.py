@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del fichero de la calculadora: que escoba_numworks.py es exactamente lo que
+genera generar_numworks.py a partir de nucleo.py e interfaz_numworks.py, y que el núcleo
+y el fichero generado evalúan las jugadas igual que escoba.py, con montones no vacíos.
+Se ejecutan con: python -m pytest
+"""
+import os
+
+import pytest
+
+import generar_numworks
+
+def test_el_fichero_generado_esta_al_dia(tmp_path):
+    generado = generar_numworks.generar(str(tmp_path / generar_numworks.DESTINO))
+    with open(generado, "rb") as f:
+        nuevo = f.read()
+    with open(os.path.join(generar_numworks.DIRECTORIO, generar_numworks.DESTINO), "rb") as f:
+        assert nuevo == f.read(), "escoba_numworks.py no está al día: ejecuta python generar_numworks.py"
+
+@pytest.mark.parametrize("fichero", ["nucleo.py", generar_numworks.DESTINO])
+def test_evalua_igual_que_escoba(fichero):
+    ruta = os.path.join(generar_numworks.DIRECTORIO, fichero)
+    assert generar_numworks.comprobar(ruta, n=100, semilla=1) == []
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del registro binario de partidas (registro.py): escribir y volver a leer.
+Se ejecutan con: python -m pytest
+"""
+from escoba import _JUGADA
+from registro import Escritor, Lector
+from simulador import barajar, jugar_partida
+
+def partidas(n, semilla=0):
+    return [jugar_partida(barajar(semilla, p), p % 2) for p in range(n)]
+
+def resumen(estado):
+    return (estado.mesa, estado.baraja, tuple(estado.manos), tuple(estado.capturadas),
+            tuple(estado.contadores), tuple(estado.escobas), estado.ultimo, estado.score())
+
+def jugadas(estado):
+    return [(entrada[2], entrada[3], entrada[1]) for entrada in estado.historial if entrada[0] == _JUGADA]
+
+def test_escribir_y_leer_partidas(tmp_path):
+    fichero = tmp_path / "partidas.escb"
+    originales = partidas(6)
+    with Escritor(fichero) as escritor:
+        for estado in originales:
+            escritor.agregar(estado)
+    with Lector(fichero) as lector:
+        assert len(lector) == len(originales)
+        p = 0
+        for i, original in enumerate(originales):
+            assert resumen(lector.estado(i)) == resumen(original)
+            for k, (carta, captura, jugador) in enumerate(jugadas(original)):
+                assert lector.buscar_posicion(p) == (i, k)
+                estado, movida, quien = lector.posicion(p)
+                assert movida == (carta, captura) and quien == jugador
+                assert not estado.terminado()
+                p += 1
+
+def test_anadir_a_un_registro_existente(tmp_path):
+    fichero = tmp_path / "partidas.escb"
+    originales = partidas(5, semilla=1)
+    with Escritor(fichero) as escritor:
+        for estado in originales[:2]:
+            escritor.agregar(estado)
+    with Escritor(fichero) as escritor:
+        assert len(escritor) == 2
+        for estado in originales[2:]:
+            escritor.agregar(estado)
+    with Lector(fichero) as lector:
+        assert [resumen(lector.estado(i)) for i in range(len(lector))] == [resumen(e) for e in originales]
+
+def test_registro_sin_cerrar_reconstruye_el_indice(tmp_path):
+    fichero = tmp_path / "partidas.escb"
+    originales = partidas(3, semilla=2)
+    escritor = Escritor(fichero)
+    for estado in originales:
+        escritor.agregar(estado)
+    # Como si el programa terminara sin cerrar el registro: no se escribe el índice.
+    escritor.f.close()
+    with Escritor(fichero) as escritor:
+        assert len(escritor) == 3
+    with Lector(fichero) as lector:
+        assert [resumen(lector.estado(i)) for i in range(len(lector))] == [resumen(e) for e in originales]
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la tabla de respuestas del oponente (respuestas.py) contra
+expectativa_oponente y evaluar_jugadas, con una tabla pequeña generada para la prueba.
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+import escoba
+from escoba import BIT, USUARIO, GameState, expectativa_oponente, evaluar_jugadas
+import respuestas
+
+CARTAS = 4
+
+@pytest.fixture(scope="module")
+def tabla(tmp_path_factory):
+    fichero = str(tmp_path_factory.mktemp("respuestas") / "respuestas.bin")
+    respuestas.generar(fichero, procesos=1, cartas=CARTAS, informe=None)
+    return respuestas.TablaRespuestas(fichero)
+
+@pytest.fixture
+def sin_tabla(monkeypatch):
+    """ expectativa_oponente enumera las capturas. """
+    monkeypatch.setattr(escoba, "RESPUESTAS", False)
+
+def test_la_tabla_coincide_con_expectativa_oponente(tabla, sin_tabla):
+    rng = random.Random(0)
+    consultas = 0
+    for _ in range(500):
+        cartas = rng.sample(range(40), 40)
+        k = rng.randint(0, CARTAS + 1)
+        mesa = sum(BIT[i] for i in cartas[:k])
+        deck = sum(BIT[i] for i in cartas[k:k + rng.randint(1, 30)])
+        contadores = (rng.randint(0, 24), rng.randint(0, 3), rng.randint(0, 8), rng.randint(0, 1))
+        pesos = [rng.random() for _ in range(40)] if rng.random() < 0.3 else None
+        obtenido = tabla.expectativa(mesa, deck, contadores, pesos)
+        if k > CARTAS:
+            assert obtenido is None
+            continue
+        consultas += 1
+        assert obtenido == expectativa_oponente(mesa, deck, contadores, pesos)
+    assert consultas > 300
+
+def test_evaluar_jugadas_con_y_sin_tabla(tabla, monkeypatch):
+    rng = random.Random(1)
+    for _ in range(50):
+        cartas = rng.sample(range(40), 6)
+        estado = GameState(mesa=sum(BIT[i] for i in cartas[:3]), manos=(sum(BIT[i] for i in cartas[3:]), 0))
+        movidas = estado.legal_moves(USUARIO)
+        monkeypatch.setattr(escoba, "RESPUESTAS", False)
+        esperado = evaluar_jugadas(estado, movidas, USUARIO)
+        monkeypatch.setattr(escoba, "RESPUESTAS", tabla)
+        assert evaluar_jugadas(estado, movidas, USUARIO) == esperado
+
+def test_la_tabla_se_abre_al_consultarla(tabla, monkeypatch):
+    monkeypatch.setattr(escoba, "RESPUESTAS", None)
+    monkeypatch.setattr(respuestas, "abrir", lambda: tabla)
+    mesa, deck = BIT[0] | BIT[13], BIT[4] | BIT[25]
+    valor = expectativa_oponente(mesa, deck)
+    assert escoba.RESPUESTAS is tabla
+    assert valor == tabla.expectativa(mesa, deck)
+
+def test_sin_fichero_se_enumeran_las_capturas(tmp_path, monkeypatch):
+    falta = str(tmp_path / "no_existe.bin")
+    abrir = respuestas.abrir
+    monkeypatch.setattr(escoba, "RESPUESTAS", None)
+    monkeypatch.setattr(respuestas, "abrir", lambda fichero=falta: abrir(fichero))
+    mesa, deck = BIT[0] | BIT[13], BIT[4] | BIT[25]
+    valor = expectativa_oponente(mesa, deck)
+    assert escoba.RESPUESTAS is False
+    assert valor == pytest.approx(sum(escoba.mejor_respuesta(mesa, i) for i in (4, 25)) / 2)
+    assert respuestas.activar(falta) is None and escoba.RESPUESTAS is False
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas del servicio (servicio.py): las jugadas coinciden con evaluar_jugadas y la
+caché sólo guarda los resultados completos.
+Se ejecutan con: python -m pytest
+"""
+import asyncio
+import concurrent.futures
+
+import pytest
+
+from escoba import USUARIO, evaluar_jugadas
+from servicio import Servicio, calcular, estado_de_posicion, posicion_canonica
+
+def pedir(servicio, *peticiones):
+    async def todas():
+        return [await servicio.sugerencia(posicion_canonica(p)[0]) for p in peticiones]
+    return asyncio.run(todas())
+
+@pytest.fixture
+def servicio():
+    with concurrent.futures.ThreadPoolExecutor(2) as ejecutor:
+        yield Servicio(ejecutor)
+
+def test_por_defecto_es_evaluar_jugadas():
+    clave, _ = posicion_canonica({"mesa": ["7o", "5o", "6b", "5e"], "mano": ["2c", "3e", "10b"]})
+    estado = estado_de_posicion(clave)
+    esperado = sorted(e[1] for e in evaluar_jugadas(estado, estado.legal_moves(USUARIO), USUARIO))
+    resultado = calcular(clave)
+    assert sorted(j["neto"] for j in resultado["jugadas"]) == esperado
+    assert resultado["profundidad"] == 1
+
+def test_final_exacto_solo_si_se_pide():
+    peticion = {"mesa": ["2c"], "mano": ["3e"], "no_vistas": ["8b"],
+                "capturadas": {"usuario": ["1o"], "oponente": ["1c"]}}
+    assert calcular(posicion_canonica(peticion)[0])["profundidad"] == 1
+    assert calcular(posicion_canonica(dict(peticion, final_exacto=True))[0])["profundidad"] == "final"
+    with pytest.raises(ValueError):
+        posicion_canonica(dict(peticion, aperturas="si"))
+
+def test_una_sola_jugada_se_guarda_en_la_cache(servicio):
+    peticion = {"mesa": ["10o"], "mano": ["10c"], "profundidad": 2, "limite_ms": 100}
+    (primero, cache1), (segundo, cache2) = pedir(servicio, peticion, peticion)
+    assert len(primero["jugadas"]) == 1
+    assert (cache1, cache2) == (False, True)
+    assert servicio.contadores["incompletas"] == 0
+
+def test_resultado_cortado_no_se_guarda(servicio):
+    peticion = {"mesa": ["7o", "5o", "6b", "5e"], "mano": ["2c", "3e", "10b"],
+                "profundidad": 8, "limite_ms": 1}
+    (resultado, _), (_, cache) = pedir(servicio, peticion, peticion)
+    assert resultado["profundidad"] != 8 and not cache
+    assert servicio.contadores["incompletas"] == 2
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Pruebas de la valoración aprendida (valoracion.py): la antisimetría de la tabla, que el
+modelo lineal con pesos unitarios reproduce evaluar_jugadas y la expectativa vectorizada
+contra un bucle carta a carta, con pesos al azar.
+Se ejecutan con: python -m pytest
+"""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import valoracion
+from escoba import (BIT, CONTADORES_VACIOS, USUARIO, VALOR, GameState, combinaciones_mascara, evaluar_jugadas,
+                    indices, rasgos_mascara, sumar_contadores)
+from valoracion import Valoracion
+
+def mascara(cartas):
+    return sum(BIT[i] for i in cartas)
+
+def posicion(semilla):
+    """ GameState sorteado con 'semilla': mesa, mano del usuario y montones con cartas fuera de la baraja. """
+    azar = random.Random(semilla)
+    cartas = list(range(40))
+    azar.shuffle(cartas)
+    k = azar.randint(1, 7)
+    capturadas = cartas[k + 3:k + 3 + azar.randint(0, 25)]
+    estado = GameState(mesa=mascara(cartas[:k]), manos=(mascara(cartas[k:k + 3]), 0),
+                       baraja=mascara(cartas[k + 3 + len(capturadas):]))
+    for i in capturadas:
+        j = azar.randint(0, 1)
+        estado.contadores[j] = sumar_contadores(estado.contadores[j], rasgos_mascara(BIT[i]))
+    return estado
+
+@pytest.fixture(scope="module")
+def red():
+    azar = np.random.default_rng(0)
+    return Valoracion({"w1": azar.normal(0, 1, (8, 5)), "b1": azar.normal(0, 1, 5), "w2": azar.normal(0, 1, 5)})
+
+@pytest.fixture(scope="module")
+def unitaria():
+    # f(propio, rival) = suma de las características del propio: V es la diferencia de valor_contadores.
+    return Valoracion({"w": [1, 1, 1, 1, 0, 0, 0, 0]})
+
+def test_la_tabla_es_antisimetrica(red, unitaria):
+    for modelo in (red, unitaria):
+        assert modelo.tabla.shape == (valoracion.ESTADOS, valoracion.ESTADOS)
+        assert np.array_equal(modelo.tabla, -modelo.tabla.T)
+
+@pytest.mark.parametrize("semilla", range(20))
+def test_el_modelo_lineal_unitario_reproduce_evaluar_jugadas(unitaria, semilla):
+    estado = posicion(semilla)
+    movidas = estado.legal_moves(USUARIO)
+    esperado = evaluar_jugadas(estado, movidas, USUARIO)
+    obtenido = unitaria.evaluar(estado, movidas, USUARIO)
+    assert [e[0] for e in obtenido] == [e[0] for e in esperado]
+    assert [e[4] for e in obtenido] == [e[4] for e in esperado]
+    for o, e in zip(obtenido, esperado):
+        assert o[1:4] == pytest.approx(e[1:4], abs=1e-12)
+
+def expectativa_bucle(modelo, mesa, deck, contadores, rival, pesos=None):
+    """ Valoracion.expectativa carta a carta, con Valoracion.puntos para cada captura. """
+    mejores = {}
+    for d in indices(deck):
+        mejor = 0
+        for combo in combinaciones_mascara(mesa, 15 - VALOR[d]):
+            mejor = max(mejor, modelo.puntos(contadores, rival, combo | BIT[d], 1 if combo == mesa else 0))
+        mejores[d] = mejor
+    if pesos is not None and sum(pesos[d] for d in mejores) > 0:
+        return sum(mejores[d] * pesos[d] for d in mejores) / sum(pesos[d] for d in mejores)
+    return sum(mejores.values()) / len(mejores)
+
+@pytest.mark.parametrize("con_pesos", [False, True])
+@pytest.mark.parametrize("semilla", range(20))
+def test_la_expectativa_coincide_con_el_bucle(red, semilla, con_pesos):
+    estado = posicion(semilla)
+    azar = random.Random(semilla)
+    pesos = [azar.random() for _ in range(40)] if con_pesos else None
+    deck = estado.no_vistas(USUARIO)
+    propios, rival = estado.contadores[1], estado.contadores[0]
+    obtenido = red.expectativa(estado.mesa, deck, propios, rival, pesos)
+    assert obtenido == pytest.approx(expectativa_bucle(red, estado.mesa, deck, propios, rival, pesos), abs=1e-12)
+
+def test_expectativa_sin_capturas_ni_cartas(red):
+    assert red.expectativa(mascara([0]), 0) == 0
+    # Con sólo el 1 de oros en la mesa, ni el 2 ni el 3 de oros suman 15 con él: nadie captura.
+    assert red.expectativa(mascara([0]), mascara([1, 2]), CONTADORES_VACIOS, CONTADORES_VACIOS) == 0
@@ -0,0 +1,330 @@
+# -*- coding: utf-8 -*-
+"""
+Valoración aprendida de los montones, como alternativa a puntos_cartas_original.
+
+puntos_cartas_original valora cada montón por separado, con topes fijos, aunque
+calcular_puntuacion_final reparte los puntos comparando los dos montones. Aquí se
+aprende V(propio, rival): la diferencia de puntos que queda por ganar (categorías más
+escobas futuras) para quien tiene el montón 'propio' frente a 'rival', a partir de sus
+contadores (cartas, sietes sin velo, oros sin velo, velo). Es antisimétrica por
+construcción, V(p, r) = f(p, r) - f(r, p), con f lineal o una red pequeña (una capa
+oculta tanh).
+
+Los contadores se recortan a 21 cartas, 3 sietes y 6 oros: son los umbrales a partir
+de los que la categoría ya está ganada, así que no se pierde nada (y las claves de la
+tabla de transposición, que recortan igual, siguen valiendo). Con los recortes cada
+montón tiene 1232 estados y al cargar el modelo se tabula V para todas las parejas;
+evaluar es indexar una tabla, sin más coste que la fórmula de puntos_movida.
+
+Una jugada vale V(propio tras capturar, rival) - V(propio, rival), más 1 si es escoba,
+en lugar de la diferencia de valor_contadores. Como V es antisimétrica, lo que gana
+quien mueve menos lo que gana su rival después se telescopa: a cualquier profundidad
+el valor neto es V en la hoja menos V en la raíz, más las escobas.
+
+Las posiciones de entrenamiento salen de partidas de simulador.py (la heurística en
+los dos asientos, con un poco de azar) y el modelo se ajusta por mínimos cuadrados con
+Adam. Requiere NumPy.
+
+Uso:
+    python valoracion.py -n 20000 --procesos 8                   # genera valoracion.npz
+    python valoracion.py -n 20000 --ocultas 0 --salida lineal.npz  # modelo lineal
+    python escoba.py --valoracion valoracion.npz
+    python arena.py neto valoracion:valoracion.npz
+"""
+import argparse
+import functools
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from escoba import (BIT, CONTADORES_VACIOS, indices, indice_capturas, rasgos_mascara, rasgos_capturas, sumar_contadores,
+                    _RASGOS_CARTA, _OBJETIVO_CARTA)
+from simulador import barajar, jugar_partida, politica_heuristica
+
+FICHERO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "valoracion.npz")
+TOPES = (21, 3, 6, 1)
+ESTADOS = 22 * 4 * 7 * 2
+
+def indice_monton(contadores):
+    """ Índice (0..ESTADOS-1) de un montón con los contadores recortados a TOPES. """
+    cartas, sietes, oros, velo = contadores
+    return ((min(cartas, 21) * 4 + min(sietes, 3)) * 7 + min(oros, 6)) * 2 + velo
+
+def indices_montones(contadores):
+    """ indice_monton sobre un array de enteros (..., 4). """
+    return ((np.minimum(contadores[..., 0], 21) * 4 + np.minimum(contadores[..., 1], 3)) * 7
+            + np.minimum(contadores[..., 2], 6)) * 2 + contadores[..., 3]
+
+def caracteristicas(contadores):
+    """ Contadores (..., 4) -> (..., 4) en [0, 1]: cada uno entre su tope. """
+    return np.minimum(contadores, TOPES) / np.array(TOPES, dtype=float)
+
+# Contadores de cada estado de montón, en el orden de indice_monton.
+_MONTONES = np.array([(c, s, o, v) for c in range(22) for s in range(4) for o in range(7) for v in range(2)],
+                     dtype=np.int64)
+
+# Índice sin recortar de un montón real (hasta 40 cartas, 3 sietes sin velo, 9 oros sin
+# velo): es lineal en los contadores, así que el de un montón más una captura es la suma
+# de sus índices. _RECORTE lo lleva al índice recortado de indice_monton.
+_PASOS = np.array([80, 20, 2, 1], dtype=np.int64)
+_RECORTE = indices_montones(np.array([(c, s, o, v) for c in range(41) for s in range(4) for o in range(10)
+                                      for v in range(2)], dtype=np.int64))
+_PASOS_CARTA = _RASGOS_CARTA @ _PASOS
+
+def indice_completo(contadores):
+    """ Índice sin recortar de un montón real. """
+    return contadores[0] * 80 + contadores[1] * 20 + contadores[2] * 2 + contadores[3]
+
+# ==========================================
+# Modelo
+# ==========================================
+class Valoracion:
+    """
+    V(propio, rival) con los pesos 'pesos': {"w1", "b1", "w2"} para la red (w1 de 8 x
+    ocultas) o {"w"} (8 números) para el modelo lineal. La entrada de f son las
+    características de los dos montones, propio primero.
+    """
+    def __init__(self, pesos):
+        self.pesos = {k: np.asarray(v, dtype=float) for k, v in pesos.items()}
+        # tabla[i, j] = V del montón de índice i frente al de índice j.
+        f = np.empty((ESTADOS, ESTADOS))
+        x = caracteristicas(_MONTONES)
+        for i in range(ESTADOS):
+            f[i] = self.f(np.hstack([np.broadcast_to(x[i], x.shape), x]))
+        self.tabla = f - f.T
+        self._columnas = np.ascontiguousarray(self.tabla.T)
+        self._filas = {}
+
+    def f(self, x):
+        if "w" in self.pesos:
+            return x @ self.pesos["w"]
+        return np.tanh(x @ self.pesos["w1"] + self.pesos["b1"]) @ self.pesos["w2"]
+
+    @classmethod
+    def cargar(cls, fichero=FICHERO):
+        with np.load(fichero) as datos:
+            return cls({k: datos[k] for k in datos.files})
+
+    def guardar(self, fichero=FICHERO):
+        np.savez(fichero, **self.pesos)
+
+    def fila(self, rival):
+        """ V(p, rival) para todos los montones p, por índice sin recortar (indice_completo). """
+        j = indice_monton(rival)
+        fila = self._filas.get(j)
+        if fila is None:
+            fila = self._filas[j] = self._columnas[j][_RECORTE]
+        return fila
+
+    def valor(self, propios, rival):
+        """ V(propios, rival) de dos tuplas de contadores. """
+        return float(self.tabla[indice_monton(propios), indice_monton(rival)])
+
+    def puntos(self, propios, rival, captura, escobas=0):
+        """ Como puntos_movida, con V: lo que sube V al capturar 'captura' (con la carta) más las escobas. """
+        fila = self.fila(rival)
+        i = indice_completo(propios)
+        return float(fila[i + indice_completo(rasgos_mascara(captura))] - fila[i]) + escobas
+
+    def expectativa(self, mesa, deck, contadores=CONTADORES_VACIOS, rival=CONTADORES_VACIOS, pesos=None):
+        """
+        Como escoba.expectativa_oponente, con V: media sobre las cartas de 'deck' de la
+        mejor captura del oponente, cuyo montón tiene 'contadores', frente a 'rival'.
+        """
+        if not deck:
+            return 0
+        cartas = list(indices(deck))
+        rasgos = rasgos_capturas(mesa)
+        if not len(rasgos):
+            return 0.0
+        fila = self.fila(rival)
+        base = indice_completo(contadores)
+        # Índice del montón tras cada captura k con cada carta d: base + captura + carta.
+        total = (base + rasgos[:, :4] @ _PASOS)[None, :] + _PASOS_CARTA[cartas][:, None]
+        pts = fila[total] - fila[base] + rasgos[None, :, 4]
+        aplica = rasgos[None, :, 5] == _OBJETIVO_CARTA[cartas][:, None]
+        # Con 0 como mínimo, como expectativa_oponente: sin captura deja la carta en la mesa.
+        mejores = np.where(aplica, pts, 0).max(axis=1, initial=0)
+        if pesos is not None:
+            p = [pesos[i] for i in cartas]
+            suma = sum(p)
+            if suma > 0:
+                return float(mejores @ p) / suma
+        return float(mejores.sum()) / len(cartas)
+
+    def evaluar(self, estado, movidas, jugador, deck=None, pesos=None):
+        """ Con la firma de evaluar_jugadas: las mismas cuentas que evaluar_movida_mascara, con V. """
+        if deck is None:
+            deck = estado.no_vistas(jugador)
+        propios, rival = estado.contadores[jugador], estado.contadores[1 - jugador]
+        evaluaciones = []
+        for movida in movidas:
+            carta, captura = movida
+            bit = BIT[carta]
+            if captura:
+                pts = self.puntos(propios, rival, captura | bit, 1 if captura == estado.mesa else 0)
+                nueva_mesa = estado.mesa & ~captura
+                ganados = sumar_contadores(propios, rasgos_mascara(captura | bit))
+            else:
+                pts = 0
+                nueva_mesa = estado.mesa | bit
+                ganados = propios
+            indice_capturas(nueva_mesa, base=indice_capturas(estado.mesa))
+            exp = self.expectativa(nueva_mesa, deck, rival, ganados, pesos)
+            evaluaciones.append((movida, pts - exp, pts, exp, nueva_mesa))
+        return evaluaciones
+
+@functools.lru_cache(maxsize=None)
+def cargar_valoracion(fichero=FICHERO):
+    """ Valoracion.cargar, una vez por fichero y proceso (tabular V cuesta unas décimas de segundo). """
+    return Valoracion.cargar(fichero)
+
+def evaluador_valoracion(valoracion):
+    """ Función con la firma de evaluar_jugadas que evalúa a 1 jugada con 'valoracion'. """
+    def evaluar(estado, movidas, jugador, deck=None, pesos=None):
+        return valoracion.evaluar(estado, movidas, jugador, deck, pesos)
+    evaluar.valoracion = valoracion
+    return evaluar
+
+# ==========================================
+# Posiciones de entrenamiento
+# ==========================================
+def _posiciones_partida(args):
+    """
+    Juega la partida 'partida' de 'semilla' con la heurística (y una jugada al azar con
+    probabilidad 'exploracion') y devuelve una fila por decisión: los contadores de quien
+    mueve, los de su rival y la diferencia de puntos que ganó desde ahí.
+    """
+    semilla, partida, exploracion = args
+    azar = random.Random(f"{semilla}:{partida}:valoracion")
+    vistas = []
+    def politica(estado):
+        jugador = estado.turno
+        vistas.append((jugador, estado.contadores[jugador], estado.contadores[1 - jugador],
+                       estado.escobas[jugador] - estado.escobas[1 - jugador]))
+        if azar.random() < exploracion:
+            return azar.choice(estado.legal_moves())
+        return politica_heuristica(estado)
+    inicia = partida % 2
+    estado = jugar_partida(barajar(semilla, partida), inicia, (politica, politica))
+    puntos, _ = estado.score()
+    final = puntos["usuario"] - puntos["oponente"]
+    filas = []
+    for jugador, propios, rival, escobas in vistas:
+        signo = 1 if jugador == 0 else -1
+        filas.append(propios + rival + (signo * final - escobas,))
+    return filas
+
+def posiciones(n, semilla=0, procesos=None, exploracion=0.1, informe=sys.stderr):
+    """ Array (filas, 9) de posiciones de 'n' partidas de 'semilla': 8 contadores y el objetivo. """
+    trabajos = [(semilla, i, exploracion) for i in range(n)]
+    filas = []
+    inicio = time.perf_counter()
+    pool = multiprocessing.Pool(procesos) if procesos != 1 else None
+    try:
+        if pool is None:
+            partidas = map(_posiciones_partida, trabajos)
+        else:
+            trozo = max(1, n // ((procesos or multiprocessing.cpu_count()) * 16))
+            partidas = pool.imap(_posiciones_partida, trabajos, chunksize=trozo)
+        for k, f in enumerate(partidas, 1):
+            filas.extend(f)
+            if informe and k % 1000 == 0:
+                print(f"{k} partidas, {k / (time.perf_counter() - inicio):.1f} partidas/s", file=informe)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return np.array(filas, dtype=np.int64).reshape(-1, 9)
+
+# ==========================================
+# Ajuste
+# ==========================================
+def agrupar(datos):
+    """
+    Agrupa las filas de 'datos' por pareja de estados de montón (V sólo depende de eso).
+    Retorna (contadores recortados de cada pareja (grupos, 8), objetivo medio, filas).
+    Ajustar las medias pesadas por 'filas' minimiza el mismo error que todas las filas.
+    """
+    clave = indices_montones(datos[:, :4]) * ESTADOS + indices_montones(datos[:, 4:8])
+    claves, inversa, filas = np.unique(clave, return_inverse=True, return_counts=True)
+    media = np.bincount(inversa, weights=datos[:, 8]) / filas
+    pares = np.hstack([_MONTONES[claves // ESTADOS], _MONTONES[claves % ESTADOS]])
+    return pares, media, filas
+
+def ajustar(datos, ocultas=16, iteraciones=3000, paso=0.01, semilla=0):
+    """
+    Ajusta los pesos de V a 'datos' (filas de posiciones()) por mínimos cuadrados:
+    con 'ocultas' = 0, el modelo lineal en forma cerrada; si no, una red con esa capa
+    oculta, por descenso de gradiente con Adam.
+    """
+    pares, y, filas = agrupar(datos)
+    peso = filas / filas.sum()
+    x1 = np.hstack([caracteristicas(pares[:, :4]), caracteristicas(pares[:, 4:])])
+    x2 = np.hstack([x1[:, 4:], x1[:, :4]])
+    if not ocultas:
+        # V = w·(x1 - x2) = (w_p - w_r)·(propio - rival): basta ajustar 4 números.
+        raiz = np.sqrt(peso)
+        v = np.linalg.lstsq((x1[:, :4] - x1[:, 4:]) * raiz[:, None], y * raiz, rcond=None)[0]
+        return {"w": np.concatenate([v / 2, -v / 2])}
+    azar = np.random.default_rng(semilla)
+    pesos = {"w1": azar.normal(0, 1 / np.sqrt(8), (8, ocultas)), "b1": np.zeros(ocultas),
+             "w2": azar.normal(0, 1 / np.sqrt(ocultas), ocultas)}
+    m = {k: np.zeros_like(v) for k, v in pesos.items()}
+    s = {k: np.zeros_like(v) for k, v in pesos.items()}
+    for t in range(1, iteraciones + 1):
+        h1 = np.tanh(x1 @ pesos["w1"] + pesos["b1"])
+        h2 = np.tanh(x2 @ pesos["w1"] + pesos["b1"])
+        g = 2 * peso * ((h1 - h2) @ pesos["w2"] - y)
+        d1 = np.outer(g, pesos["w2"]) * (1 - h1 ** 2)
+        d2 = -np.outer(g, pesos["w2"]) * (1 - h2 ** 2)
+        gradientes = {"w1": x1.T @ d1 + x2.T @ d2, "b1": (d1 + d2).sum(axis=0), "w2": (h1 - h2).T @ g}
+        for k, gr in gradientes.items():
+            m[k] = 0.9 * m[k] + 0.1 * gr
+            s[k] = 0.999 * s[k] + 0.001 * gr ** 2
+            pesos[k] -= paso * (m[k] / (1 - 0.9 ** t)) / (np.sqrt(s[k] / (1 - 0.999 ** t)) + 1e-8)
+    return pesos
+
+def error(valoracion, datos):
+    """ Error cuadrático medio de 'valoracion' sobre 'datos'. """
+    prediccion = valoracion.tabla[indices_montones(datos[:, :4]), indices_montones(datos[:, 4:8])]
+    return float(np.mean((prediccion - datos[:, 8]) ** 2))
+
+def error_heuristica(datos):
+    """
+    Error cuadrático medio de la heurística (valor_contadores propio menos el del rival)
+    con la mejor escala, como referencia para el modelo.
+    """
+    h = caracteristicas(datos[:, :4]).sum(axis=1) - caracteristicas(datos[:, 4:8]).sum(axis=1)
+    y = datos[:, 8].astype(float)
+    escala = (h @ y) / (h @ h) if h @ h else 0.0
+    return float(np.mean((escala * h - y) ** 2))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aprende la valoración de los montones del consejero de Escoba.")
+    parser.add_argument("-n", "--partidas", type=int, default=20000, help="partidas de entrenamiento")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla de los repartos")
+    parser.add_argument("--procesos", type=int, default=None, help="procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--exploracion", type=float, default=0.1, help="probabilidad de una jugada al azar")
+    parser.add_argument("--ocultas", type=int, default=16, help="neuronas de la capa oculta (0: modelo lineal)")
+    parser.add_argument("--iteraciones", type=int, default=3000, help="iteraciones de Adam")
+    parser.add_argument("--salida", default=FICHERO, help="fichero de pesos (por defecto, valoracion.npz)")
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+    datos = posiciones(args.partidas, args.semilla, args.procesos, args.exploracion)
+    # Las últimas partidas (un 10 %) se guardan para medir el error fuera del ajuste.
+    corte = int(len(datos) * 0.9)
+    entrenamiento, prueba = datos[:corte], datos[corte:]
+    print(f"{len(datos)} posiciones de {args.partidas} partidas en {time.perf_counter() - inicio:.0f} s")
+    valoracion = Valoracion(ajustar(entrenamiento, args.ocultas, args.iteraciones, semilla=args.semilla))
+    valoracion.guardar(args.salida)
+    print(f"error cuadrático medio en prueba: {error(valoracion, prueba):.3f} "
+          f"(heurística: {error_heuristica(prueba):.3f}, media: {float(np.var(prueba[:, 8])):.3f})")
+    print(f"pesos guardados en {args.salida}")
+
+if __name__ == '__main__':
+    main()